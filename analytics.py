@@ -0,0 +1,123 @@
+"""Flow analytics over item transitions."""
+
+import numpy as np
+
+DAY = 86400
+WEEK = 7 * DAY
+
+
+def percentiles(values, ps=(50, 85, 95)):
+    """Return dict of percentiles of values in days, and their count."""
+    ret = {"count": int(len(values))}
+    for p in ps:
+        ret[f"p{p}"] = float(np.percentile(values, p)) / DAY if len(values) else None
+    return ret
+
+
+def board_flow(transitions, column_ids, start_column_ids, done_column_ids, now):
+    """Compute flow metrics for a board.
+
+    transitions is a dict of equal length numpy arrays: "id", "item_id",
+    "to_column_id" and "epochtime" (seconds). column_ids lists the
+    board's columns in display order; items are counted in the columns
+    they moved to. An item's lead time runs from its first transition to
+    its first arrival in a done column, and its cycle time from its
+    first arrival in a column that isn't a start column to the same
+    point.
+
+    Returns a dict with time in column, lead and cycle time percentiles
+    (in days), weekly throughput and a daily cumulative flow series.
+    """
+    ids = transitions["id"]
+    item_ids = transitions["item_id"]
+    to_columns = transitions["to_column_id"]
+    times = transitions["epochtime"]
+    column_ids = np.asarray(column_ids, dtype=np.int64)
+
+    ret = {
+        "time_in_column": [],
+        "lead_time": percentiles([]),
+        "cycle_time": percentiles([]),
+        "throughput": [],
+        "cumulative_flow": {"days": [], "columns": []},
+    }
+    if not len(ids) or not len(column_ids):
+        return ret
+
+    # group transitions by item, in time order
+    order = np.lexsort((ids, times, item_ids))
+    item_ids = item_ids[order]
+    to_columns = to_columns[order]
+    # clock skew between workers can put transitions after now
+    times = np.minimum(times[order], now)
+    last_of_item = np.append(item_ids[1:] != item_ids[:-1], True)
+    first_of_item = np.flatnonzero(np.insert(last_of_item[:-1], 0, True))
+
+    # each transition starts a stay in to_column that lasts until the
+    # item's next transition, or until now
+    leave_times = np.where(last_of_item, now, np.append(times[1:], now))
+    durations = leave_times - times
+
+    # index of each transition's column in column_ids, and whether it
+    # is on this board at all
+    by_id = np.argsort(column_ids)
+    pos = np.minimum(
+        np.searchsorted(column_ids[by_id], to_columns), len(column_ids) - 1
+    )
+    on_board = column_ids[by_id][pos] == to_columns
+    display_idx = by_id[pos]
+
+    for idx, column_id in enumerate(column_ids):
+        in_column = on_board & (display_idx == idx)
+        stays = durations[in_column]
+        ret["time_in_column"].append(
+            {
+                "column_id": int(column_id),
+                "items": int(len(np.unique(item_ids[in_column]))),
+                "mean_days": float(stays.mean()) / DAY if len(stays) else None,
+                "median_days": float(np.median(stays)) / DAY if len(stays) else None,
+            }
+        )
+
+    # per item times of creation, start of work and being done
+    inf = np.iinfo(np.int64).max
+    created = np.minimum.reduceat(times, first_of_item)
+    started = np.minimum.reduceat(
+        np.where(np.isin(to_columns, start_column_ids), inf, times), first_of_item
+    )
+    done = np.minimum.reduceat(
+        np.where(np.isin(to_columns, done_column_ids), times, inf), first_of_item
+    )
+    is_done = done != inf
+    ret["lead_time"] = percentiles(done[is_done] - created[is_done])
+    has_cycle = is_done & (started <= done)
+    ret["cycle_time"] = percentiles(done[has_cycle] - started[has_cycle])
+
+    # items done per week
+    if is_done.any():
+        done_times = done[is_done]
+        week0 = done_times.min() // WEEK * WEEK
+        counts = np.bincount((done_times - week0) // WEEK)
+        ret["throughput"] = [
+            {"week_start": int(week0 + i * WEEK), "count": int(count)}
+            for i, count in enumerate(counts)
+        ]
+
+    # number of items in each column at the end of each day
+    day0 = times.min() // DAY * DAY
+    n_days = int((now - day0) // DAY) + 1
+    enter_days = (times - day0) // DAY
+    # stays that haven't ended yet last past the final day
+    leave_days = np.where(last_of_item, n_days, (leave_times - day0) // DAY)
+    grid = np.zeros((n_days + 1, len(column_ids)), dtype=np.int64)
+    np.add.at(grid, (enter_days[on_board], display_idx[on_board]), 1)
+    np.add.at(grid, (leave_days[on_board], display_idx[on_board]), -1)
+    grid = np.cumsum(grid, axis=0)[:n_days]
+    ret["cumulative_flow"] = {
+        "days": [int(day0 + i * DAY) for i in range(n_days)],
+        "columns": [
+            {"column_id": int(column_id), "counts": grid[:, idx].tolist()}
+            for idx, column_id in enumerate(column_ids)
+        ],
+    }
+    return ret
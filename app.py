@@ -5,20 +5,28 @@ import random
 import time
 import re
 import pathlib
-import subprocess
-import shlex
+import io
+import hashlib
 import json
+import logging
 import os
+import tempfile
 import secrets
+import socket
 import calendar
+import collections
+import threading
 import datetime
-import holidays
+import functools
+import itertools
+from types import SimpleNamespace
 
-import argh
+import click
 import flask
-import humanize
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import UpdateBase
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -29,26 +37,230 @@ from flask_login import (
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 
+import json_stream
+import metrics
+import replicas
 import to_md
+import user_cache
+
+
+def read_secret_key(key_path):
+    """Return the key in the key file, or None if there is no key file."""
+    try:
+        return key_path.read_text().strip()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def load_secret_key(instance_path):
+    """Return the session secret key.
+
+    Taken from CATBOARD_SECRET_KEY if set, otherwise from a key file in
+    the instance folder which is created on first use, so that all
+    workers and restarts share the same key. If the instance folder
+    can't be written, such as on a read only filesystem, the key is only
+    kept in this process and its workers.
+    """
+    if os.getenv("CATBOARD_SECRET_KEY"):
+        return os.getenv("CATBOARD_SECRET_KEY")
+    key_path = pathlib.Path(instance_path) / "secret_key"
+    key = read_secret_key(key_path)
+    if key:
+        return key
+    try:
+        key_path.parent.mkdir(parents=True, exist_ok=True)
+        # written in full to a temporary file first, so that other
+        # processes never read a partly written key
+        fd, tmp_path = tempfile.mkstemp(dir=key_path.parent, prefix=".secret_key.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_urlsafe())
+            if key is not None:
+                # empty, left by a crash while it was written
+                os.replace(tmp_path, key_path)
+            else:
+                # unlike a rename, fails if a concurrent start made a key
+                # first, so that everyone uses that one
+                os.link(tmp_path, key_path)
+        except FileExistsError:
+            pass
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    except OSError as e:
+        logging.getLogger(__name__).warning(
+            "can't write %s, sessions end on restart: %r", key_path, e
+        )
+        return secrets.token_urlsafe()
+    return read_secret_key(key_path)
+
+
+def load_jinja_bytecode_cache(instance_path):
+    """Return a cache of compiled templates in the instance folder, or
+    None if the folder can't be written.
+
+    Saves compiling every template again in each new worker process.
+    """
+    import jinja2
+
+    cache_dir = pathlib.Path(instance_path) / "jinja_cache"
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    if not os.access(cache_dir, os.W_OK):
+        return None
+    return jinja2.FileSystemBytecodeCache(str(cache_dir))
+
 
 app = flask.Flask(__name__)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True}
+if os.getenv("CATBOARD_DB_POOL_SIZE"):
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["pool_size"] = int(
+        os.getenv("CATBOARD_DB_POOL_SIZE")
+    )
+if os.getenv("CATBOARD_DB_MAX_OVERFLOW"):
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["max_overflow"] = int(
+        os.getenv("CATBOARD_DB_MAX_OVERFLOW")
+    )
 app.config["SEND_FILE_MAX_AGE_DEFAULT"] = dt.timedelta(hours=12)
-app.config["SECRET_KEY"] = secrets.token_urlsafe()
+app.config["SECRET_KEY"] = load_secret_key(app.instance_path)
 if os.getenv("CATBOARD_SQLALCHEMY_DATABASE_URI"):
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
         "CATBOARD_SQLALCHEMY_DATABASE_URI"
     )
 else:
     app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
+# read replicas, see choose_read_replica()
+replica_uris = [
+    uri.strip()
+    for uri in os.getenv("CATBOARD_SQLALCHEMY_REPLICA_URIS", "").split(",")
+    if uri.strip()
+]
+# with the engine options of the primary, which flask-sqlalchemy only
+# applies to the primary
+app.config["SQLALCHEMY_BINDS"] = {
+    f"replica{idx}": {"url": uri, **app.config["SQLALCHEMY_ENGINE_OPTIONS"]}
+    for idx, uri in enumerate(replica_uris)
+}
+app.config["REPLICA_STICKY_SECONDS"] = float(
+    os.getenv("CATBOARD_REPLICA_STICKY_SECONDS", 10)
+)
+app.config["REPLICA_CHECK_SECONDS"] = float(
+    os.getenv("CATBOARD_REPLICA_CHECK_SECONDS", 10)
+)
+app.config["PERSIST_RENDERED_HTML"] = bool(os.getenv("CATBOARD_PERSIST_RENDERED_HTML"))
+app.config["USER_CACHE_TTL"] = int(os.getenv("CATBOARD_USER_CACHE_TTL", 60))
+app.config["USER_CACHE_REDIS_URL"] = os.getenv("CATBOARD_USER_CACHE_REDIS_URL")
+app.config["EVENT_POLL_SECONDS"] = float(os.getenv("CATBOARD_EVENT_POLL_SECONDS", 2))
+app.config["EVENT_RETENTION_SECONDS"] = int(
+    os.getenv("CATBOARD_EVENT_RETENTION_SECONDS", 86400)
+)
+app.config["METRICS_SAMPLE_RATE"] = float(os.getenv("CATBOARD_METRICS_SAMPLE_RATE", 1))
+app.config["METRICS_TOKEN"] = os.getenv("CATBOARD_METRICS_TOKEN")
+app.config["SLOW_REQUEST_SECONDS"] = float(
+    os.getenv("CATBOARD_SLOW_REQUEST_SECONDS", 1)
+)
+
+app.jinja_options = {
+    **app.jinja_options,
+    "bytecode_cache": load_jinja_bytecode_cache(app.instance_path),
+}
+
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+class RoutingSession(Session):
+    """Session that reads from the read replica in session.info["replica"].
+
+    Writes go to the primary database, and so does everything after the
+    first write, so that the session reads its own writes. Writes are
+    noted in session.info["wrote"] for stick_to_primary().
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+            self.info.pop("replica", None)
+        replica = self.info.get("replica")
+        if replica is not None:
+            return db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+db = SQLAlchemy(app, session_options={"class_": RoutingSession})
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
 
 
+def set_db_pool(pool_size, max_overflow):
+    """Recreate the database engines with a connection pool of pool_size
+    plus max_overflow connections, for serve.py. Call before the engines
+    are used.
+    """
+    for options in [
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"],
+        *app.config["SQLALCHEMY_BINDS"].values(),
+    ]:
+        options.update(pool_size=pool_size, max_overflow=max_overflow)
+    # init_app disposes the engines and creates them with the new options
+    del app.extensions["sqlalchemy"]
+    db.init_app(app)
+
+
+def init_migrate():
+    """Set up flask-migrate, which imports alembic and is slow to import."""
+    if "migrate" not in app.extensions:
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+
+
+class MigrateCommands(click.MultiCommand):
+    """The flask db commands, with flask-migrate only imported when used."""
+
+    def db_group(self):
+        init_migrate()
+        from flask_migrate.cli import db as db_group
+
+        return db_group
+
+    def list_commands(self, ctx):
+        return self.db_group().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self.db_group().get_command(ctx, name)
+
+
+app.cli.add_command(MigrateCommands("db", help="Perform database migrations."))
+
+if app.config["USER_CACHE_REDIS_URL"]:
+    user_cache_backend = user_cache.RedisBackend(app.config["USER_CACHE_REDIS_URL"])
+else:
+    user_cache_backend = user_cache.MemoryBackend()
+session_user_cache = user_cache.UserCache(
+    user_cache_backend, app.config["USER_CACHE_TTL"]
+)
+request_metrics = metrics.Metrics()
+# metrics of all gunicorn workers, see set_metrics_dir()
+shared_metrics = None
+
+
+def check_replica(name):
+    with db.engines[name].connect() as conn:
+        conn.execute(db.text("SELECT 1"))
+
+
+if app.config["SQLALCHEMY_BINDS"]:
+    replica_pool = replicas.ReplicaPool(
+        app.config["SQLALCHEMY_BINDS"],
+        check_replica,
+        app.config["REPLICA_CHECK_SECONDS"],
+        app.logger,
+    )
+else:
+    replica_pool = None
+
+
 class Item(db.Model):
     """Board item (task) class."""
 
@@ -59,8 +271,29 @@ class Item(db.Model):
     closed = db.Column(db.Boolean, nullable=False, default=False)
     public = db.Column(db.Boolean, nullable=False, default=False)
     description = db.Column(db.Text)
+    # rendered description and its to_md.renderer_version(), see
+    # item_description_html()
+    description_html = db.deferred(db.Column(db.Text), group="description_html")
+    description_html_version = db.deferred(
+        db.Column(db.String(64)), group="description_html"
+    )
     column_id = db.Column(db.Integer, db.ForeignKey("column.id"), nullable=False)
-    column = db.relationship("Column", backref=db.backref("items"), lazy=True)
+    column = db.relationship(
+        "Column",
+        backref=db.backref("items", order_by="(Item.position, Item.id)"),
+        lazy=True,
+    )
+    # order in the column, see position_before()
+    position = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # checklist progress, see sync_checklist()
+    checklist_done = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    checklist_total = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+
+    __table_args__ = (db.Index("ix_item_column_id_position", "column_id", "position"),)
 
 
 class ItemTransition(db.Model):
@@ -75,6 +308,13 @@ class ItemTransition(db.Model):
     to_column = db.relationship("Column", foreign_keys=[to_column_id])
     epochtime = db.Column(db.Integer, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_item_transition_item_id_epochtime", "item_id", "epochtime"),
+        db.Index(
+            "ix_item_transition_to_column_id_epochtime", "to_column_id", "epochtime"
+        ),
+    )
+
 
 class ItemRelationship(db.Model):
     """Class to store item relationships, such as subtasks."""
@@ -102,6 +342,77 @@ class ItemRelationship(db.Model):
         return f"#{self.id} {self.item1.name} -> {self.item2.name}, type={self.type}"
 
 
+class ItemChecklist(db.Model):
+    """Checklist entry in an item's description, see sync_checklist()."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey("item.id"), nullable=False)
+    # order in the description
+    position = db.Column(db.Integer, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    done = db.Column(db.Boolean, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_item_checklist_item_id_position", "item_id", "position"),
+    )
+
+
+class ArchivedItem(db.Model):
+    """Closed item moved out of the item table, see archive_items().
+
+    Has the columns and relationships of Item that item pages use, so
+    that an archived item can be shown like an item until it's restored.
+    """
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(256), nullable=False)
+    assigned = db.Column(db.String(64), nullable=False)
+    color = db.Column(db.String(64), nullable=False)
+    closed = db.Column(db.Boolean, nullable=False, default=False)
+    public = db.Column(db.Boolean, nullable=False, default=False)
+    description = db.Column(db.Text)
+    column_id = db.Column(db.Integer, db.ForeignKey("column.id"), nullable=False)
+    column = db.relationship("Column", lazy=True)
+    position = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    archived_epochtime = db.Column(db.Integer, nullable=False)
+
+
+class ArchivedItemTransition(db.Model):
+    """Transition of an archived item."""
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    item_id = db.Column(db.Integer, db.ForeignKey("archived_item.id"), nullable=False)
+    item = db.relationship("ArchivedItem", backref=db.backref("transitions"), lazy=True)
+    from_column_id = db.Column(db.Integer, db.ForeignKey("column.id"))
+    from_column = db.relationship("Column", foreign_keys=[from_column_id])
+    to_column_id = db.Column(db.Integer, db.ForeignKey("column.id"), nullable=False)
+    to_column = db.relationship("Column", foreign_keys=[to_column_id])
+    epochtime = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index(
+            "ix_archived_item_transition_item_id_epochtime", "item_id", "epochtime"
+        ),
+        db.Index(
+            "ix_archived_item_transition_to_column_id_epochtime",
+            "to_column_id",
+            "epochtime",
+        ),
+    )
+
+
+class ArchivedItemRelationship(db.Model):
+    """Relationship between archived items."""
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    item1_id = db.Column(db.Integer, db.ForeignKey("archived_item.id"), nullable=False)
+    item1 = db.relationship("ArchivedItem", foreign_keys=[item1_id], lazy=True)
+    item2_id = db.Column(db.Integer, db.ForeignKey("archived_item.id"), nullable=False)
+    item2 = db.relationship("ArchivedItem", foreign_keys=[item2_id], lazy=True)
+    # see ItemRelationship
+    type = db.Column(db.Integer, nullable=False)
+
+
 class Column(db.Model):
     """Lane column class."""
 
@@ -109,7 +420,18 @@ class Column(db.Model):
     name = db.Column(db.String(256), nullable=False)
     closed = db.Column(db.Boolean, nullable=False, default=False)
     lane_id = db.Column(db.Integer, db.ForeignKey("lane.id"), nullable=False)
-    lane = db.relationship("Lane", backref=db.backref("columns"), lazy=True)
+    lane = db.relationship(
+        "Lane",
+        backref=db.backref("columns", order_by="(Column.position, Column.id)"),
+        lazy=True,
+    )
+    # order in the lane, see position_before(). Hidden columns aren't shown
+    position = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    hidden = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=db.false()
+    )
+
+    __table_args__ = (db.Index("ix_column_lane_id_position", "lane_id", "position"),)
 
 
 class Lane(db.Model):
@@ -119,8 +441,18 @@ class Lane(db.Model):
     name = db.Column(db.String(256), nullable=False)
     closed = db.Column(db.Boolean, nullable=False, default=False)
     board_id = db.Column(db.Integer, db.ForeignKey("board.id"), nullable=False)
-    board = db.relationship("Board", backref=db.backref("lanes"), lazy=True)
-    columns_sorted = db.Column(db.String(512), nullable=True)
+    board = db.relationship(
+        "Board",
+        backref=db.backref("lanes", order_by="(Lane.position, Lane.id)"),
+        lazy=True,
+    )
+    # order on the board, see position_before(). Hidden lanes aren't shown
+    position = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    hidden = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=db.false()
+    )
+
+    __table_args__ = (db.Index("ix_lane_board_id_position", "board_id", "position"),)
 
 
 # Association table
@@ -137,7 +469,32 @@ class Board(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(256), nullable=False)
     closed = db.Column(db.Boolean, nullable=False, default=False)
-    lanes_sorted = db.Column(db.String(512), nullable=True)
+    # change counter and time of last change, see touch_board()
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    modified_epochtime = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+
+
+class BoardEvent(db.Model):
+    """Change to a board, sent to viewers of the board by board_events().
+
+    Event ids only ever increase, so they're used as the stream position.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    board_id = db.Column(db.Integer, db.ForeignKey("board.id"), nullable=False)
+    # item_created, item_moved, item_updated, item_closed or changed
+    kind = db.Column(db.String(32), nullable=False)
+    # json item data for item events
+    data = db.Column(db.Text)
+    epochtime = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_board_event_board_id_id", "board_id", "id"),
+        # never reuse ids, even if all events were pruned
+        {"sqlite_autoincrement": True},
+    )
 
 
 class User(db.Model, UserMixin):
@@ -146,11 +503,13 @@ class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
+    # change counter of the user's password and boards, see touch_user()
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     boards = db.relationship(
         "Board",
         secondary=user_board,
-        lazy="subquery",
+        lazy=True,
         backref=db.backref("users", lazy=True),
     )
 
@@ -160,6 +519,23 @@ class User(db.Model, UserMixin):
     def check_password(self, maybe_password):
         return check_password_hash(self.password_hash, maybe_password)
 
+    @property
+    def board_ids(self):
+        return [board.id for board in self.boards]
+
+
+class SessionUser(UserMixin):
+    """Logged in user, as cached by load_user."""
+
+    def __init__(self, id, username, board_ids):
+        self.id = id
+        self.username = username
+        self.board_ids = board_ids
+
+    @property
+    def boards(self):
+        return Board.query.filter(Board.id.in_(self.board_ids)).order_by(Board.id).all()
+
 
 class CalDay(db.Model):
     """Calendar day class."""
@@ -201,8 +577,43 @@ def logout():
 def load_user(user_id):
     """
     This is called by flask-login on every request to load the user
+
+    The user's id, name and board ids are cached for USER_CACHE_TTL
+    seconds. Every request checks the user's change counter in the
+    database, so a cached entry is only used while the user still exists
+    and their password and boards haven't changed, including changes
+    made by cli.py or other processes.
+    """
+    version = db.session.query(User.version).filter(User.id == int(user_id)).scalar()
+    if version is None:
+        return None
+    data = session_user_cache.get(user_id)
+    if data is None or data.get("version") != version:
+        user = db.session.get(User, int(user_id))
+        board_ids = [
+            board_id
+            for (board_id,) in db.session.query(user_board.c.board_id).filter(
+                user_board.c.user_id == user.id
+            )
+        ]
+        data = {
+            "id": user.id,
+            "username": user.username,
+            "board_ids": board_ids,
+            "version": user.version,
+        }
+        session_user_cache.set(user_id, data)
+    return SessionUser(data["id"], data["username"], data["board_ids"])
+
+
+def touch_user(user_id):
+    """Bump the change counter of a user, so that load_user() reloads them.
+
+    Call this before committing changes to the user's password or boards.
     """
-    return User.query.filter_by(id=int(user_id)).first()
+    db.session.query(User).filter(User.id == user_id).update(
+        {User.version: User.version + 1}, synchronize_session=False
+    )
 
 
 colors = [
@@ -227,53 +638,607 @@ def or_404(arg):
     return arg
 
 
+def accessible_board_ids():
+    """Return the set of ids of the boards the current user can access.
+
+    Built once per request from the user loaded by load_user.
+    """
+    if "accessible_board_ids" not in flask.g:
+        flask.g.accessible_board_ids = set(current_user.board_ids)
+    return flask.g.accessible_board_ids
+
+
+def invalidate_board_access():
+    """Forget the current user's accessible board ids in this request.
+
+    The change has to be committed with touch_user() for later requests.
+    """
+    flask.g.pop("accessible_board_ids", None)
+
+
+def require_board_access(board_id):
+    """Show 403 page if the current user can't access the board."""
+    if board_id not in accessible_board_ids():
+        flask.abort(403)
+
+
+def get_board_or_404(board_id):
+    """Return board the current user can access, or show 404/403 page."""
+    board = or_404(Board.query.filter_by(id=board_id).first())
+    require_board_access(board.id)
+    return board
+
+
+def get_lane_or_404(lane_id):
+    """Return lane the current user can access, or show 404/403 page."""
+    lane = or_404(Lane.query.filter_by(id=lane_id).first())
+    require_board_access(lane.board_id)
+    return lane
+
+
+def get_column_or_404(column_id):
+    """Return column the current user can access, or show 404/403 page."""
+    column, board_id = or_404(
+        db.session.query(Column, Lane.board_id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(Column.id == column_id)
+        .first()
+    )
+    require_board_access(board_id)
+    return column
+
+
+def get_item_or_404(item_id, *options):
+    """Return item the current user can access, or show 404/403 page.
+
+    The item and its board id are loaded with one joined query.
+    """
+    item, board_id = or_404(
+        db.session.query(Item, Lane.board_id)
+        .join(Column, Item.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(Item.id == item_id)
+        .options(*options)
+        .first()
+    )
+    require_board_access(board_id)
+    return item
+
+
+def get_archived_item_or_404(item_id):
+    """Return archived item the current user can access, or show 404/403 page."""
+    item, board_id = or_404(
+        db.session.query(ArchivedItem, Lane.board_id)
+        .join(Column, ArchivedItem.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(ArchivedItem.id == item_id)
+        .first()
+    )
+    require_board_access(board_id)
+    return item
+
+
+def item_board_ids(item_ids):
+    """Return dict of item id to the id of the board the item is on.
+
+    Items that don't exist are left out.
+    """
+    if not item_ids:
+        return dict()
+    return dict(
+        db.session.query(Item.id, Lane.board_id)
+        .join(Column, Item.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(Item.id.in_(item_ids))
+        .all()
+    )
+
+
+def item_board_id(item_id):
+    """Return a scalar subquery of the id of the board an item is on."""
+    return (
+        db.select(Lane.board_id)
+        .join(Column, Column.lane_id == Lane.id)
+        .join(Item, Item.column_id == Column.id)
+        .where(Item.id == item_id)
+        .scalar_subquery()
+    )
+
+
+def column_board_id(column_id):
+    """Return a scalar subquery of the id of the board a column is on."""
+    return (
+        db.select(Lane.board_id)
+        .join(Column, Column.lane_id == Lane.id)
+        .where(Column.id == column_id)
+        .scalar_subquery()
+    )
+
+
+def touch_board(board_id, kind="changed", item=None, items=None):
+    """Bump the change counter of a board, so that its pages are refetched.
+
+    Call this before committing any change that shows up on the board's
+    pages. board_id can also be a subquery from item_board_id() or
+    column_board_id(). The counter is incremented in the database, so
+    concurrent changes are all counted.
+
+    Also records a board event of kind for live board viewers, with the
+    item's data for item events, or one event for each of items.
+    Viewers reload the page on "changed".
+    """
+    now = int(time.time())
+    db.session.query(Board).filter(Board.id == board_id).update(
+        {Board.version: Board.version + 1, Board.modified_epochtime: now},
+        synchronize_session=False,
+    )
+    if item is not None:
+        items = [item]
+    db.session.execute(
+        BoardEvent.__table__.insert().values(
+            board_id=board_id, kind=kind, epochtime=now
+        ),
+        (
+            [{"data": json.dumps(item_event_data(item))} for item in items]
+            if items
+            else [{"data": None}]
+        ),
+    )
+    # now and then, forget events that no viewer can still be waiting for
+    if random.random() < 0.01:
+        BoardEvent.query.filter(
+            BoardEvent.epochtime < now - app.config["EVENT_RETENTION_SECONDS"]
+        ).delete(synchronize_session=False)
+
+
+def item_event_data(item):
+    """Return dict of the item fields that board pages show."""
+    return {
+        "id": item.id,
+        "column_id": item.column_id,
+        "position": item.position,
+        "name": item.name,
+        "assigned": item.assigned,
+        "color": item.color,
+        "closed": item.closed,
+        "checklist_done": item.checklist_done,
+        "checklist_total": item.checklist_total,
+    }
+
+
+def read_replica(view):
+    """Serve the GET requests of a read only view from a read replica,
+    see choose_read_replica().
+
+    Goes below login_required, so that the user is loaded from the
+    primary database and board access is never behind.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        choose_read_replica()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def choose_read_replica():
+    """Send the rest of the request's reads to the next read replica.
+
+    Users who changed something in the last REPLICA_STICKY_SECONDS stay
+    on the primary database, so that they see their changes even if the
+    replicas are behind. If no replica is up, the primary is used.
+    """
+    if replica_pool is None or flask.request.method not in ("GET", "HEAD"):
+        return
+    if flask.session.get("primary_until", 0) > time.time():
+        return
+    replica = replica_pool.choose()
+    if replica is not None:
+        db.session.info["replica"] = replica
+
+
+@db.event.listens_for(db.session, "after_commit")
+def stick_to_primary(session):
+    """Keep the user on the primary database for a while after a write."""
+    if (
+        session.info.pop("wrote", False)
+        and replica_pool is not None
+        and flask.has_request_context()
+    ):
+        flask.session["primary_until"] = (
+            time.time() + app.config["REPLICA_STICKY_SECONDS"]
+        )
+
+
+@db.event.listens_for(db.session, "after_rollback")
+def forget_writes(session):
+    session.info.pop("wrote", None)
+
+
+def mark_replica_down(context):
+    """Stop using a read replica when its connection fails."""
+    if not context.is_disconnect or not flask.has_app_context():
+        return
+    for name in app.config["SQLALCHEMY_BINDS"]:
+        if db.engines[name] is context.engine:
+            replica_pool.mark_down(name)
+
+
+if replica_pool is not None:
+    db.event.listen(Engine, "handle_error", mark_replica_down)
+
+
+def conditional_response(etag_parts, last_modified, render):
+    """Return 304 response if the client's copy of the page is current.
+
+    Otherwise call render() to make the page. The strong ETag is a hash
+    of etag_parts (such as board change counters), the app version, the
+    user and the request path and query. last_modified is an epoch time,
+    or 0 if not known. Clients are told to revalidate on every use.
+    """
+    etag = hashlib.sha1(
+        json.dumps(
+            [app_version(), current_user.id, flask.request.full_path, etag_parts]
+        ).encode()
+    ).hexdigest()
+    if last_modified:
+        last_modified = dt.datetime.fromtimestamp(last_modified, dt.timezone.utc)
+    request = flask.request
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    else:
+        fresh = bool(
+            last_modified
+            and request.if_modified_since
+            and last_modified <= request.if_modified_since
+        )
+    if fresh:
+        response = flask.Response(status=304)
+    else:
+        response = flask.make_response(render())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    response.vary.add("Cookie")
+    return response
+
+
+def item_page_rows(item_cls, relationship_cls, item_id):
+    """Return (item id, board id, version, modified) of an item and its subtasks."""
+    subtask_ids = db.select(relationship_cls.item2_id).where(
+        relationship_cls.item1_id == item_id, relationship_cls.type == 100
+    )
+    return (
+        db.session.query(item_cls.id, Board.id, Board.version, Board.modified_epochtime)
+        .join(Column, item_cls.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .join(Board, Lane.board_id == Board.id)
+        .filter(db.or_(item_cls.id == item_id, item_cls.id.in_(subtask_ids)))
+        .order_by(item_cls.id)
+        .all()
+    )
+
+
+def item_page_versions(item_id):
+    """Return the change counters and last change time an item page shows.
+
+    The item page shows its own board and its subtasks, which can be on
+    other boards, so all of these are found in one query. Items that
+    aren't in the item table are looked for in the archive with a second
+    query. Also returns whether the item is archived. Shows 404/403 page
+    like get_item_or_404().
+    """
+    archived = False
+    rows = item_page_rows(Item, ItemRelationship, item_id)
+    own = [row for row in rows if str(row[0]) == str(item_id)]
+    if not own:
+        archived = True
+        rows = item_page_rows(ArchivedItem, ArchivedItemRelationship, item_id)
+        own = or_404([row for row in rows if str(row[0]) == str(item_id)])
+    require_board_access(own[0][1])
+    versions = sorted({(board_id, v) for _, board_id, v, _ in rows})
+    return versions, max(modified for *_, modified in rows), archived
+
+
 def icon(name):
     """Format html for fontawesome icons."""
     return f'<i class="fa fa-{name} fa-fw"></i>'
 
 
-def list_reorder(list1, list2):
+# gap between the positions of neighbouring lanes, columns and items, so
+# that one can be put between two others without renumbering the rest
+position_gap = 1024
+
+
+def last_position(parent_column, parent_id):
+    """Return a position after the rows of parent_column's table that have
+    parent_id, like last_position(Item.column_id, 4)."""
+    cls = parent_column.class_
+    last = (
+        db.session.query(db.func.max(cls.position))
+        .filter(parent_column == parent_id)
+        .scalar()
+    )
+    return (last or 0) + position_gap
+
+
+def position_before(parent_column, parent_id, before_id, exclude_id=None):
+    """Return a position right before row before_id among the rows with parent_id.
+
+    Rows are ordered by (position, id). The new position is in the middle
+    of the gap to the previous row (leaving out row exclude_id, the one
+    being moved), so only the moved row changes. When there's no gap
+    left, the rows are renumbered first. Returns None if before_id isn't
+    one of the rows.
     """
-    Reorder list1 based on comma separated ids in list2.
+    cls = parent_column.class_
+    siblings = db.session.query(cls.position).filter(parent_column == parent_id)
+    if exclude_id is not None:
+        siblings = siblings.filter(cls.id != exclude_id)
+    for _ in range(2):
+        before = siblings.filter(cls.id == before_id).scalar()
+        if before is None:
+            return None
+        previous = (
+            siblings.filter(
+                db.or_(
+                    cls.position < before,
+                    db.and_(cls.position == before, cls.id < before_id),
+                )
+            )
+            .order_by(cls.position.desc(), cls.id.desc())
+            .limit(1)
+            .scalar()
+        )
+        if previous is None:
+            return before - position_gap
+        if before - previous > 1:
+            return (previous + before) // 2
+        renumber_positions(parent_column, parent_id)
+
 
-    for sorting lanes and columns.
+def renumber_positions(parent_column, parent_id, ids=None):
+    """Give the rows with parent_id positions position_gap apart, in order.
+
+    If ids are given, those rows are put in that order and shown, and
+    the other rows are hidden and put after them.
     """
-    if list2:
-        list2 = list2.split(",")
-        for l2 in list2:
-            for x in list1:
-                if x.id == int(l2):
-                    yield x
+    cls = parent_column.class_
+    rows = [
+        row_id
+        for (row_id,) in db.session.query(cls.id)
+        .filter(parent_column == parent_id)
+        .order_by(cls.position, cls.id)
+    ]
+    if ids is None:
+        ordered = [{"id": row_id} for row_id in rows]
     else:
-        for l1 in list1:
-            yield l1
+        existing = set(rows)
+        shown = dict.fromkeys(row_id for row_id in ids if row_id in existing)
+        ordered = [{"id": row_id, "hidden": False} for row_id in shown] + [
+            {"id": row_id, "hidden": True} for row_id in rows if row_id not in shown
+        ]
+    for idx, row in enumerate(ordered):
+        row["position"] = (idx + 1) * position_gap
+    if ordered:
+        db.session.execute(db.update(cls), ordered)
+
+
+@functools.lru_cache(maxsize=None)
+def app_version():
+    """Return the catboard version.
+
+    Taken from CATBOARD_VERSION if it was set at build time, otherwise
+    from git the first time it's needed.
+    """
+    if os.getenv("CATBOARD_VERSION"):
+        return os.getenv("CATBOARD_VERSION")
+    import subprocess
 
+    try:
+        cmd = ["git", "describe", "--tags", "--always", "--dirty"]
+        return subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ""
 
-try:
-    cmd = "git describe --tags --always --dirty"
-    version = subprocess.check_output(shlex.split(cmd)).decode().strip()
-except Exception:
-    version = ""
 
-try:
-    cmd = "hostname"
-    hostname = subprocess.check_output(shlex.split(cmd)).decode().strip()
-except Exception:
-    hostname = ""
+hostname = socket.gethostname()
 
 
 @app.context_processor
 def inject_globals():
     """Add some stuff into all templates."""
     return {
-        "version": version,
+        "version": app_version(),
         "hostname": hostname,
         "icon": icon,
-        "list_reorder": list_reorder,
         "to_md": to_md.text_to_html,
     }
 
 
+@app.before_request
+def start_request_metrics():
+    """Start timing a sampled request, see record_request_metrics()."""
+    if random.random() < app.config["METRICS_SAMPLE_RATE"]:
+        flask.g.request_metrics = {
+            "start": time.perf_counter(),
+            "queries": [],
+            "db_seconds": 0.0,
+        }
+
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if flask.has_app_context() and "request_metrics" in flask.g:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if flask.has_app_context() and "request_metrics" in flask.g:
+        seconds = time.perf_counter() - conn.info["query_start"].pop()
+        flask.g.request_metrics["queries"].append((statement, seconds))
+        flask.g.request_metrics["db_seconds"] += seconds
+
+
+def drop_query_timer(exception_context):
+    # after_cursor_execute doesn't run for a query that raised
+    conn = exception_context.connection
+    if (
+        flask.has_app_context()
+        and "request_metrics" in flask.g
+        and conn is not None
+        and exception_context.execution_context is not None
+    ):
+        query_start = conn.info.get("query_start")
+        if query_start:
+            query_start.pop()
+
+
+if app.config["METRICS_SAMPLE_RATE"] > 0:
+    # on the Engine class, so that every engine is counted
+    db.event.listen(Engine, "before_cursor_execute", start_query_timer)
+    db.event.listen(Engine, "after_cursor_execute", stop_query_timer)
+    db.event.listen(Engine, "handle_error", drop_query_timer)
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request, and record latency, query count and database
+    time if it was sampled.
+
+    Requests taking longer than SLOW_REQUEST_SECONDS are logged with
+    their queries. Streamed responses are timed until they start.
+    """
+    request_metrics_data = flask.g.pop("request_metrics", None)
+    endpoint = flask.request.endpoint or "none"
+    if request_metrics_data is None:
+        request_metrics.observe_request(
+            endpoint, flask.request.method, response.status_code
+        )
+        if shared_metrics is not None:
+            shared_metrics.changed()
+        return response
+    seconds = time.perf_counter() - request_metrics_data["start"]
+    queries = request_metrics_data["queries"]
+    request_metrics.observe_request(
+        endpoint,
+        flask.request.method,
+        response.status_code,
+        seconds,
+        len(queries),
+        request_metrics_data["db_seconds"],
+    )
+    if shared_metrics is not None:
+        shared_metrics.changed()
+    if seconds >= app.config["SLOW_REQUEST_SECONDS"]:
+        app.logger.warning(
+            "slow request: %s %s %.3fs, %d queries in %.3fs:\n%s",
+            flask.request.method,
+            flask.request.full_path,
+            seconds,
+            len(queries),
+            request_metrics_data["db_seconds"],
+            "\n".join(
+                f"  {query_seconds:.4f}s {statement}"
+                for statement, query_seconds in queries
+            ),
+        )
+    return response
+
+
+def set_metrics_dir(path):
+    """Share /metrics between the processes of serve.py through files in
+    path, see metrics.SharedMetrics.
+    """
+    global shared_metrics
+    shared_metrics = metrics.SharedMetrics(path, request_metrics, extra_metrics)
+
+
+def extra_metrics():
+    """Return cache and replica metrics of this process, see Metrics.render()."""
+    render_cache = to_md.render_cache_info()
+    user_cache_stats = session_user_cache.stats()
+    extra = [
+        (
+            "catboard_render_cache_hits_total",
+            "Markdown render cache hits.",
+            "counter",
+            render_cache["hits"],
+        ),
+        (
+            "catboard_render_cache_misses_total",
+            "Markdown render cache misses.",
+            "counter",
+            render_cache["misses"],
+        ),
+        (
+            "catboard_render_cache_size",
+            "Markdown render cache entries.",
+            "gauge",
+            render_cache["size"],
+        ),
+        (
+            "catboard_user_cache_hits_total",
+            "Logged in user cache hits.",
+            "counter",
+            user_cache_stats["hits"],
+        ),
+        (
+            "catboard_user_cache_misses_total",
+            "Logged in user cache misses.",
+            "counter",
+            user_cache_stats["misses"],
+        ),
+    ]
+    if replica_pool is not None:
+        replica_stats = replica_pool.stats()
+        extra += [
+            (
+                "catboard_replica_reads_total",
+                "Requests served from a read replica.",
+                "counter",
+                replica_stats["reads"],
+            ),
+            (
+                "catboard_replica_fallbacks_total",
+                "Read only requests served from the primary as no replica was up.",
+                "counter",
+                replica_stats["fallbacks"],
+            ),
+            (
+                "catboard_replicas_up",
+                "Read replicas that passed their last check.",
+                "gauge",
+                replica_stats["up"],
+            ),
+        ]
+    return extra
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Return request and cache metrics for Prometheus.
+
+    Only served with METRICS_TOKEN set, and the token has to be given as
+    a bearer token. Under serve.py the metrics are of all the workers,
+    otherwise of this process.
+    """
+    token = app.config["METRICS_TOKEN"]
+    if not token:
+        return flask.abort(404)
+    if not secrets.compare_digest(
+        flask.request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return flask.abort(403)
+    if shared_metrics is not None:
+        text = shared_metrics.render()
+    else:
+        text = request_metrics.render(extra_metrics())
+    return flask.Response(text, mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/")
 @login_required
 def index():
@@ -281,34 +1246,374 @@ def index():
     return flask.redirect(flask.url_for("boards"))
 
 
-def export_rows(cls):
-    """Export sqlalchemy class table data to json."""
-    rows = [x.__dict__ for x in cls.query.all()]
-    for row in rows:
-        del row["_sa_instance_state"]
-    return rows
+# in foreign key dependency order, so that imports can insert tables as they arrive
+export_tables = [
+    Board,
+    Lane,
+    Column,
+    Item,
+    ItemTransition,
+    ItemRelationship,
+    ArchivedItem,
+    ArchivedItemTransition,
+    ArchivedItemRelationship,
+    ItemChecklist,
+]
+
+
+def export_rows(cls, batch_size=1000):
+    """Yield sqlalchemy class table rows as dicts.
+
+    Rows are streamed from the database in batches, so memory use does
+    not depend on table size. Deferred columns (render caches) are
+    skipped.
+    """
+    columns = [
+        prop.columns[0] for prop in db.inspect(cls).column_attrs if not prop.deferred
+    ]
+    result = db.session.execute(
+        db.select(*columns)
+        .order_by(*cls.__table__.primary_key.columns)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in result:
+        yield dict(row._mapping)
+
+
+def export_json_chunks():
+    """Yield all catboard data as chunks of one json document.
+
+    The document has the same shape as the old in-memory export: table
+    names mapping to lists of rows, one row per line.
+    """
+    yield "{\n"
+    for table_idx, cls in enumerate(export_tables):
+        yield f"{json.dumps(cls.__name__)}: ["
+        for row_idx, row in enumerate(export_rows(cls)):
+            yield ("\n" if row_idx == 0 else ",\n") + json.dumps(row)
+        yield "\n]" + (",\n" if table_idx < len(export_tables) - 1 else "\n")
+    yield "}\n"
 
 
 @app.route("/export_data")
 @login_required
+@read_replica
 def export_data():
     """Export all catboard data to json."""
-    data = {
-        "Item": export_rows(Item),
-        "ItemTransition": export_rows(ItemTransition),
-        "ItemRelationship": export_rows(ItemRelationship),
-        "Column": export_rows(Column),
-        "Lane": export_rows(Lane),
-        "Board": export_rows(Board),
-    }
-    return json.dumps(data, indent=4)
+    return flask.Response(
+        flask.stream_with_context(export_json_chunks()),
+        mimetype="application/json",
+    )
+
 
+def import_rows(rows, cls, batch_size=1000, progress=None):
+    """Insert json dicts into a sqlalchemy class table in batches.
 
-def import_rows(rows, cls):
-    """Import json dict to sqlalchemy table."""
+    Uses core executemany inserts instead of one ORM object per row.
+    Keys that aren't columns of the table are ignored. Returns the
+    number of rows inserted.
+    """
+    table = cls.__table__
+    keys = None
+    batch = []
+    count = 0
     for row in rows:
-        obj = cls(**row)
-        db.session.add(obj)
+        if keys is None:
+            keys = [c.name for c in table.columns if c.name in row]
+        batch.append({key: row.get(key) for key in keys})
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+            if progress:
+                progress(cls.__name__, count)
+    if batch:
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    if progress:
+        progress(cls.__name__, count)
+    return count
+
+
+def fix_sequences(classes):
+    """Move postgresql id sequences past imported ids."""
+    if db.engine.dialect.name != "postgresql":
+        return
+    for cls in classes:
+        table = db.engine.dialect.identifier_preparer.quote(cls.__tablename__)
+        db.session.execute(
+            db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table}"
+            )
+        )
+
+
+def import_tables(tables, batch_size=1000, progress=None):
+    """Import (table name, rows) pairs, such as from json_stream.iter_tables.
+
+    Tables are inserted as they arrive if the tables they depend on are
+    already in; tables that arrive early (as in exports written before
+    export_tables was in dependency order) are spooled to a temporary
+    file and inserted once they can be. Everything is committed in one
+    transaction.
+
+    Exports from before lane and column positions have the order as
+    comma separated ids in Board.lanes_sorted and Lane.columns_sorted,
+    which are turned into positions after the rows are in.
+    """
+    classes = {cls.__name__: cls for cls in export_tables}
+    pending = dict()
+    done = set()
+    # (parent column, parent id, comma separated child ids)
+    legacy_orders = []
+
+    def find_legacy_orders(name, rows):
+        key, parent_column = {
+            "Board": ("lanes_sorted", Lane.board_id),
+            "Lane": ("columns_sorted", Column.lane_id),
+        }[name]
+        for row in rows:
+            if row.get(key):
+                legacy_orders.append((parent_column, row["id"], row[key]))
+            yield row
+
+    def ready(cls):
+        idx = export_tables.index(cls)
+        return all(dep.__name__ in done for dep in export_tables[:idx])
+
+    def insert_pending():
+        inserted = True
+        while inserted:
+            inserted = False
+            for name, spool in list(pending.items()):
+                if ready(classes[name]):
+                    spool.seek(0)
+                    rows = (json.loads(line) for line in spool)
+                    import_rows(rows, classes[name], batch_size, progress)
+                    spool.close()
+                    del pending[name]
+                    done.add(name)
+                    inserted = True
+
+    for name, rows in tables:
+        if name not in classes:
+            continue
+        if name in ("Board", "Lane"):
+            rows = find_legacy_orders(name, rows)
+        if ready(classes[name]):
+            import_rows(rows, classes[name], batch_size, progress)
+            done.add(name)
+            insert_pending()
+        else:
+            spool = tempfile.TemporaryFile("w+")
+            for row in rows:
+                spool.write(json.dumps(row) + "\n")
+            pending[name] = spool
+
+    for spool in pending.values():
+        spool.close()
+    if pending:
+        raise ValueError(f"missing tables in import: {sorted(classes.keys() - done)}")
+    for parent_column, parent_id, sorted_ids in legacy_orders:
+        ids = [int(x) for x in sorted_ids.split(",") if x.strip().isdigit()]
+        renumber_positions(parent_column, parent_id, ids)
+    if "ItemChecklist" not in done:
+        # exports from before checklists were stored
+        sync_checklists()
+    fix_sequences(export_tables)
+    db.session.commit()
+
+
+def print_import_progress(table_name, count):
+    print(f"imported {count} {table_name} rows")
+
+
+def archivable_item_groups(before_epochtime):
+    """Return lists of ids of closed items to archive together.
+
+    Closed items qualify if they haven't moved since before_epochtime.
+    Items related to each other (such as subtasks) are archived together
+    or not at all, so the items related to an item that stays, stay too.
+    The newest item, transition and relationship also stay, since
+    sqlite and mysql give new rows the largest id + 1, which would make
+    the ids of archived rows be used again.
+    """
+    candidates = {
+        item_id
+        for (item_id,) in db.session.query(Item.id)
+        .outerjoin(ItemTransition, ItemTransition.item_id == Item.id)
+        .filter(Item.closed.is_(True))
+        .group_by(Item.id)
+        .having(
+            db.func.coalesce(db.func.max(ItemTransition.epochtime), 0)
+            < before_epochtime
+        )
+    }
+    for cls, item_id_columns in [
+        (Item, [Item.id]),
+        (ItemTransition, [ItemTransition.item_id]),
+        (ItemRelationship, [ItemRelationship.item1_id, ItemRelationship.item2_id]),
+    ]:
+        newest = db.session.query(*item_id_columns).order_by(cls.id.desc()).first()
+        candidates.difference_update(newest or [])
+
+    related = collections.defaultdict(set)
+    for item1_id, item2_id in db.session.query(
+        ItemRelationship.item1_id, ItemRelationship.item2_id
+    ):
+        related[item1_id].add(item2_id)
+        related[item2_id].add(item1_id)
+    staying = [item_id for item_id in related if item_id not in candidates]
+    while staying:
+        for item_id in related[staying.pop()]:
+            if item_id in candidates:
+                candidates.remove(item_id)
+                staying.append(item_id)
+
+    groups = []
+    grouped = set()
+    for item_id in sorted(candidates):
+        if item_id in grouped:
+            continue
+        group = [item_id]
+        grouped.add(item_id)
+        # the group grows as it's walked
+        for member_id in group:
+            for related_id in related[member_id]:
+                if related_id not in grouped:
+                    grouped.add(related_id)
+                    group.append(related_id)
+        groups.append(group)
+    return groups
+
+
+def copy_rows(from_cls, to_cls, condition, **values):
+    """Copy the rows of from_cls matching condition into to_cls, with ids.
+
+    Columns that only to_cls has are set from values, in one INSERT ...
+    SELECT statement.
+    """
+    from_columns = from_cls.__table__.columns
+    names = [
+        c.name
+        for c in to_cls.__table__.columns
+        if c.name in from_columns and c.name not in values
+    ]
+    db.session.execute(
+        to_cls.__table__.insert().from_select(
+            names + list(values),
+            db.select(
+                *[from_columns[name] for name in names],
+                *[db.literal(value) for value in values.values()],
+            ).where(condition),
+        )
+    )
+
+
+def archive_item_rows(item_ids):
+    """Move items, their transitions and relationships to the archive tables.
+
+    The relationships of the items must only be between them. Commits.
+    """
+    board_ids = sorted(set(item_board_ids(item_ids).values()))
+    copy_rows(
+        Item, ArchivedItem, Item.id.in_(item_ids), archived_epochtime=int(time.time())
+    )
+    copy_rows(
+        ItemTransition, ArchivedItemTransition, ItemTransition.item_id.in_(item_ids)
+    )
+    copy_rows(
+        ItemRelationship,
+        ArchivedItemRelationship,
+        ItemRelationship.item1_id.in_(item_ids),
+    )
+    ItemRelationship.query.filter(ItemRelationship.item1_id.in_(item_ids)).delete(
+        synchronize_session=False
+    )
+    # rebuilt from the description by restore_items()
+    ItemChecklist.query.filter(ItemChecklist.item_id.in_(item_ids)).delete(
+        synchronize_session=False
+    )
+    ItemTransition.query.filter(ItemTransition.item_id.in_(item_ids)).delete(
+        synchronize_session=False
+    )
+    Item.query.filter(Item.id.in_(item_ids)).delete(synchronize_session=False)
+    for board_id in board_ids:
+        touch_board(board_id)
+    db.session.commit()
+
+
+def archive_items(before_epochtime, batch_size=500, progress=None):
+    """Archive closed items that haven't moved since before_epochtime.
+
+    Items are moved in transactions of about batch_size items, so that
+    the item table isn't locked for long. Archived items are still shown
+    by the item pages and board history, and can be moved back with
+    restore_items(). Returns the number of items archived.
+    """
+    count = 0
+    batch = []
+    groups = archivable_item_groups(before_epochtime)
+    for group_idx, group in enumerate(groups):
+        batch += group
+        if len(batch) >= batch_size or group_idx == len(groups) - 1:
+            archive_item_rows(batch)
+            count += len(batch)
+            batch = []
+            if progress:
+                progress(count)
+    return count
+
+
+def restore_items(item_id):
+    """Move an archived item and the items related to it out of the archive.
+
+    Returns the ids of the restored items, or an empty list if the item
+    isn't archived. Commits.
+    """
+    if not db.session.get(ArchivedItem, item_id):
+        return []
+    item_ids = {int(item_id)}
+    new_ids = set(item_ids)
+    while new_ids:
+        rels = db.session.query(
+            ArchivedItemRelationship.item1_id, ArchivedItemRelationship.item2_id
+        ).filter(
+            db.or_(
+                ArchivedItemRelationship.item1_id.in_(new_ids),
+                ArchivedItemRelationship.item2_id.in_(new_ids),
+            )
+        )
+        new_ids = {related_id for rel in rels for related_id in rel} - item_ids
+        item_ids |= new_ids
+    item_ids = sorted(item_ids)
+
+    copy_rows(ArchivedItem, Item, ArchivedItem.id.in_(item_ids))
+    copy_rows(
+        ArchivedItemTransition,
+        ItemTransition,
+        ArchivedItemTransition.item_id.in_(item_ids),
+    )
+    copy_rows(
+        ArchivedItemRelationship,
+        ItemRelationship,
+        ArchivedItemRelationship.item1_id.in_(item_ids),
+    )
+    ArchivedItemRelationship.query.filter(
+        ArchivedItemRelationship.item1_id.in_(item_ids)
+    ).delete(synchronize_session=False)
+    ArchivedItemTransition.query.filter(
+        ArchivedItemTransition.item_id.in_(item_ids)
+    ).delete(synchronize_session=False)
+    ArchivedItem.query.filter(ArchivedItem.id.in_(item_ids)).delete(
+        synchronize_session=False
+    )
+    sync_checklists(item_ids)
+    for board_id in sorted(set(item_board_ids(item_ids).values())):
+        touch_board(board_id)
+    db.session.commit()
+    return item_ids
 
 
 @app.route("/import_data_from_instance", methods=["POST"])
@@ -320,23 +1625,15 @@ def import_data_from_instance():
     print(catboard_export_url)
     import requests
 
-    data = requests.get(catboard_export_url).json()
-    import_data(data)
+    with requests.get(catboard_export_url, stream=True) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        f = io.TextIOWrapper(r.raw, encoding="utf-8")
+        import_tables(json_stream.iter_tables(f), progress=print_import_progress)
 
     return flask.redirect(flask.url_for("index"))
 
 
-def import_data(data):
-    """Import data from json."""
-    import_rows(data["Board"], Board)
-    import_rows(data["Lane"], Lane)
-    import_rows(data["Column"], Column)
-    import_rows(data["ItemRelationship"], ItemRelationship)
-    import_rows(data["ItemTransition"], ItemTransition)
-    import_rows(data["Item"], Item)
-    db.session.commit()
-
-
 @app.route("/import_data", methods=["POST"])
 @login_required
 def app_import_data():
@@ -346,119 +1643,550 @@ def app_import_data():
 
         curl -X POST -H "Content-Type: application/json" -d @data.json http://127.0.0.1:7777/import_data
     """
-    data = flask.request.json
-    import_data(data)
+    f = io.TextIOWrapper(flask.request.stream, encoding="utf-8")
+    import_tables(json_stream.iter_tables(f), progress=print_import_progress)
     return "OK"
 
 
+# board id -> (board version, summary)
+board_summary_cache = dict()
+board_summary_cache_lock = threading.Lock()
+
+
+def board_summaries(boards):
+    """Return dict of board id to the lanes, column item counts and last
+    item move of each of boards, for the board index.
+
+    Summaries are cached per board until its change counter changes.
+    Those that aren't cached are loaded with one aggregate query, grouped
+    by column, for all the boards at once.
+    """
+    summaries = dict()
+    stale = dict()
+    with board_summary_cache_lock:
+        for board in boards:
+            version, summary = board_summary_cache.get(board.id, (None, None))
+            if version == board.version:
+                summaries[board.id] = summary
+            else:
+                stale[board.id] = board.version
+    if not stale:
+        return summaries
+
+    last_moved = (
+        db.select(db.func.max(ItemTransition.epochtime))
+        .where(ItemTransition.to_column_id == Column.id)
+        .scalar_subquery()
+    )
+    group_by = [
+        Lane.board_id,
+        Lane.id,
+        Lane.name,
+        Lane.hidden,
+        Lane.position,
+        Column.id,
+        Column.name,
+        Column.hidden,
+        Column.position,
+    ]
+    rows = (
+        db.session.query(
+            Lane.board_id,
+            Lane.id.label("lane_id"),
+            Lane.name.label("lane_name"),
+            Lane.hidden.label("lane_hidden"),
+            Column.id.label("column_id"),
+            Column.name.label("column_name"),
+            Column.hidden.label("column_hidden"),
+            db.func.count(Item.id).label("items"),
+            db.func.sum(db.case((Item.closed, 1), else_=0)).label("closed_items"),
+            last_moved.label("last_moved"),
+        )
+        .outerjoin(Column, Column.lane_id == Lane.id)
+        .outerjoin(Item, Item.column_id == Column.id)
+        .filter(Lane.board_id.in_(stale))
+        .group_by(*group_by)
+        .order_by(Lane.board_id, Lane.position, Lane.id, Column.position, Column.id)
+        .all()
+    )
+
+    for board_id in stale:
+        summaries[board_id] = SimpleNamespace(
+            lanes=[], open_items=0, closed_items=0, last_activity=None
+        )
+    for (board_id, lane_id), lane_rows in itertools.groupby(
+        rows, lambda row: (row.board_id, row.lane_id)
+    ):
+        lane_rows = list(lane_rows)
+        summary = summaries[board_id]
+        # moves into hidden columns count as activity too
+        for row in lane_rows:
+            if row.last_moved and (summary.last_activity or 0) < row.last_moved:
+                summary.last_activity = row.last_moved
+        if lane_rows[0].lane_hidden:
+            continue
+        lane = SimpleNamespace(id=lane_id, name=lane_rows[0].lane_name, columns=[])
+        for row in lane_rows:
+            # lanes without columns have one row with no column
+            if row.column_id is None or row.column_hidden:
+                continue
+            closed_items = row.closed_items or 0
+            lane.columns.append(
+                SimpleNamespace(
+                    id=row.column_id,
+                    name=row.column_name,
+                    open_items=row.items - closed_items,
+                    closed_items=closed_items,
+                )
+            )
+            summary.open_items += row.items - closed_items
+            summary.closed_items += closed_items
+        summary.lanes.append(lane)
+
+    with board_summary_cache_lock:
+        for board_id, version in stale.items():
+            board_summary_cache[board_id] = (version, summaries[board_id])
+    return summaries
+
+
 @app.route("/boards", methods=["GET", "POST"])
 @login_required
+@read_replica
 def boards():
     """Return boards template."""
     boards = current_user.boards
     if flask.request.method == "GET":
-        return flask.render_template(
-            "boards.jinja2",
-            boards=boards,
-            title="Board index",
-            now=datetime.datetime.now(),
+        import humanize
+
+        time_now = int(time.time())
+
+        def nice_time(t2):
+            return humanize.naturaltime(
+                dt.timedelta(seconds=(time_now - t2))
+            ).capitalize()
+
+        def render():
+            return flask.render_template(
+                "boards.jinja2",
+                boards=boards,
+                summaries=board_summaries(
+                    [board for board in boards if not board.closed]
+                ),
+                nice_time=nice_time,
+                title="Board index",
+                now=datetime.datetime.now(),
+            )
+
+        # relative times on the page change every minute
+        minute = time_now // 60
+        return conditional_response(
+            [[[board.id, board.version] for board in boards], minute],
+            max([board.modified_epochtime for board in boards] + [minute * 60]),
+            render,
         )
     if flask.request.method == "POST":
         unsafe_new_board_name = flask.request.form.get("new_board_name")
         # make new board with some defaults
         b = Board(name=unsafe_new_board_name)
-        lane = Lane(name="Default")
-        lane.columns.append(Column(name="Backlog"))
-        lane.columns.append(Column(name="Ready"))
-        c = Column(name="WIP")
-        c.items.append(
+        lane = Lane(name="Default", position=position_gap)
+        for idx, name in enumerate(
+            ["Backlog", "Ready", "WIP", "Blocked", "QA", "Done"]
+        ):
+            lane.columns.append(Column(name=name, position=(idx + 1) * position_gap))
+        lane.columns[2].items.append(
             Item(
                 name="Click column to add items",
                 assigned="",
                 color="w3-indigo",
                 closed=False,
                 description="",
+                position=position_gap,
             )
         )
-        lane.columns.append(c)
-        lane.columns.append(Column(name="Blocked"))
-        lane.columns.append(Column(name="QA"))
-        lane.columns.append(Column(name="Done"))
         b.lanes.append(lane)
 
         db.session.add(b)
-        current_user.boards.append(b)
+        db.session.flush()
+        db.session.execute(
+            user_board.insert().values(user_id=current_user.id, board_id=b.id)
+        )
+        touch_user(current_user.id)
         db.session.commit()
+        invalidate_board_access()
         return flask.redirect(flask.url_for("boards"))
 
 
-def prev_and_next_elems(elems, elem):
-    """Given a list element, return the elements right before and after."""
-    if not elems or elem not in elems:
-        return None, None
-    if type(elems) == str:
-        elems = elems.split(",")
-    idx = elems.index(elem)
-    prev_elem = None
-    if idx > 0:
-        prev_elem = elems[idx - 1]
-    next_elem = None
-    if idx < len(elems) - 1:
-        next_elem = elems[idx + 1]
-    return prev_elem, next_elem
+def board_snapshot(board, show_closed=False):
+    """Load the lanes, columns and items of a board for rendering.
+
+    Uses a fixed number of queries (one each for lanes, columns and
+    items) regardless of board size, ordered by position in the database
+    with hidden lanes and columns left out. The show_closed filter is
+    applied once. Returns a list of plain lane objects, each holding its
+    ordered columns, each holding its items.
+    """
+    lanes = (
+        db.session.query(Lane.id, Lane.name, Lane.closed)
+        .filter(Lane.board_id == board.id, Lane.hidden.is_(False))
+        .order_by(Lane.position, Lane.id)
+        .all()
+    )
+    columns = (
+        db.session.query(Column.id, Column.name, Column.closed, Column.lane_id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(
+            Lane.board_id == board.id,
+            Lane.hidden.is_(False),
+            Column.hidden.is_(False),
+        )
+        .order_by(Column.position, Column.id)
+        .all()
+    )
+    items = (
+        db.session.query(
+            Item.id,
+            Item.name,
+            Item.assigned,
+            Item.color,
+            Item.closed,
+            Item.column_id,
+            Item.position,
+            Item.checklist_done,
+            Item.checklist_total,
+        )
+        .join(Column, Item.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(
+            Lane.board_id == board.id,
+            Lane.hidden.is_(False),
+            Column.hidden.is_(False),
+        )
+        .order_by(Item.position, Item.id)
+        .all()
+    )
+
+    items_by_column = dict()
+    for item in items:
+        if show_closed or not item.closed:
+            items_by_column.setdefault(item.column_id, []).append(
+                SimpleNamespace(**item._asdict())
+            )
+
+    columns_by_lane = dict()
+    for column in columns:
+        if show_closed or not column.closed:
+            columns_by_lane.setdefault(column.lane_id, []).append(
+                SimpleNamespace(
+                    id=column.id,
+                    name=column.name,
+                    closed=column.closed,
+                    items=items_by_column.get(column.id, []),
+                )
+            )
+
+    snapshot = [
+        SimpleNamespace(
+            id=lane.id,
+            name=lane.name,
+            closed=lane.closed,
+            columns=columns_by_lane.get(lane.id, []),
+        )
+        for lane in lanes
+        if show_closed or not lane.closed
+    ]
+    for idx, lane in enumerate(snapshot):
+        lane.prev_lane_id = snapshot[idx - 1].id if idx > 0 else None
+        lane.next_lane_id = snapshot[idx + 1].id if idx < len(snapshot) - 1 else None
+    return snapshot
 
 
 @app.route("/board/<board_id>")
 @login_required
+@read_replica
 def board(board_id):
     """Return board template."""
-    board = or_404(Board.query.filter_by(id=board_id).first())
+    board = get_board_or_404(board_id)
     show_closed = flask.request.args.get("show_closed")
 
-    if board not in current_user.boards:
-        flask.abort(403)
+    return conditional_response(
+        [board.version],
+        board.modified_epochtime,
+        lambda: flask.render_template(
+            "board.jinja2",
+            board=board,
+            lanes=board_snapshot(board, show_closed),
+            colors=colors,
+            last_event_id=last_board_event_id(board.id),
+            title=board.name,
+        ),
+    )
 
-    return flask.render_template(
-        "board.jinja2",
-        board=board,
-        show_closed=show_closed,
-        title=board.name,
-        prev_and_next_elems=prev_and_next_elems,
+
+def last_board_event_id(board_id):
+    """Return the id of the board's latest event, or 0."""
+    return (
+        db.session.query(db.func.max(BoardEvent.id))
+        .filter(BoardEvent.board_id == board_id)
+        .scalar()
+        or 0
+    )
+
+
+@app.route("/board/<board_id>/events")
+@login_required
+def board_events(board_id):
+    """Return the board's changes after the "after" event id as json.
+
+    Board pages poll this every EVENT_POLL_SECONDS instead of holding a
+    connection open, so no server thread waits on viewers. The response
+    is conditional on the board's change counter, so polls of a board
+    that hasn't changed are answered with 304 without looking at events.
+    Viewers that are too far behind, or asked for pruned events, get a
+    "changed" event and reload the page.
+    """
+    board = get_board_or_404(board_id)
+    try:
+        after = int(flask.request.args.get("after", 0))
+    except ValueError:
+        return flask.abort(400)
+    max_events = 100
+
+    def render():
+        # after is a board event, unless it and maybe later ones were pruned
+        oldest_id = (
+            db.session.query(db.func.min(BoardEvent.id))
+            .filter(BoardEvent.board_id == board.id)
+            .scalar()
+        )
+        events = (
+            db.session.query(BoardEvent.id, BoardEvent.kind, BoardEvent.data)
+            .filter(BoardEvent.board_id == board.id, BoardEvent.id > after)
+            .order_by(BoardEvent.id)
+            .limit(max_events + 1)
+            .all()
+        )
+        if len(events) > max_events or (after and oldest_id and after < oldest_id):
+            # too far behind, the viewer should reload instead
+            events = [(last_board_event_id(board.id), "changed", None)]
+        return {
+            "events": [
+                {"id": event_id, "kind": kind, "data": json.loads(data or "{}")}
+                for event_id, kind, data in events
+            ]
+        }
+
+    return conditional_response([board.version], 0, render)
+
+
+def parse_history_cursor(before):
+    """Parse a "<epochtime>,<id>" history page cursor, or return None."""
+    if not before:
+        return None
+    try:
+        epochtime, transition_id = before.split(",")
+        return int(epochtime), int(transition_id)
+    except ValueError:
+        return flask.abort(400)
+
+
+def transitions_page_rows(transition_cls, item_cls, board, before, page_size):
+    """Return up to page_size + 1 rows of board_transitions_page() from
+    one transition table."""
+    from_column = db.aliased(Column)
+    to_column = db.aliased(Column)
+    query = (
+        db.session.query(
+            transition_cls.id,
+            transition_cls.epochtime,
+            transition_cls.item_id,
+            item_cls.name.label("item_name"),
+            transition_cls.from_column_id,
+            from_column.name.label("from_column_name"),
+            transition_cls.to_column_id,
+            to_column.name.label("to_column_name"),
+        )
+        .join(item_cls, transition_cls.item_id == item_cls.id)
+        .join(to_column, transition_cls.to_column_id == to_column.id)
+        .join(Lane, to_column.lane_id == Lane.id)
+        .outerjoin(from_column, transition_cls.from_column_id == from_column.id)
+        .filter(Lane.board_id == board.id)
+        .filter(
+            db.or_(
+                transition_cls.from_column_id.is_(None),
+                transition_cls.from_column_id != transition_cls.to_column_id,
+            )
+        )
+    )
+    if before:
+        epochtime, transition_id = before
+        query = query.filter(
+            db.or_(
+                transition_cls.epochtime < epochtime,
+                db.and_(
+                    transition_cls.epochtime == epochtime,
+                    transition_cls.id < transition_id,
+                ),
+            )
+        )
+    return (
+        query.order_by(transition_cls.epochtime.desc(), transition_cls.id.desc())
+        .limit(page_size + 1)
+        .all()
     )
 
 
+def board_transitions_page(board, before=None, page_size=100):
+    """Return one page of a board's transitions, newest first.
+
+    Transitions are selected by the board of their destination column,
+    and paged with a keyset cursor of (epochtime, id) so that deep pages
+    cost the same as the first one. The transitions of archived items
+    are read with a second query and merged in. Returns the rows and the
+    cursor for the next page (None on the last page.)
+    """
+    import heapq
+
+    rows = list(
+        itertools.islice(
+            heapq.merge(
+                transitions_page_rows(ItemTransition, Item, board, before, page_size),
+                transitions_page_rows(
+                    ArchivedItemTransition, ArchivedItem, board, before, page_size
+                ),
+                key=lambda row: (row.epochtime, row.id),
+                reverse=True,
+            ),
+            page_size + 1,
+        )
+    )
+    next_before = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_before = f"{rows[-1].epochtime},{rows[-1].id}"
+    return rows, next_before
+
+
 @app.route("/board/<board_id>/history")
 @login_required
+@read_replica
 def board_history(board_id):
     """Return board history template."""
-    board = or_404(Board.query.filter_by(id=board_id).first())
+    board = get_board_or_404(board_id)
 
-    if board not in current_user.boards:
-        flask.abort(403)
+    import humanize
 
     time_now = int(time.time())
 
     def nice_time(t2):
         return humanize.naturaltime(dt.timedelta(seconds=(time_now - t2))).capitalize()
 
-    if flask.request.method == "GET":
-        board_transitions = list()
-        for lane in board.lanes:
-            for column in lane.columns:
-                for item in column.items:
-                    board_transitions += item.transitions
-        board_transitions = sorted(
-            board_transitions, key=lambda x: x.epochtime, reverse=True
-        )
+    def render():
+        before = parse_history_cursor(flask.request.args.get("before"))
+        board_transitions, next_before = board_transitions_page(board, before)
         return flask.render_template(
             "board_history.jinja2",
             board=board,
             title=board.name,
             board_transitions=board_transitions,
+            next_before=next_before,
             nice_time=nice_time,
             time_now=time_now,
         )
 
+    # relative times on the page change every minute
+    minute = time_now // 60
+    return conditional_response(
+        [board.version, minute],
+        max(board.modified_epochtime, minute * 60),
+        render,
+    )
+
+
+def board_checklists_rollup(board):
+    """Return the open items with checklists on a board, by column.
+
+    Reads the stored checklists with one query in board order. Returns
+    a list of plain column objects with their items' entries and the
+    done and total counts of each item and column.
+    """
+    rows = (
+        db.session.query(
+            Column.id.label("column_id"),
+            Column.name.label("column_name"),
+            Lane.name.label("lane_name"),
+            Item.id,
+            Item.name,
+            Item.checklist_done,
+            Item.checklist_total,
+            ItemChecklist.text,
+            ItemChecklist.done,
+        )
+        .join(Column, Item.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .join(ItemChecklist, ItemChecklist.item_id == Item.id)
+        .filter(
+            Lane.board_id == board.id,
+            Lane.hidden.is_(False),
+            Column.hidden.is_(False),
+            Item.closed.is_(False),
+        )
+        .order_by(
+            Lane.position,
+            Lane.id,
+            Column.position,
+            Column.id,
+            Item.position,
+            Item.id,
+            ItemChecklist.position,
+        )
+        .all()
+    )
+    columns = []
+    for _, column_rows in itertools.groupby(rows, lambda row: row.column_id):
+        column_rows = list(column_rows)
+        column = SimpleNamespace(
+            id=column_rows[0].column_id,
+            name=column_rows[0].column_name,
+            lane_name=column_rows[0].lane_name,
+            items=[],
+        )
+        for _, item_rows in itertools.groupby(column_rows, lambda row: row.id):
+            item_rows = list(item_rows)
+            column.items.append(
+                SimpleNamespace(
+                    id=item_rows[0].id,
+                    name=item_rows[0].name,
+                    done=item_rows[0].checklist_done,
+                    total=item_rows[0].checklist_total,
+                    entries=[(row.done, row.text) for row in item_rows],
+                )
+            )
+        column.done = sum(item.done for item in column.items)
+        column.total = sum(item.total for item in column.items)
+        columns.append(column)
+    return columns
+
+
+@app.route("/board/<board_id>/checklists")
+@login_required
+@read_replica
+def board_checklists(board_id):
+    """Return the checklists of a board's open items, with their progress."""
+    board = get_board_or_404(board_id)
+
+    def render():
+        columns = board_checklists_rollup(board)
+        return flask.render_template(
+            "board_checklists.jinja2",
+            board=board,
+            title=board.name,
+            columns=columns,
+            done=sum(column.done for column in columns),
+            total=sum(column.total for column in columns),
+        )
+
+    return conditional_response([board.version], board.modified_epochtime, render)
+
 
 @app.route("/board/<board_id>/edit", methods=["GET", "POST"])
 @login_required
@@ -469,51 +2197,47 @@ def board_edit(board_id):
 
     The sorting can also be used to hide lanes.
     """
-    board = or_404(Board.query.filter_by(id=board_id).first())
-
-    if board not in current_user.boards:
-        flask.abort(403)
+    board = get_board_or_404(board_id)
 
     if flask.request.method == "GET":
-        lane_id_to_name = {lane.id: lane.name for lane in board.lanes}
         lane_names = [lane.name for lane in board.lanes]
-        lanes_sorted = None
-        if board.lanes_sorted:
-            lanes_sorted = [
-                lane_id_to_name[int(lane_id)]
-                for lane_id in board.lanes_sorted.split(",")
-            ]
+        lanes_sorted = [lane.name for lane in board.lanes if not lane.hidden]
 
         return flask.render_template(
             "board_edit.jinja2",
             board=board,
             title=board.name,
             lane_names=lane_names,
-            lane_id_to_name=lane_id_to_name,
             lanes_sorted=lanes_sorted,
         )
     if flask.request.method == "POST":
         if flask.request.form.get("Submit") == "Submit_rename_board":
             unsafe_new_board_name = flask.request.form.get("new_board_name")
             board.name = unsafe_new_board_name
+            touch_board(board.id)
             db.session.commit()
         if flask.request.form.get("Submit") == "Submit_new_lane":
             unsafe_new_lane_name = flask.request.form.get("new_lane_name")
-            for x in unsafe_new_lane_name.split(","):
-                board.lanes.append(Lane(name=x.strip()))
+            position = last_position(Lane.board_id, board.id)
+            for idx, x in enumerate(unsafe_new_lane_name.split(",")):
+                board.lanes.append(
+                    Lane(name=x.strip(), position=position + idx * position_gap)
+                )
+            touch_board(board.id)
             db.session.commit()
         if flask.request.form.get("Submit") == "Submit_lanes_sorted":
             unsafe_lanes_sorted = flask.request.form.get("lanes_sorted")
             lane_name_to_id = {lane.name: lane.id for lane in board.lanes}
             try:
-                board.lanes_sorted = ",".join(
-                    [
-                        str(lane_name_to_id[unsafe_lane_name.strip()])
-                        for unsafe_lane_name in unsafe_lanes_sorted.split(",")
-                    ]
-                )
+                lane_ids = [
+                    lane_name_to_id[unsafe_lane_name.strip()]
+                    for unsafe_lane_name in unsafe_lanes_sorted.split(",")
+                ]
             except Exception:
                 return flask.redirect(flask.url_for("board_edit", board_id=board_id))
+            # lanes left out are hidden
+            renumber_positions(Lane.board_id, board.id, lane_ids)
+            touch_board(board.id)
             db.session.commit()
         return flask.redirect(flask.url_for("board_edit", board_id=board_id))
 
@@ -526,21 +2250,12 @@ def lane_edit(lane_id):
     Here the user can rename the lane, move the lane to a different board,
     create a new column, and sort columns (which can also be used to hide columns.)
     """
-    lane = or_404(Lane.query.filter_by(id=lane_id).first())
-
-    if lane.board not in current_user.boards:
-        flask.abort(403)
+    lane = get_lane_or_404(lane_id)
 
     if flask.request.method == "GET":
         boards = current_user.boards
-        column_id_to_name = {column.id: column.name for column in lane.columns}
         column_names = [column.name for column in lane.columns]
-        columns_sorted = None
-        if lane.columns_sorted:
-            columns_sorted = [
-                column_id_to_name[int(column_id)]
-                for column_id in lane.columns_sorted.split(",")
-            ]
+        columns_sorted = [column.name for column in lane.columns if not column.hidden]
         return flask.render_template(
             "lane_edit.jinja2",
             lane=lane,
@@ -553,29 +2268,38 @@ def lane_edit(lane_id):
         if flask.request.form.get("Submit") == "Submit_rename_lane":
             unsafe_new_lane_name = flask.request.form.get("new_lane_name")
             lane.name = unsafe_new_lane_name
+            touch_board(lane.board_id)
             db.session.commit()
         if flask.request.form.get("Submit") == "Submit_move_board":
             unsafe_new_board_id = flask.request.form.get("new_board_id")
-            or_404(Board.query.filter_by(id=unsafe_new_board_id).first())
-            lane.board_id = unsafe_new_board_id
+            new_board = get_board_or_404(unsafe_new_board_id)
+            touch_board(lane.board_id)
+            touch_board(new_board.id)
+            lane.position = last_position(Lane.board_id, new_board.id)
+            lane.board_id = new_board.id
             db.session.commit()
         if flask.request.form.get("Submit") == "Submit_new_column":
             unsafe_new_column_name = flask.request.form.get("new_column_name")
-            for x in unsafe_new_column_name.split(","):
-                lane.columns.append(Column(name=x.strip()))
+            position = last_position(Column.lane_id, lane.id)
+            for idx, x in enumerate(unsafe_new_column_name.split(",")):
+                lane.columns.append(
+                    Column(name=x.strip(), position=position + idx * position_gap)
+                )
+            touch_board(lane.board_id)
             db.session.commit()
         if flask.request.form.get("Submit") == "Submit_columns_sorted":
             unsafe_columns_sorted = flask.request.form.get("columns_sorted")
             column_name_to_id = {column.name: column.id for column in lane.columns}
             try:
-                lane.columns_sorted = ",".join(
-                    [
-                        str(column_name_to_id[unsafe_column_name.strip()])
-                        for unsafe_column_name in unsafe_columns_sorted.split(",")
-                    ]
-                )
+                column_ids = [
+                    column_name_to_id[unsafe_column_name.strip()]
+                    for unsafe_column_name in unsafe_columns_sorted.split(",")
+                ]
             except Exception:
                 return flask.redirect(flask.url_for("lane_edit", lane_id=lane_id))
+            # columns left out are hidden
+            renumber_positions(Column.lane_id, lane.id, column_ids)
+            touch_board(lane.board_id)
             db.session.commit()
     return flask.redirect(flask.url_for("lane_edit", lane_id=lane_id))
 
@@ -584,10 +2308,7 @@ def extract_links(md_text):
     """Extract links from text."""
     if not md_text:
         return []
-    links = []
-    for group in to_md.link_patterns[0][0].findall(md_text):
-        links.append(group[0])
-    return links
+    return [md_text[start:end] for start, end in to_md.find_urls(md_text)]
 
 
 def url_is_image(link: str):
@@ -624,14 +2345,115 @@ def extract_checkboxes(text):
     return ret
 
 
+def checklist_rows(item_id, description):
+    """Return item_checklist rows and the checklist_done and checklist_total
+    of an item with description."""
+    checkboxes = extract_checkboxes(description)
+    rows = [
+        {
+            "item_id": item_id,
+            "position": idx,
+            "text": checkbox["text"],
+            "done": checkbox["done"],
+        }
+        for idx, checkbox in enumerate(checkboxes)
+    ]
+    return rows, sum(row["done"] for row in rows), len(rows)
+
+
+def sync_checklist(item):
+    """Store the checklist in an item's description when it's saved.
+
+    The entries go in item_checklist and the progress in the item's
+    checklist_done and checklist_total, so that pages showing checklists
+    don't parse descriptions.
+    """
+    rows, item.checklist_done, item.checklist_total = checklist_rows(
+        item.id, item.description
+    )
+    ItemChecklist.query.filter_by(item_id=item.id).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(ItemChecklist.__table__.insert(), rows)
+
+
+def sync_checklists(item_ids=None, batch_size=1000):
+    """Like sync_checklist() for the items with item_ids, or all items.
+
+    Descriptions are read in batches of batch_size. The caller commits.
+    """
+    delete = ItemChecklist.query
+    query = db.select(Item.id, Item.description).order_by(Item.id).limit(batch_size)
+    if item_ids is not None:
+        delete = delete.filter(ItemChecklist.item_id.in_(item_ids))
+        query = query.where(Item.id.in_(item_ids))
+    delete.delete(synchronize_session=False)
+    last_id = 0
+    while True:
+        items = db.session.execute(query.where(Item.id > last_id)).all()
+        if not items:
+            break
+        last_id = items[-1].id
+        rows = []
+        progress = []
+        for item_id, description in items:
+            item_rows, done, total = checklist_rows(item_id, description)
+            rows += item_rows
+            progress.append(
+                {"id": item_id, "checklist_done": done, "checklist_total": total}
+            )
+        if rows:
+            db.session.execute(ItemChecklist.__table__.insert(), rows)
+        db.session.execute(db.update(Item), progress)
+
+
+def sync_subtasks(item):
+    """Make item's subtask relationships match its description.
+
+    Every "subtask #N" in the description, where item N exists and is on
+    a board the user can access, becomes a relationship. Only the
+    relationships that changed are inserted or deleted, and the number of
+    queries doesn't depend on the number of subtasks.
+    """
+    subtask_ids = {int(x) for x in re.findall(r"subtask #(\d+)", item.description)}
+    board_ids = item_board_ids(subtask_ids)
+    wanted = set()
+    for subtask_id, board_id in board_ids.items():
+        # check if user has access to item
+        if board_id not in accessible_board_ids():
+            print("bad user :(")
+            continue
+        wanted.add(subtask_id)
+
+    existing = {
+        item2_id
+        for (item2_id,) in db.session.query(ItemRelationship.item2_id).filter_by(
+            item1_id=item.id, type=100
+        )
+    }
+    removed = existing - wanted
+    if removed:
+        ItemRelationship.query.filter(
+            ItemRelationship.item1_id == item.id,
+            ItemRelationship.type == 100,
+            ItemRelationship.item2_id.in_(removed),
+        ).delete(synchronize_session=False)
+    added = wanted - existing
+    if added:
+        db.session.execute(
+            ItemRelationship.__table__.insert(),
+            [
+                {"item1_id": item.id, "item2_id": subtask_id, "type": 100}
+                for subtask_id in sorted(added)
+            ],
+        )
+
+
 @app.route("/item/<item_id>", methods=["GET", "POST"])
 @login_required
+@read_replica
 def item(item_id):
     """Return page showing item/task details."""
-    item = or_404(Item.query.filter_by(id=item_id).first())
-
-    if item.column.lane.board not in current_user.boards:
-        flask.abort(403)
+    import humanize
 
     time_now = int(time.time())
 
@@ -639,53 +2461,57 @@ def item(item_id):
         return humanize.naturaltime(dt.timedelta(seconds=(time_now - t2))).capitalize()
 
     if flask.request.method == "GET":
-        rels = ItemRelationship.query.filter_by(item1_id=item.id, type=100).all()
-        links = extract_links(item.description)
-        images = [link for link in links if url_is_image(link)]
-        checkboxes = extract_checkboxes(item.description)
-        print(images)
-        return flask.render_template(
-            "item.jinja2",
-            item=item,
-            colors=colors,
-            title=item.name,
-            nice_time=nice_time,
-            rels=rels,
-            links=links,
-            images=images,
-            checkboxes=checkboxes,
+        versions, modified, archived = item_page_versions(item_id)
+
+        def render():
+            if archived:
+                item = get_archived_item_or_404(item_id)
+                relationship_cls = ArchivedItemRelationship
+                checkboxes = extract_checkboxes(item.description)
+            else:
+                item = get_item_or_404(item_id)
+                relationship_cls = ItemRelationship
+                checkboxes = (
+                    db.session.query(ItemChecklist.done, ItemChecklist.text)
+                    .filter_by(item_id=item.id)
+                    .order_by(ItemChecklist.position)
+                    .all()
+                )
+            rels = relationship_cls.query.filter_by(item1_id=item.id, type=100).all()
+            links = extract_links(item.description)
+            images = [link for link in links if url_is_image(link)]
+            print(images)
+            return flask.render_template(
+                "item.jinja2",
+                item=item,
+                colors=colors,
+                title=item.name,
+                nice_time=nice_time,
+                rels=rels,
+                links=links,
+                images=images,
+                checkboxes=checkboxes,
+                archived=archived,
+            )
+
+        # relative times on the page change every minute
+        minute = time_now // 60
+        return conditional_response(
+            [versions, minute], max(modified, minute * 60), render
         )
     if flask.request.method == "POST":
+        item = get_item_or_404(item_id)
         unsafe_new_assign = flask.request.form.get("new_assign_name")
         item.assigned = unsafe_new_assign
         unsafe_new_name = flask.request.form.get("new_name")
         item.name = unsafe_new_name
         unsafe_new_description = flask.request.form.get("new_description")
         item.description = unsafe_new_description
+        item.description_html = None
         if item.description:
-            ItemRelationship.query.filter_by(item1_id=item.id).delete()
-            db.session.commit()
-            subtask_ints = set()
-            for subtask in re.findall(r"subtask #(\d+)", item.description):
-                try:
-                    subtask_int = int(subtask)
-                except Exception:
-                    pass
-                item2 = Item.query.filter_by(id=subtask_int).first()
-                # check if item exists
-                if not item2:
-                    continue
-                # check if user has access to item
-                if item2.column.lane.board not in current_user.boards:
-                    print("bad user :(")
-                    continue
-                if subtask_int not in subtask_ints:
-                    db.session.add(
-                        ItemRelationship(
-                            item1_id=item.id, item2_id=subtask_int, type=100
-                        )
-                    )
-                    subtask_ints.add(subtask_int)
+            sync_subtasks(item)
+        sync_checklist(item)
+        touch_board(item_board_id(item.id), "item_updated", item)
 
         db.session.commit()
         if flask.request.form.get("Submit") == "Submit_print":
@@ -693,59 +2519,161 @@ def item(item_id):
         return flask.redirect(flask.url_for("item", item_id=item_id))
 
 
+def item_description_html(item):
+    """Return the item description rendered as html.
+
+    With PERSIST_RENDERED_HTML set, the rendered html is stored in the
+    item row and reused until the description is next saved, or until
+    the renderer changes. A render is only stored from the primary
+    database, so that a page view on a read replica doesn't write and
+    keep the user on the primary.
+    """
+    if not app.config["PERSIST_RENDERED_HTML"]:
+        return to_md.text_to_html(item.description)
+    version = to_md.renderer_version()
+    if item.description_html is None or item.description_html_version != version:
+        if "replica" in db.session.info:
+            return to_md.text_to_html(item.description)
+        item.description_html = to_md.text_to_html(item.description)
+        item.description_html_version = version
+        db.session.commit()
+    return item.description_html
+
+
 @app.route("/item/<item_id>/view")
 @login_required
+@read_replica
 def item_view(item_id):
     """Return page showing item/task description as rendered markdown."""
-    item = or_404(Item.query.filter_by(id=item_id).first())
-
-    if item.column.lane.board not in current_user.boards:
-        flask.abort(403)
-
-    return flask.render_template("item_view.jinja2", title=item.name, item=item)
+    versions, modified, archived = item_page_versions(item_id)
 
+    def render():
+        if archived:
+            item = get_archived_item_or_404(item_id)
+            description_html = to_md.text_to_html(item.description)
+        else:
+            item = get_item_or_404(item_id, db.undefer_group("description_html"))
+            description_html = item_description_html(item)
+        return flask.render_template(
+            "item_view.jinja2",
+            title=item.name,
+            item=item,
+            description_html=description_html,
+        )
 
-@app.route("/item/move/<item_id>/<column_id>")
-@login_required
-def item_move(item_id, column_id):
-    """Move item to different column and redirect back to item page."""
-    item = or_404(Item.query.filter_by(id=item_id).first())
+    return conditional_response(versions, modified, render)
 
-    if item.column.lane.board not in current_user.boards:
-        flask.abort(403)
 
-    if item.column.id == column_id:
-        return flask.redirect(flask.url_for("item", item_id=item_id))
-    column = or_404(Column.query.filter_by(id=column_id).first())
+def move_item(item, column_id, position=None):
+    """Move item to another column that the current user can access.
 
-    if column.lane.board not in current_user.boards:
-        flask.abort(403)
+    The item goes to position, or to the end of the column. Returns the
+    new transition and the id of the board the item is now on. The
+    caller commits.
+    """
+    board_ids = dict(
+        db.session.query(Column.id, Lane.board_id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(Column.id.in_([item.column_id, column_id]))
+        .all()
+    )
+    to_board_id = or_404(board_ids.get(column_id))
+    require_board_access(to_board_id)
+    from_board_id = board_ids[item.column_id]
+    if position is None:
+        position = last_position(Item.column_id, column_id)
 
     transition = ItemTransition(
         item_id=item.id,
-        from_column_id=item.column.id,
-        to_column_id=column.id,
+        from_column_id=item.column_id,
+        to_column_id=column_id,
         epochtime=int(time.time()),
     )
-    item.column = column
+    item.column_id = column_id
+    item.position = position
     db.session.add(transition)
-    db.session.commit()
+    touch_board(from_board_id, "item_moved", item)
+    if to_board_id != from_board_id:
+        touch_board(to_board_id, "item_moved", item)
+    return transition, to_board_id
+
+
+@app.route("/item/move/<item_id>/<int:column_id>")
+@login_required
+def item_move(item_id, column_id):
+    """Move item to different column and redirect back to item page."""
+    item = get_item_or_404(item_id)
+
+    if item.column_id != column_id:
+        move_item(item, column_id)
+        db.session.commit()
     return flask.redirect(flask.url_for("item", item_id=item_id))
 
 
+@app.route("/api/item/<item_id>/move", methods=["POST"])
+@login_required
+def api_item_move(item_id):
+    """Move item to the column in the json body, like {"column_id": 4}.
+
+    With "before_item_id": 7 the item is put right before item 7, which
+    must be in the column, otherwise at the end of the column. Items can
+    be reordered within their column that way. Returns the item's column
+    and position, the id of the new transition (null if the item already
+    was in the column) and the change counter of the board the item is
+    on.
+    """
+    data = flask.request.get_json(silent=True)
+    if (
+        not isinstance(data, dict)
+        or type(data.get("column_id")) is not int
+        or type(data.get("before_item_id", 0)) not in (int, type(None))
+    ):
+        return flask.abort(400)
+    item = get_item_or_404(item_id)
+    # before looking for before_item_id, which would tell whether items
+    # on other boards exist
+    column_id = get_column_or_404(data["column_id"]).id
+
+    before_item_id = data.get("before_item_id")
+    position = None
+    if before_item_id is not None and before_item_id != item.id:
+        position = position_before(
+            Item.column_id, column_id, before_item_id, exclude_id=item.id
+        )
+        if position is None:
+            return flask.abort(400)
+    transition = None
+    if item.column_id != column_id:
+        transition, board_id = move_item(item, column_id, position)
+        db.session.flush()
+    else:
+        board_id = item_board_ids([item.id])[item.id]
+        if position is not None and position != item.position:
+            item.position = position
+            touch_board(board_id, "item_moved", item)
+    board_version = db.session.query(Board.version).filter_by(id=board_id).scalar()
+    ret = {
+        "item_id": item.id,
+        "column_id": column_id,
+        "position": item.position,
+        "transition_id": transition.id if transition else None,
+        "board_version": board_version,
+    }
+    db.session.commit()
+    return ret
+
+
 @app.route("/lane/<lane_id>/move/<board_id>")
 @login_required
 def lane_move(lane_id, board_id):
     """Move lane to diferent board and redirect back to lane page."""
-    lane = or_404(Lane.query.filter_by(id=lane_id).first())
-    board = or_404(Board.query.filter_by(id=board_id).first())
-
-    if lane.board not in current_user.boards:
-        flask.abort(403)
-    if board not in current_user.boards:
-        flask.abort(403)
+    lane = get_lane_or_404(lane_id)
+    board = get_board_or_404(board_id)
 
-    lane.board_id = board_id
+    touch_board(lane.board_id)
+    touch_board(board.id)
+    lane.position = last_position(Lane.board_id, board.id)
+    lane.board_id = board.id
     db.session.commit()
     return flask.redirect(flask.url_for("lane_edit", lane_id=lane_id))
 
@@ -755,12 +2683,10 @@ def lane_move(lane_id, board_id):
 def item_color(item_id, color):
     """Change item color."""
     or_404(color in colors)
-    item = or_404(Item.query.filter_by(id=item_id).first())
-
-    if item.column.lane.board not in current_user.boards:
-        flask.abort(403)
+    item = get_item_or_404(item_id)
 
     item.color = color
+    touch_board(item_board_id(item.id), "item_updated", item)
     db.session.commit()
     return flask.redirect(flask.url_for("item", item_id=item_id))
 
@@ -769,54 +2695,142 @@ def item_color(item_id, color):
 @login_required
 def item_close_toggle(item_id):
     """Toggle item open/close state."""
-    item = or_404(Item.query.filter_by(id=item_id).first())
-
-    if item.column.lane.board not in current_user.boards:
-        flask.abort(403)
+    item = get_item_or_404(item_id)
 
     item.closed = not item.closed
+    touch_board(item_board_id(item.id), "item_closed", item)
     db.session.commit()
     return flask.redirect(flask.url_for("item", item_id=item_id))
 
 
+# most items that one bulk request can change
+bulk_items_max = 1000
+
+
+@app.route("/items/bulk", methods=["POST"])
+@login_required
+def items_bulk():
+    """Move, close, open or recolor many items, and return them as json.
+
+    Takes a json object like:
+
+        {"item_ids": [1, 2, 3], "action": "move", "column_id": 4}
+
+    where action is move (with column_id), close, open or color (with
+    color). Access to all the items is checked with one query, and all
+    changes are committed together. Items that are already as asked are
+    left alone and aren't returned.
+    """
+    data = flask.request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return flask.abort(400)
+    item_ids = data.get("item_ids")
+    action = data.get("action")
+    if (
+        not isinstance(item_ids, list)
+        or not 0 < len(item_ids) <= bulk_items_max
+        or not all(type(item_id) is int for item_id in item_ids)
+        or action not in ("move", "close", "open", "color")
+        or (action == "move" and type(data.get("column_id")) is not int)
+        or (action == "color" and data.get("color") not in colors)
+    ):
+        return flask.abort(400)
+    if action == "move":
+        column = get_column_or_404(data["column_id"])
+        to_board_id = (
+            db.session.query(Lane.board_id).filter_by(id=column.lane_id).scalar()
+        )
+
+    item_ids = set(item_ids)
+    rows = (
+        db.session.query(Item, Lane.board_id)
+        .join(Column, Item.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(Item.id.in_(item_ids))
+        .order_by(Item.position, Item.id)
+        .all()
+    )
+    or_404(len(rows) == len(item_ids))
+    for board_id in {board_id for _, board_id in rows}:
+        require_board_access(board_id)
+
+    now = int(time.time())
+    transitions = []
+    if action == "move":
+        # moved items go to the end of the column, in their order
+        position = last_position(Item.column_id, column.id)
+    # board id -> changed items on it
+    changed = dict()
+    for item, board_id in rows:
+        if action == "move":
+            if item.column_id == column.id:
+                continue
+            transitions.append(
+                {
+                    "item_id": item.id,
+                    "from_column_id": item.column_id,
+                    "to_column_id": column.id,
+                    "epochtime": now,
+                }
+            )
+            item.column_id = column.id
+            item.position = position
+            position += position_gap
+        elif action == "color":
+            if item.color == data["color"]:
+                continue
+            item.color = data["color"]
+        else:
+            closed = action == "close"
+            if item.closed == closed:
+                continue
+            item.closed = closed
+        changed.setdefault(board_id, []).append(item)
+
+    items = [item for board_items in changed.values() for item in board_items]
+    if transitions:
+        db.session.execute(ItemTransition.__table__.insert(), transitions)
+        changed[to_board_id] = items
+    kind = {"move": "item_moved", "color": "item_updated"}.get(action, "item_closed")
+    for board_id, board_items in changed.items():
+        touch_board(board_id, kind, items=board_items)
+    ret = {"items": [item_event_data(item) for item in items]}
+    db.session.commit()
+    return ret
+
+
 @app.route("/column/<column_id>/toggle")
 @login_required
 def column_close_toggle(column_id):
     """Toggle column open/close state."""
-    column = or_404(Column.query.filter_by(id=column_id).first())
-
-    if column.lane.board not in current_user.boards:
-        flask.abort(403)
+    column = get_column_or_404(column_id)
 
     column.closed = not column.closed
+    touch_board(column_board_id(column.id))
     db.session.commit()
-    return flask.redirect(flask.url_for("lane_edit", lane_id=column.lane.id))
+    return flask.redirect(flask.url_for("lane_edit", lane_id=column.lane_id))
 
 
 @app.route("/lane/<lane_id>/toggle")
 @login_required
 def lane_close_toggle(lane_id):
     """Toggle lane open/close state."""
-    lane = or_404(Lane.query.filter_by(id=lane_id).first())
-
-    if lane.board not in current_user.boards:
-        flask.abort(403)
+    lane = get_lane_or_404(lane_id)
 
     lane.closed = not lane.closed
+    touch_board(lane.board_id)
     db.session.commit()
-    return flask.redirect(flask.url_for("board_edit", board_id=lane.board.id))
+    return flask.redirect(flask.url_for("board_edit", board_id=lane.board_id))
 
 
 @app.route("/board/<board_id>/toggle")
 @login_required
 def board_close_toggle(board_id):
     """Toggle board open/close state."""
-    board = or_404(Board.query.filter_by(id=board_id).first())
-
-    if board not in current_user.boards:
-        flask.abort(403)
+    board = get_board_or_404(board_id)
 
     board.closed = not board.closed
+    touch_board(board.id)
     db.session.commit()
     return flask.redirect(flask.url_for("boards"))
 
@@ -825,10 +2839,7 @@ def board_close_toggle(board_id):
 @login_required
 def column_edit(column_id):
     """Return column edit page."""
-    column = or_404(Column.query.filter_by(id=column_id).first())
-
-    if column.lane.board not in current_user.boards:
-        flask.abort(403)
+    column = get_column_or_404(column_id)
 
     templates_dir = pathlib.Path("./item_templates")
     templates = [x.name for x in templates_dir.glob("*.txt")]
@@ -849,50 +2860,431 @@ def column_edit(column_id):
             unsafe_new_item_assigned = flask.request.form.get("new_item_assigned")
             unsafe_new_item_color = flask.request.form.get("new_item_color")
             unsafe_new_item_template = flask.request.form.get("new_item_template")
+            # before the item exists, since the query autoflushes
+            position = last_position(Item.column_id, column.id)
             item = Item(
                 name=unsafe_new_item_name,
                 assigned=unsafe_new_item_assigned,
                 color=unsafe_new_item_color,
                 closed=False,
                 column=column,
+                position=position,
             )
             if unsafe_new_item_template in templates:
                 with open(templates_dir / unsafe_new_item_template) as f:
                     item.description = f.read()
 
-            column.items.append(item)
+            db.session.add(item)
             db.session.commit()
             t = ItemTransition(
                 item_id=item.id, to_column_id=column.id, epochtime=int(time.time())
             )
             db.session.add(t)
+            if item.description:
+                sync_checklist(item)
+            touch_board(column_board_id(column.id), "item_created", item)
             db.session.commit()
             return flask.redirect(
-                flask.url_for("board", board_id=item.column.lane.board.id)
-                + f"#lane_{item.column.lane.id}"
+                flask.url_for("board", board_id=column.lane.board_id)
+                + f"#lane_{column.lane_id}"
             )
         if flask.request.form.get("Submit") == "Submit_rename_column":
             unsafe_new_column_name = flask.request.form.get("new_column_name")
             column.name = unsafe_new_column_name
+            touch_board(column_board_id(column.id))
             db.session.commit()
             return flask.redirect(
-                flask.url_for("board", board_id=column.lane.board.id)
-                + f"#lane_{column.lane.id}"
+                flask.url_for("board", board_id=column.lane.board_id)
+                + f"#lane_{column.lane_id}"
             )
 
 
 @app.route("/board/<board_id>/graph")
 @login_required
+@read_replica
 def board_graph(board_id):
     """Return board graph page."""
-    board = or_404(Board.query.filter_by(id=board_id).first())
-
-    if board not in current_user.boards:
-        flask.abort(403)
+    board = get_board_or_404(board_id)
 
     return flask.render_template("graph.jinja2", board=board)
 
 
+# board id -> (graph hash, node positions)
+graph_layout_cache = dict()
+graph_layout_cache_lock = threading.Lock()
+
+
+def board_graph_data(board):
+    """Return nodes and edges of the open items on a board, with layout.
+
+    Nodes and edges are loaded with one query each. The layout is
+    computed on the server and cached per board until the set of nodes
+    or relationships changes.
+    """
+    open_items = (
+        db.session.query(Item.id, Item.name, Column.name.label("column_name"))
+        .join(Column, Item.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(Lane.board_id == board.id)
+        .filter(db.not_(Lane.closed), db.not_(Column.closed), db.not_(Item.closed))
+        .order_by(Item.id)
+    )
+    nodes = open_items.all()
+    rels = (
+        db.session.query(
+            ItemRelationship.id, ItemRelationship.item1_id, ItemRelationship.item2_id
+        )
+        .filter(
+            ItemRelationship.item1_id.in_(
+                open_items.with_entities(Item.id).order_by(None)
+            )
+        )
+        .order_by(ItemRelationship.id)
+        .all()
+    )
+    node_idx = {node.id: idx for idx, node in enumerate(nodes)}
+    rels = [rel for rel in rels if rel.item2_id in node_idx]
+
+    graph_hash = hashlib.sha256(
+        json.dumps(
+            [list(node_idx), [[rel.item1_id, rel.item2_id] for rel in rels]]
+        ).encode()
+    ).hexdigest()
+    with graph_layout_cache_lock:
+        cached_hash, positions = graph_layout_cache.get(board.id, (None, None))
+    if cached_hash != graph_hash:
+        import graph_layout
+
+        positions = graph_layout.force_layout(
+            len(nodes),
+            [(node_idx[rel.item1_id], node_idx[rel.item2_id]) for rel in rels],
+            seed=board.id,
+        ).tolist()
+        with graph_layout_cache_lock:
+            graph_layout_cache[board.id] = (graph_hash, positions)
+
+    return {
+        "nodes": [
+            {
+                "id": str(node.id),
+                "label": f"{node.name} ({node.column_name})",
+                "color": "#333",
+                "size": 0.5,
+                "x": x,
+                "y": y,
+            }
+            for node, (x, y) in zip(nodes, positions)
+        ],
+        "edges": [
+            {
+                "id": str(rel.id),
+                "source": str(rel.item1_id),
+                "target": str(rel.item2_id),
+                "color": "#ccc",
+            }
+            for rel in rels
+        ],
+    }
+
+
+@app.route("/board/<board_id>/graph.json")
+@login_required
+@read_replica
+def board_graph_json(board_id):
+    """Return board graph nodes and edges with their layout as json."""
+    board = get_board_or_404(board_id)
+
+    return board_graph_data(board)
+
+
+# board id -> transition arrays, the board version and board event id
+# they are current for, and the last result, least recently used first
+board_flow_cache = collections.OrderedDict()
+board_flow_cache_size = 64
+board_flow_cache_lock = threading.Lock()
+transition_names = ["id", "item_id", "to_column_id", "epochtime"]
+
+
+def board_flow_transitions(board):
+    """Return numpy arrays of all the transitions into a board's columns.
+
+    Arrays are cached for the most recently used boards. While the
+    board's change counter is the same they are used as they are. After
+    item changes, only transitions newer than the latest cached one are
+    loaded and appended. After other changes to the board, such as lane
+    moves (a "changed" board event), or once the board events the cache
+    would have to check may have been pruned, all transitions are loaded
+    again. A transition committed after a newer one, which can happen on
+    postgresql, is only seen at that next full load.
+    """
+    import numpy as np
+
+    now = int(time.time())
+    with board_flow_cache_lock:
+        cached = board_flow_cache.get(board.id)
+        if cached is not None:
+            board_flow_cache.move_to_end(board.id)
+    if cached is not None and cached["version"] == board.version:
+        return cached["transitions"]
+
+    full = (
+        cached is None
+        or now - cached["loaded_at"] >= app.config["EVENT_RETENTION_SECONDS"]
+    )
+    last_event_id, changes = (
+        db.session.query(
+            db.func.max(BoardEvent.id),
+            db.func.sum(db.case((BoardEvent.kind == "changed", 1), else_=0)),
+        )
+        .filter(
+            BoardEvent.board_id == board.id,
+            BoardEvent.id > (0 if full else cached["event_id"]),
+        )
+        .one()
+    )
+    full = full or bool(changes)
+    arrays = None if full else cached["transitions"]
+    last_id = int(arrays["id"][-1]) if arrays and len(arrays["id"]) else 0
+
+    # with the transitions of archived items, so that archiving doesn't
+    # change the metrics
+    transitions = db.union_all(
+        *(
+            db.select(
+                transition_cls.id,
+                transition_cls.item_id,
+                transition_cls.to_column_id,
+                transition_cls.epochtime,
+            )
+            .join(Column, transition_cls.to_column_id == Column.id)
+            .join(Lane, Column.lane_id == Lane.id)
+            .filter(Lane.board_id == board.id, transition_cls.id > last_id)
+            for transition_cls in (ItemTransition, ArchivedItemTransition)
+        )
+    ).subquery()
+    rows = (
+        db.session.execute(db.select(transitions).order_by(transitions.c.id))
+        .tuples()
+        .all()
+    )
+    # one array per column, straight from the columns of the rows
+    new = [np.array(column, dtype=np.int64) for column in zip(*rows)] or [
+        np.zeros(0, dtype=np.int64)
+    ] * len(transition_names)
+    if arrays is None:
+        arrays = dict(zip(transition_names, new))
+    elif rows:
+        arrays = {
+            name: np.concatenate([arrays[name], column])
+            for name, column in zip(transition_names, new)
+        }
+    entry = {
+        "transitions": arrays,
+        "version": board.version,
+        "event_id": last_event_id or (0 if full else cached["event_id"]),
+        "loaded_at": now if full else cached["loaded_at"],
+    }
+    with board_flow_cache_lock:
+        board_flow_cache[board.id] = entry
+        while len(board_flow_cache) > board_flow_cache_size:
+            board_flow_cache.popitem(last=False)
+    return arrays
+
+
+def board_analytics(board, done_column_ids=None):
+    """Return flow metrics for a board, see analytics.board_flow.
+
+    Start columns are the first column of each lane. Done columns are
+    done_column_ids if given, otherwise the columns named "Done", or the
+    last column of each lane if there are none. Results are reused for a
+    minute as long as the board doesn't change.
+    """
+    import analytics
+
+    transitions = board_flow_transitions(board)
+
+    ordered_columns = (
+        db.session.query(
+            Column.id, Column.name, Column.lane_id, Lane.name.label("lane_name")
+        )
+        .join(Lane, Column.lane_id == Lane.id)
+        .filter(
+            Lane.board_id == board.id,
+            Lane.hidden.is_(False),
+            Column.hidden.is_(False),
+        )
+        .order_by(Lane.position, Lane.id, Column.position, Column.id)
+        .all()
+    )
+    start_column_ids = []
+    last_column_ids = []
+    for _, lane_columns in itertools.groupby(ordered_columns, lambda c: c.lane_id):
+        lane_columns = list(lane_columns)
+        start_column_ids.append(lane_columns[0].id)
+        last_column_ids.append(lane_columns[-1].id)
+    if not done_column_ids:
+        done_column_ids = [
+            c.id for c in ordered_columns if c.name.strip().lower() == "done"
+        ] or last_column_ids
+
+    key = (
+        board.version,
+        tuple(c.id for c in ordered_columns),
+        tuple(done_column_ids),
+    )
+    now = int(time.time())
+    with board_flow_cache_lock:
+        cached = board_flow_cache.get(board.id, {})
+        if cached.get("key") == key and now - cached["computed_at"] < 60:
+            return cached["result"]
+
+    result = analytics.board_flow(
+        transitions,
+        [c.id for c in ordered_columns],
+        start_column_ids,
+        done_column_ids,
+        now,
+    )
+    result["columns"] = [
+        {
+            "id": c.id,
+            "name": c.name,
+            "lane_name": c.lane_name,
+            "done": c.id in done_column_ids,
+        }
+        for c in ordered_columns
+    ]
+    with board_flow_cache_lock:
+        cached.update(key=key, computed_at=now, result=result)
+    return result
+
+
+def parse_done_column_ids():
+    """Return list of done column ids from the ?done=1,2 query argument."""
+    done = flask.request.args.get("done")
+    if not done:
+        return None
+    try:
+        return [int(x) for x in done.split(",")]
+    except ValueError:
+        return flask.abort(400)
+
+
+@app.route("/board/<board_id>/analytics")
+@login_required
+@read_replica
+def board_analytics_page(board_id):
+    """Return board flow analytics page."""
+    board = get_board_or_404(board_id)
+    result = board_analytics(board, parse_done_column_ids())
+
+    def day_str(t):
+        return dt.datetime.fromtimestamp(t, dt.timezone.utc).strftime("%Y-%m-%d")
+
+    return flask.render_template(
+        "analytics.jinja2",
+        board=board,
+        title=board.name,
+        result=result,
+        day_str=day_str,
+    )
+
+
+@app.route("/board/<board_id>/analytics.json")
+@login_required
+@read_replica
+def board_analytics_json(board_id):
+    """Return board flow analytics as json."""
+    board = get_board_or_404(board_id)
+    return board_analytics(board, parse_done_column_ids())
+
+
+def search_items(q, board_ids, page=1, page_size=50):
+    """Full-text search items on the given boards.
+
+    Uses the index made by the item search migration: fts5 on sqlite,
+    a tsvector column on postgresql and a FULLTEXT index on mysql. Other
+    databases fall back to matching every word with LIKE. Returns one
+    page of results, best match first, and whether there are more pages.
+    """
+    words = re.findall(r"\w+", q)
+    if not words or not board_ids:
+        return [], False
+
+    query = (
+        db.session.query(
+            Item.id,
+            Item.name,
+            Item.assigned,
+            Item.color,
+            Item.closed,
+            Column.name.label("column_name"),
+            Board.id.label("board_id"),
+            Board.name.label("board_name"),
+        )
+        .join(Column, Item.column_id == Column.id)
+        .join(Lane, Column.lane_id == Lane.id)
+        .join(Board, Lane.board_id == Board.id)
+        .filter(Board.id.in_(board_ids))
+    )
+
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        fts = db.table("item_fts", db.column("rowid"))
+        # every word, as a prefix; quoting avoids fts5 query syntax
+        fts_query = " ".join('"' + word + '"*' for word in words)
+        # bm25 column weights for name, description, assigned
+        rank = db.func.bm25(db.literal_column("item_fts"), 10.0, 1.0, 5.0)
+        query = (
+            query.join(fts, fts.c.rowid == Item.id)
+            .filter(db.literal_column("item_fts").op("MATCH")(fts_query))
+            .order_by(rank, Item.id.desc())
+        )
+    elif dialect == "postgresql":
+        tsquery = db.func.websearch_to_tsquery("english", q)
+        search_vector = db.literal_column("item.search_vector")
+        query = query.filter(search_vector.op("@@")(tsquery)).order_by(
+            db.func.ts_rank(search_vector, tsquery).desc(), Item.id.desc()
+        )
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import match
+
+        relevance = match(Item.name, Item.description, Item.assigned, against=q)
+        query = query.filter(relevance).order_by(relevance.desc(), Item.id.desc())
+    else:
+        for word in words:
+            pattern = f"%{word}%"
+            query = query.filter(
+                db.or_(
+                    Item.name.ilike(pattern),
+                    Item.description.ilike(pattern),
+                    Item.assigned.ilike(pattern),
+                )
+            )
+        query = query.order_by(Item.id.desc())
+
+    rows = query.offset((page - 1) * page_size).limit(page_size + 1).all()
+    return rows[:page_size], len(rows) > page_size
+
+
+@app.route("/search")
+@login_required
+@read_replica
+def search():
+    """Return search results page."""
+    q = flask.request.args.get("q", "")
+    page = max(1, flask.request.args.get("page", 1, type=int))
+    results, has_next = search_items(q, accessible_board_ids(), page)
+    return flask.render_template(
+        "search.jinja2",
+        title="Search",
+        q=q,
+        page=page,
+        results=results,
+        has_next=has_next,
+    )
+
+
 def monthcalendar_with_datetimes(year, month):
     cal = calendar.monthcalendar(year, month)
     datetimes = [
@@ -909,6 +3301,8 @@ def user_calendar():
     user_caldays = (
         db.session.query(CalDay).filter(CalDay.user_id == current_user.id).all()
     )
+    import holidays
+
     eng_holidays = holidays.country_holidays("UK", subdiv="ENG")
     for cd in user_caldays:
         print(cd, cd.date_str, cd.text)
@@ -966,4 +3360,6 @@ def main(host="127.0.0.1", port=7777, debug=False):
 
 
 if __name__ == "__main__":
+    import argh
+
     argh.dispatch_command(main)
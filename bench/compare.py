@@ -0,0 +1,52 @@
+"""Compare two bench/run.py result files.
+
+python3 bench/compare.py bench/results/before.json bench/results/after.json
+"""
+
+import json
+
+import argh
+
+
+def change(before, after):
+    if not before:
+        return ""
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def main(before_path, after_path):
+    """Print the change in latency, queries and memory of each route."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['version']} ({before['database']}) -> ", end="")
+    print(f"{after['version']} ({after['database']})")
+    if before["params"] != after["params"]:
+        print("warning: runs used different parameters")
+
+    rate_before = before["import"].get("rows_per_second")
+    rate_after = after["import"].get("rows_per_second")
+    if rate_before and rate_after:
+        print(
+            f"{'import':20} {rate_before:10.0f} -> {rate_after:10.0f} rows/s"
+            f" {change(rate_before, rate_after):>6}"
+        )
+
+    for name, result in after["routes"].items():
+        old = before["routes"].get(name)
+        if not old:
+            print(f"{name:20} (new)")
+            continue
+        print(
+            f"{name:20}"
+            f" p50 {old['p50_ms']:8.2f} -> {result['p50_ms']:8.2f} ms"
+            f" {change(old['p50_ms'], result['p50_ms']):>6}"
+            f"  p90 {change(old['p90_ms'], result['p90_ms']):>6}"
+            f"  queries {old['queries']:.1f} -> {result['queries']:.1f}"
+            f"  memory {change(old['peak_memory_kib'], result['peak_memory_kib']):>6}"
+        )
+
+
+if __name__ == "__main__":
+    argh.dispatch_command(main)
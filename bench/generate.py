@@ -0,0 +1,197 @@
+"""Seeded synthetic catboard data for benchmarks.
+
+The same arguments always give the same data. generate_tables() returns
+the tables in the export/import format, so that they can be written as
+an export file or inserted with app.import_tables().
+"""
+
+import datetime
+import random
+
+COLORS = ["w3-red", "w3-pink", "w3-purple", "w3-indigo", "w3-blue", "w3-teal"]
+WORDS = (
+    "deploy fix refactor review cache query index board lane column item "
+    "release server client login export import search graph history user"
+).split()
+DAY = 86400
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def description(rng, item_id, subtask_ids, length):
+    """Return a markdown item description of about length characters."""
+    lines = [f"## {sentence(rng, 3)}", ""]
+    for i in range(rng.randint(2, 6)):
+        lines.append(f"- [{'x' if rng.random() < 0.5 else ' '}] {sentence(rng, 4)}")
+    lines.append("")
+    lines.append(f"See https://example.com/items/{item_id} and #{rng.randint(1, 999)}")
+    if rng.random() < 0.1:
+        lines.append(f"![screenshot](https://example.com/img/{item_id}.png)")
+    for subtask_id in subtask_ids:
+        lines.append(f"subtask #{subtask_id}")
+    while sum(len(line) + 1 for line in lines) < length:
+        lines.append(sentence(rng, 12) + ".")
+    return "\n".join(lines)
+
+
+def large_description(rng, item_id, checklist=200, table_rows=50):
+    """Return a markdown item description with a long checklist and a
+    wiki table, which are the slowest parts of descriptions to render.
+    """
+    lines = [f"## {sentence(rng, 3)}", ""]
+    for i in range(checklist):
+        lines.append(f"- [{'x' if rng.random() < 0.5 else ' '}] {sentence(rng, 6)}")
+    lines.append("")
+    lines.append("|| *id* || *name* || *owner* || *link* ||")
+    for i in range(table_rows):
+        lines.append(
+            f"|| {i} || {sentence(rng, 3)} || {rng.choice(['alice', 'bob'])}"
+            f" || https://example.com/items/{item_id}/{i} ||"
+        )
+    lines.append("")
+    lines.append(f"See #{rng.randint(1, 999)}")
+    return "\n".join(lines)
+
+
+def generate_tables(
+    seed=0,
+    boards=2,
+    lanes=5,
+    columns=6,
+    items=2000,
+    transitions=5,
+    subtasks=0.1,
+    description_length=500,
+    now=1_700_000_000,
+):
+    """Return dict of table name to list of row dicts.
+
+    Every board has lanes lanes of columns columns and items items spread
+    over them. Each item is created in a column and then moved up to
+    transitions times within its lane over the 90 days before now. A
+    subtasks fraction of items mention one to three other items of the
+    same board as subtasks, with matching relationships.
+    """
+    rng = random.Random(seed)
+    tables = {
+        "Board": [],
+        "Lane": [],
+        "Column": [],
+        "Item": [],
+        "ItemTransition": [],
+        "ItemRelationship": [],
+    }
+    lane_id = column_id = item_id = transition_id = relationship_id = 0
+
+    for board_id in range(1, boards + 1):
+        tables["Board"].append(
+            {
+                "id": board_id,
+                "name": f"Board {board_id} {sentence(rng, 2)}",
+                "closed": False,
+            }
+        )
+        board_lanes = []
+        for _ in range(lanes):
+            lane_id += 1
+            tables["Lane"].append(
+                {
+                    "id": lane_id,
+                    "name": sentence(rng, 2),
+                    "closed": False,
+                    "board_id": board_id,
+                    "position": len(board_lanes) + 1,
+                    "hidden": False,
+                }
+            )
+            lane_columns = []
+            for _ in range(columns):
+                column_id += 1
+                tables["Column"].append(
+                    {
+                        "id": column_id,
+                        "name": sentence(rng, 1),
+                        "closed": False,
+                        "lane_id": lane_id,
+                        "position": len(lane_columns) + 1,
+                        "hidden": False,
+                    }
+                )
+                lane_columns.append(column_id)
+            board_lanes.append(lane_columns)
+
+        first_item_id = item_id + 1
+        for _ in range(items):
+            item_id += 1
+            lane_columns = rng.choice(board_lanes)
+            # the item's path through its lane's columns
+            path = [rng.choice(lane_columns)]
+            for _ in range(rng.randint(0, transitions)):
+                path.append(rng.choice(lane_columns))
+            times = sorted(now - rng.randint(0, 90 * DAY) for _ in path)
+            for idx, (to_column_id, epochtime) in enumerate(zip(path, times)):
+                transition_id += 1
+                tables["ItemTransition"].append(
+                    {
+                        "id": transition_id,
+                        "item_id": item_id,
+                        "from_column_id": path[idx - 1] if idx else None,
+                        "to_column_id": to_column_id,
+                        "epochtime": epochtime,
+                    }
+                )
+
+            subtask_ids = []
+            if item_id > first_item_id and rng.random() < subtasks:
+                subtask_ids = sorted(
+                    {
+                        rng.randint(first_item_id, item_id - 1)
+                        for _ in range(rng.randint(1, 3))
+                    }
+                )
+            for subtask_id in subtask_ids:
+                relationship_id += 1
+                tables["ItemRelationship"].append(
+                    {
+                        "id": relationship_id,
+                        "item1_id": item_id,
+                        "item2_id": subtask_id,
+                        "type": 100,
+                    }
+                )
+
+            tables["Item"].append(
+                {
+                    "id": item_id,
+                    "name": sentence(rng, rng.randint(2, 6)),
+                    "assigned": rng.choice(["", "alice", "bob", "carol"]),
+                    "color": rng.choice(COLORS),
+                    "closed": rng.random() < 0.2,
+                    "public": False,
+                    "description": description(
+                        rng, item_id, subtask_ids, description_length
+                    ),
+                    "column_id": path[-1],
+                    "position": item_id,
+                }
+            )
+
+    return tables
+
+
+def generate_caldays(user_id, days, seed=0, now=1_700_000_000):
+    """Return CalDay row dicts for the days before now."""
+    rng = random.Random(seed)
+    ret = []
+    for day in range(days):
+        date = datetime.date.fromtimestamp(now - day * DAY)
+        ret.append(
+            {
+                "date_str": date.isoformat(),
+                "user_id": user_id,
+                "text": sentence(rng, rng.randint(3, 20)),
+            }
+        )
+    return ret
@@ -0,0 +1,93 @@
+"""Measure how long importing catboard takes, and check it against a budget.
+
+Runs python -X importtime in fresh processes, and reports the median
+import time and the slowest imports. Exits with status 1 if the median
+is over budget_ms, or if any module that should only be imported on
+first use was imported. For example:
+
+    python3 bench/importtime.py --module cli --budget-ms 500
+"""
+
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+
+import argh
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+# median milliseconds for import app, also checked by tests/test_import_time.py
+BUDGET_MS = 700.0
+
+# imported when first needed, never at startup
+LAZY_MODULES = [
+    "alembic",
+    "flask_migrate",
+    "holidays",
+    "humanize",
+    "markdown2",
+    "numpy",
+    "requests",
+    "gunicorn",
+    "redis",
+]
+
+
+def import_times(module):
+    """Import module in a new process and return dict of name to (self, cumulative) us."""
+    env = dict(os.environ)
+    env.setdefault("CATBOARD_SECRET_KEY", "importtime")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    ret = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # nested imports are indented by two spaces per level
+        ret[name[1:].rstrip()] = (int(self_us), int(cumulative_us))
+    return ret
+
+
+def main(module="app", runs=5, budget_ms=BUDGET_MS, top=10):
+    """Import module runs times and check the median time against budget_ms."""
+    totals = []
+    for _ in range(runs):
+        times = import_times(module)
+        totals.append(times[module][1] / 1000)
+    median = statistics.median(totals)
+
+    print(f"import {module}: median {median:.0f} ms over {runs} runs", end="")
+    print(f" (min {min(totals):.0f} ms, max {max(totals):.0f} ms)")
+    direct = [
+        (cumulative, name.strip())
+        for name, (_, cumulative) in times.items()
+        if name.startswith("  ") and not name.startswith("   ")
+    ]
+    print("slowest imports of the last run:")
+    for cumulative, name in sorted(direct, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    ok = True
+    imported = [name.strip() for name in times]
+    eager = [name for name in LAZY_MODULES if name in imported]
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        ok = False
+    if median > budget_ms:
+        print(f"FAIL: {median:.0f} ms is over the budget of {budget_ms:.0f} ms")
+        ok = False
+    if ok:
+        print(f"ok: within the budget of {budget_ms:.0f} ms")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    argh.dispatch_command(main)
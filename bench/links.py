@@ -0,0 +1,164 @@
+"""Check and time to_md.find_urls() and find_links().
+
+fuzz compares them with the url regex they replaced on random text made
+of url-like pieces. The urls must be the same. The rendered markdown
+can differ where markdown2 doesn't link a url, like one right after
+"](": the old #123 pattern then linked references inside the url.
+
+time finds links in and renders large descriptions, and runs the old
+regex on smaller ones for comparison. For example:
+
+    python3 bench/links.py fuzz --runs 20000
+    python3 bench/links.py time --size 1000000
+"""
+
+import pathlib
+import random
+import re
+import sys
+import time
+
+import argh
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import generate  # noqa: E402
+import to_md  # noqa: E402
+
+# to_md.pattern before find_urls()
+OLD_URL_PATTERN = re.compile(
+    r"((([A-Za-z]{3,9}:(?:\/\/)?)"  # scheme
+    r"(?:[\-;:&=\+\$,\w]+@)?[A-Za-z0-9\.\-]+(:\[0-9]+)?"  # user@hostname:port
+    r"|(?:www\.|[\-;:&=\+\$,\w]+@)[A-Za-z0-9\.\-]+)"  # www.|user@hostname
+    r"((?:\/[\+~%\/\.\w\-_]*)?"  # path
+    r"\??(?:[\-\+=&;%@\.\w_]*)"  # query parameters
+    r"#?(?:[\.\!\/\\\w]*))?)"  # fragment
+    r"(?![^<]*?(?:<\/\w+>|\/?>))"  # ignore anchor HTML tags
+    r"(?![^\(]*?\))"  # ignore links in brackets (Markdown links and images)
+)
+OLD_LINK_PATTERNS = [
+    (OLD_URL_PATTERN, r"\1"),
+    (re.compile(r"#(\d+)", re.I), r"/item/\1"),
+]
+
+PIECES = (
+    generate.WORDS
+    + ["http", "https", "mailto", "ftp", "Www", "abcdefghijkl", "x", "42", "#7"]
+    + [":", "://", "//", "/", "@", ".", "-", "_", "?", "=", "&", ";", "%", "#"]
+    + ["!", "~", "+", "$", ",", "\\", "é", "٣"]
+    + ["www.", "example.com", "user:pw@", "?a=1&b=2", "#frag", ".png"]
+    + ["<", ">", "</b>", "<b>", "/>", "(", ")", "[", "]", "](", "'", '"']
+    + [" ", " ", " ", " ", "\n", "\n\n", "- "]
+)
+
+
+def old_urls(text):
+    return [match.group(1) for match in OLD_URL_PATTERN.finditer(text)]
+
+
+def old_render(text):
+    import markdown2
+
+    return markdown2.markdown(
+        to_md.html.escape(text),
+        extras=[
+            "link-patterns",
+            "wiki-tables",
+            "task_list",
+            "code-friendly",
+            "cuddled-lists",
+            "fenced-code-blocks",
+            "break-on-newline",
+        ],
+        link_patterns=OLD_LINK_PATTERNS,
+    )
+
+
+def outcome(render, text):
+    """Return html, or the error, since markdown2 fails on some text."""
+    try:
+        return render(text)
+    except Exception as e:
+        return repr(e)
+
+
+def random_text(rng, pieces):
+    return "".join(rng.choice(PIECES) for _ in range(pieces))
+
+
+def fuzz(runs=10000, seed=0, pieces=40):
+    """Compare urls and rendered html with the old regex on random text."""
+    rng = random.Random(seed)
+    url_diffs = render_diffs = 0
+    for _ in range(runs):
+        text = random_text(rng, rng.randint(1, pieces))
+        urls = [text[start:end] for start, end in to_md.find_urls(text)]
+        if urls != old_urls(text):
+            url_diffs += 1
+            if url_diffs <= 5:
+                print(f"urls differ for {text!r}:\n  {old_urls(text)}\n  {urls}")
+        if outcome(to_md.render, text) != outcome(old_render, text):
+            render_diffs += 1
+            if render_diffs <= 5:
+                print(f"html differs for {text!r}")
+    print(f"{runs} texts: urls differ for {url_diffs}, html for {render_diffs}")
+    sys.exit(1 if url_diffs else 0)
+
+
+def log_text(rng, size):
+    """Return about size characters of pasted log."""
+    lines = []
+    n = 0
+    while n < size:
+        line = (
+            f"2024-05-{rng.randint(1, 28):02} 12:{rng.randint(0, 59):02}:00 "
+            f"INFO {generate.sentence(rng, 6)} "
+            f"url=https://example.com/{rng.choice(generate.WORDS)}?id={n} "
+            f"(took {rng.randint(1, 999)} ms) see #{rng.randint(1, 999)}"
+        )
+        lines.append(line)
+        n += len(line) + 1
+    return "\n".join(lines)
+
+
+def texts(rng, size):
+    """Return dict of name to text of about size characters."""
+    return {
+        "log": log_text(rng, size),
+        "prose": " ".join(generate.sentence(rng, 12) for _ in range(size // 80)),
+        "one word": "a" * size,
+        "user@ run": ("a:" * size)[:size] + "@",
+        "no closing paren": "(" + "www.example.com " * (size // 16),
+    }
+
+
+def seconds(f, *args):
+    t0 = time.perf_counter()
+    f(*args)
+    return time.perf_counter() - t0
+
+
+def main_time(size=1_000_000, old_size=20_000, render_size=20_000, seed=0):
+    """Time find_links() on size characters, and the old regex and
+    rendering on the first old_size and render_size characters.
+
+    markdown2 rebuilds the text for every link it makes, so rendering
+    stays slow for descriptions with many links.
+    """
+    rng = random.Random(seed)
+    print(f"{'':18} {size} chars: find_links | {old_size} chars: old regex,", end="")
+    print(f" find_urls | {render_size} chars: old, new render")
+    for name, text in texts(rng, size).items():
+        old_text = text[:old_size]
+        render_text = text[:render_size]
+        print(
+            f"{name:18} {seconds(lambda: list(to_md.find_links(text))):26.3f}s"
+            f" | {seconds(old_urls, old_text):20.3f}s"
+            f" {seconds(lambda: list(to_md.find_urls(old_text))):9.3f}s"
+            f" | {seconds(old_render, render_text):20.3f}s"
+            f" {seconds(to_md.render, render_text):9.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    argh.dispatch_commands([fuzz, argh.named("time")(main_time)])
@@ -0,0 +1,77 @@
+"""Load test a running catboard instance.
+
+Logs in, then requests a page from several threads for a fixed time and
+reports requests per second and latency percentiles. For example:
+
+    python3 bench/loadtest.py http://127.0.0.1:7777 username password --path /board/1
+"""
+
+import http.cookiejar
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import argh
+
+
+def percentile(values, p):
+    """Return the p-th percentile of sorted values."""
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def login(base_url, username, password):
+    """Return an url opener with a logged in session cookie."""
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+    )
+    data = urllib.parse.urlencode({"username": username, "password": password})
+    opener.open(base_url + "/login", data.encode()).read()
+    return opener
+
+
+def main(base_url, username, password, path="/boards", threads=8, duration=10.0):
+    """Request path from threads threads for duration seconds."""
+    base_url = base_url.rstrip("/")
+    opener = login(base_url, username, password)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        local_latencies = []
+        local_errors = 0
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                with opener.open(base_url + path) as r:
+                    r.read()
+            except Exception:
+                local_errors += 1
+                continue
+            local_latencies.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.monotonic()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.monotonic() - t0
+
+    latencies.sort()
+    print(f"{path}: {len(latencies)} requests, {sum(errors)} errors in {elapsed:.1f}s")
+    print(f"{len(latencies) / elapsed:.1f} req/s")
+    for p in (50, 90, 99):
+        print(f"p{p}: {percentile(latencies, p) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    argh.dispatch_command(main)
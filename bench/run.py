@@ -0,0 +1,297 @@
+"""Benchmark the hot routes against generated data.
+
+Creates a database (a temporary sqlite file by default), fills it with
+generate.py data through the import code, then requests each route
+through flask's test client and reports latency percentiles, queries per
+request and peak python memory. Results are written as json so that runs
+on different commits can be compared with compare.py. For example:
+
+    python3 bench/run.py --items 5000
+    python3 bench/run.py --database-url postgresql://localhost/catboard_bench
+
+A --database-url database must be empty; it is migrated and filled.
+"""
+
+import contextlib
+import io
+import json
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import argh
+
+import generate
+from loadtest import percentile
+
+BENCH_DIR = pathlib.Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+
+
+def git_version():
+    try:
+        cmd = ["git", "describe", "--tags", "--always", "--dirty"]
+        return subprocess.check_output(cmd, cwd=REPO_DIR).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def summarize(latencies, queries):
+    """Return dict of latency percentiles in ms and mean queries per request."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "queries": sum(queries) / len(queries),
+    }
+
+
+def main(
+    database_url=None,
+    seed=0,
+    boards=2,
+    lanes=5,
+    columns=6,
+    items=2000,
+    transitions=5,
+    subtasks=0.1,
+    caldays=365,
+    repeat=20,
+    only=None,
+    output=None,
+):
+    """Generate data, benchmark routes and write json results.
+
+    only is a comma separated list of benchmark names to run.
+    """
+    tmp_dir = tempfile.TemporaryDirectory()
+    if not database_url:
+        database_url = f"sqlite:///{tmp_dir.name}/bench.db"
+    # read by app on import
+    os.environ["CATBOARD_SQLALCHEMY_DATABASE_URI"] = database_url
+    os.environ.setdefault("CATBOARD_SECRET_KEY", "bench")
+    os.environ.setdefault("CATBOARD_METRICS_SAMPLE_RATE", "0")
+    sys.path.insert(0, str(REPO_DIR))
+    os.chdir(REPO_DIR)
+
+    import flask_migrate
+    import sqlalchemy
+
+    import app as catboard
+    import json_stream
+    import to_md
+
+    rng = random.Random(seed)
+    results = {
+        "version": git_version(),
+        "time": int(time.time()),
+        "database": database_url.split(":")[0],
+        "params": {
+            "seed": seed,
+            "boards": boards,
+            "lanes": lanes,
+            "columns": columns,
+            "items": items,
+            "transitions": transitions,
+            "subtasks": subtasks,
+            "caldays": caldays,
+            "repeat": repeat,
+        },
+        "import": {},
+        "routes": {},
+    }
+
+    queries = []
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    with catboard.app.app_context():
+        catboard.init_migrate()
+        flask_migrate.upgrade(directory=str(REPO_DIR / "migrations"))
+
+        # import generated data as an export file
+        tables = generate.generate_tables(
+            seed, boards, lanes, columns, items, transitions, subtasks
+        )
+        n_rows = sum(len(rows) for rows in tables.values())
+        export_path = pathlib.Path(tmp_dir.name) / "export.json"
+        with open(export_path, "w") as f:
+            json.dump(tables, f)
+        t0 = time.perf_counter()
+        with open(export_path) as f:
+            catboard.import_tables(json_stream.iter_tables(f))
+        seconds = time.perf_counter() - t0
+        results["import"] = {
+            "rows": n_rows,
+            "seconds": seconds,
+            "rows_per_second": n_rows / seconds,
+        }
+        print(f"imported {n_rows} rows in {seconds:.2f}s")
+
+        user = catboard.User(username="bench")
+        user.set_password("bench")
+        catboard.db.session.add(user)
+        catboard.db.session.flush()
+        catboard.db.session.execute(
+            catboard.user_board.insert(),
+            [
+                {"user_id": user.id, "board_id": board["id"]}
+                for board in tables["Board"]
+            ],
+        )
+        catboard.db.session.execute(
+            catboard.CalDay.__table__.insert(),
+            generate.generate_caldays(user.id, caldays, seed, int(time.time())),
+        )
+        # an item with a large checklist and table for the item_view_large
+        # benchmarks
+        large_item_id = max(item["id"] for item in tables["Item"]) + 1
+        catboard.db.session.execute(
+            catboard.Item.__table__.insert(),
+            {
+                "id": large_item_id,
+                "name": "large",
+                "assigned": "",
+                "color": generate.COLORS[0],
+                "closed": False,
+                "public": False,
+                "description": generate.large_description(
+                    random.Random(seed), large_item_id
+                ),
+                "column_id": tables["Item"][0]["column_id"],
+                "position": large_item_id,
+            },
+        )
+        catboard.db.session.commit()
+        engine = catboard.db.engine
+
+    client = catboard.app.test_client()
+    client.post("/login", data={"username": "bench", "password": "bench"})
+    board_ids = [board["id"] for board in tables["Board"]]
+    item_ids = [item["id"] for item in tables["Item"]]
+    parent_ids = sorted({rel["item1_id"] for rel in tables["ItemRelationship"]})
+
+    def forget_renders():
+        to_md.render_cache.clear()
+        with catboard.app.app_context():
+            catboard.Item.query.update({catboard.Item.description_html: None})
+            catboard.db.session.commit()
+
+    def board_etag(board_id):
+        return {"If-None-Match": client.get(f"/board/{board_id}").headers["ETag"]}
+
+    # name: (number of requests, function returning (url, headers), setup)
+    benchmarks = {
+        "boards": (repeat, lambda: ("/boards", None), None),
+        "board": (repeat, lambda: (f"/board/{rng.choice(board_ids)}", None), None),
+        "board_not_modified": (
+            repeat,
+            lambda: (f"/board/{board_ids[0]}", board_etag(board_ids[0])),
+            None,
+        ),
+        "board_history": (
+            repeat,
+            lambda: (f"/board/{rng.choice(board_ids)}/history", None),
+            None,
+        ),
+        "item": (repeat, lambda: (f"/item/{rng.choice(item_ids)}", None), None),
+        "item_with_subtasks": (
+            repeat,
+            lambda: (f"/item/{rng.choice(parent_ids or item_ids)}", None),
+            None,
+        ),
+        # every item description rendered for the first time
+        "item_view_cold": (
+            repeat,
+            lambda: (f"/item/{rng.choice(item_ids)}/view", None),
+            forget_renders,
+        ),
+        # the same description, from the render cache
+        "item_view_warm": (repeat, lambda: (f"/item/{item_ids[0]}/view", None), None),
+        # with large checklists and tables
+        "item_view_large_cold": (
+            repeat,
+            lambda: (f"/item/{large_item_id}/view", None),
+            forget_renders,
+        ),
+        "item_view_large_warm": (
+            repeat,
+            lambda: (f"/item/{large_item_id}/view", None),
+            None,
+        ),
+        "search": (
+            repeat,
+            lambda: (f"/search?q={rng.choice(generate.WORDS)}", None),
+            None,
+        ),
+        "calendar": (repeat, lambda: ("/calendar", None), None),
+        "export_data": (max(1, repeat // 10), lambda: ("/export_data", None), None),
+    }
+    if only:
+        benchmarks = {
+            name: benchmark
+            for name, benchmark in benchmarks.items()
+            if name in only.split(",")
+        }
+
+    sqlalchemy.event.listen(engine, "before_cursor_execute", count_query)
+    for name, (n, make_request, setup) in benchmarks.items():
+        latencies = []
+        query_counts = []
+        for i in range(n + 1):
+            url, headers = make_request()
+            if setup:
+                setup()
+            queries.clear()
+            # routes print debugging output
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                response = client.get(url, headers=headers)
+                response.get_data()
+                seconds = time.perf_counter() - t0
+            assert response.status_code in (200, 304), (url, response.status_code)
+            # the first request warms up caches and lazy imports
+            if i:
+                latencies.append(seconds)
+                query_counts.append(len(queries))
+
+        # measure memory separately, since tracemalloc slows everything down
+        url, headers = make_request()
+        if setup:
+            setup()
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            client.get(url, headers=headers).get_data()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = summarize(latencies, query_counts)
+        result["peak_memory_kib"] = peak / 1024
+        results["routes"][name] = result
+        print(
+            f"{name:20} p50 {result['p50_ms']:8.2f} ms  p90 {result['p90_ms']:8.2f} ms"
+            f"  p99 {result['p99_ms']:8.2f} ms  {result['queries']:6.1f} queries"
+            f"  {result['peak_memory_kib']:9.0f} KiB"
+        )
+
+    if not output:
+        output = (
+            BENCH_DIR / "results" / f"{results['version']}-{results['database']}.json"
+        )
+    output = pathlib.Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    argh.dispatch_command(main)
@@ -1,6 +1,22 @@
+import time
+
 import argh
 
-from app import app, db, User, Board
+import json_stream
+from app import (
+    app,
+    db,
+    User,
+    Board,
+    archivable_item_groups,
+    archive_items,
+    export_json_chunks,
+    import_tables,
+    print_import_progress,
+    restore_items,
+    search_items,
+    touch_user,
+)
 
 
 def list_users():
@@ -38,6 +54,7 @@ def set_password(username, new_password):
         user = User.query.filter_by(username=username).first()
         if user:
             user.set_password(new_password)
+            touch_user(user.id)
             db.session.commit()
         else:
             print(f"No user found with username: {username}")
@@ -49,6 +66,7 @@ def user_add_board(username, board_id):
         if user:
             board = Board.query.filter_by(id=board_id).first()
             user.boards.append(board)
+            touch_user(user.id)
             db.session.commit()
         else:
             print(f"No user found with username: {username}")
@@ -61,6 +79,7 @@ def user_remove_board(username, board_id):
             board = Board.query.filter_by(id=board_id).first()
             if board in user.boards:
                 user.boards.remove(board)
+                touch_user(user.id)
                 db.session.commit()
             else:
                 print(f"No board found with name: {board_id}")
@@ -68,6 +87,77 @@ def user_remove_board(username, board_id):
             print(f"No user found with username: {username}")
 
 
+def export(filename):
+    with app.app_context():
+        with open(filename, "w") as f:
+            for chunk in export_json_chunks():
+                f.write(chunk)
+
+
+def search(query, username=None, page=1):
+    with app.app_context():
+        if username:
+            user = User.query.filter_by(username=username).first()
+            if not user:
+                print(f"No user found with username: {username}")
+                return
+            board_ids = user.board_ids
+        else:
+            board_ids = [board_id for (board_id,) in db.session.query(Board.id)]
+        results, has_next = search_items(query, board_ids, page)
+        for r in results:
+            print(f"#{r.id} {r.name} ({r.board_name} / {r.column_name})")
+        if has_next:
+            print(f"more results with --page {page + 1}")
+
+
+duration_units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(duration):
+    """Parse a duration such as 90d, 12h or 30m to seconds."""
+    try:
+        return int(duration[:-1]) * duration_units[duration[-1]]
+    except (ValueError, KeyError, IndexError):
+        raise argh.CommandError(f"bad duration (use e.g. 90d, 12h): {duration}")
+
+
+def archive(older_than="90d", batch_size=500, dry_run=False):
+    """Move closed items that haven't moved for older_than to the archive."""
+    before_epochtime = int(time.time()) - parse_duration(older_than)
+    with app.app_context():
+        if dry_run:
+            groups = archivable_item_groups(before_epochtime)
+            print(f"would archive {sum(len(group) for group in groups)} items")
+            return
+
+        def progress(count):
+            print(f"archived {count} items")
+
+        archive_items(before_epochtime, batch_size, progress)
+
+
+def restore(item_id):
+    """Move an archived item, and the items related to it, out of the archive."""
+    with app.app_context():
+        item_ids = restore_items(item_id)
+        if item_ids:
+            print(f"restored items {', '.join(map(str, item_ids))}")
+        else:
+            print(f"No archived item found with id: {item_id}")
+
+
+@argh.named("import")
+def import_(filename, batch_size=1000):
+    with app.app_context():
+        with open(filename) as f:
+            import_tables(
+                json_stream.iter_tables(f),
+                batch_size=batch_size,
+                progress=print_import_progress,
+            )
+
+
 if __name__ == "__main__":
     argh.dispatch_commands(
         [
@@ -78,5 +168,10 @@ if __name__ == "__main__":
             set_password,
             user_add_board,
             user_remove_board,
+            export,
+            import_,
+            search,
+            archive,
+            restore,
         ]
     )
@@ -1,3 +1,3 @@
 #!/usr/bin/env bash
 flask db upgrade
-python3 app.py --host 0.0.0.0
+python3 serve.py --host 0.0.0.0
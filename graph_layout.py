@@ -0,0 +1,81 @@
+"""Force-directed graph layout."""
+
+import numpy as np
+
+
+def force_layout(n, edges, iterations=50, seed=0, chunk_size=256):
+    """Lay out n nodes with the Fruchterman-Reingold algorithm.
+
+    edges is a list of (source, target) node index pairs. Only nodes
+    with edges are simulated; unconnected nodes are put on a grid below
+    them. Forces are computed with numpy over all pairs of connected
+    nodes, in row chunks so that memory use stays at chunk_size * n. The
+    same input always gives the same layout. Returns an (n, 2) array of
+    positions.
+    """
+    pos = np.zeros((n, 2))
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    connected = np.unique(edges)
+    isolated = np.setdiff1d(np.arange(n), connected)
+
+    if len(connected):
+        # renumber connected nodes 0..m-1
+        src, dst = np.searchsorted(connected, edges).T
+        pos[connected] = simulate(
+            len(connected), src, dst, iterations, seed, chunk_size
+        )
+
+    if len(isolated):
+        top = pos[connected, 1].max() if len(connected) else 0.0
+        width = int(np.ceil(np.sqrt(len(isolated))))
+        idx = np.arange(len(isolated))
+        pos[isolated, 0] = (idx % width) / width
+        pos[isolated, 1] = top + 0.1 + (idx // width) / width
+
+    return pos
+
+
+def simulate(m, src, dst, iterations, seed, chunk_size):
+    """Run the force simulation on m nodes joined by src -> dst edges."""
+    rng = np.random.default_rng(seed)
+    x, y = rng.random((2, m), dtype=np.float32)
+    if m < 2:
+        return np.stack([x, y], axis=1)
+
+    k2 = 1.0 / m
+    k = np.sqrt(k2)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        disp_x = np.zeros(m, dtype=np.float32)
+        disp_y = np.zeros(m, dtype=np.float32)
+
+        # repulsion between all pairs of nodes
+        for start in range(0, m, chunk_size):
+            end = start + chunk_size
+            dx = x[start:end, None] - x[None, :]
+            dy = y[start:end, None] - y[None, :]
+            weight = dx * dx
+            weight += dy * dy
+            np.maximum(weight, 1e-9, out=weight)
+            np.divide(k2, weight, out=weight)
+            disp_x[start:end] += (dx * weight).sum(axis=1)
+            disp_y[start:end] += (dy * weight).sum(axis=1)
+
+        # attraction along edges
+        dx = x[src] - x[dst]
+        dy = y[src] - y[dst]
+        weight = np.sqrt(dx * dx + dy * dy) / k
+        np.add.at(disp_x, src, -dx * weight)
+        np.add.at(disp_y, src, -dy * weight)
+        np.add.at(disp_x, dst, dx * weight)
+        np.add.at(disp_y, dst, dy * weight)
+
+        length = np.maximum(np.sqrt(disp_x * disp_x + disp_y * disp_y), 1e-9)
+        scale = np.minimum(length, temperature) / length
+        x += disp_x * scale
+        y += disp_y * scale
+        temperature -= cooling
+
+    return np.stack([x, y], axis=1)
@@ -0,0 +1,108 @@
+"""Incremental reader for catboard json exports."""
+
+import json
+
+decoder = json.JSONDecoder()
+whitespace = " \t\n\r"
+
+
+class Reader:
+    """Buffered reader that decodes json values from a text stream."""
+
+    def __init__(self, f, chunk_size=65536):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """Read another chunk into the buffer, dropping consumed text."""
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character, or "" at the end."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in whitespace:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next json value, reading more input as needed."""
+        self.peek()
+        read_size = self.chunk_size
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # grow reads while the value doesn't fit, so that very large
+                # values don't rescan often, but not for a value that was
+                # only cut off by the end of the buffer
+                if len(self.buf) - self.pos >= read_size:
+                    read_size *= 2
+                if not self.fill(read_size):
+                    raise
+                continue
+            # a number at the end of the buffer may be cut short
+            if end == len(self.buf) and not isinstance(obj, (dict, list, str)):
+                if self.fill():
+                    continue
+            self.pos = end
+            return obj
+
+
+def iter_tables(f, chunk_size=65536):
+    """Yield (table_name, rows) pairs from a json export stream.
+
+    The export is an object mapping table names to lists of row objects.
+    Only one row is held in memory at a time; rows is an iterator that
+    must be consumed before the next pair is produced (any rows left
+    unconsumed are skipped.)
+    """
+    reader = Reader(f, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        reader.expect("[")
+        rows = iter_rows(reader)
+        yield name, rows
+        for _ in rows:
+            pass
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def iter_rows(reader):
+    """Yield the values of the json list the reader is positioned in."""
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("]")
+        return
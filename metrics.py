@@ -0,0 +1,294 @@
+"""Request and database metrics, in Prometheus text format."""
+
+import bisect
+import json
+import os
+import pathlib
+import secrets
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def label_value(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    """Format (name, value) pairs as {name="value",...}"""
+    if not labels:
+        return ""
+    inner = ",".join(f'{name}="{label_value(value)}"' for name, value in labels)
+    return "{" + inner + "}"
+
+
+class Histogram:
+    """Histogram with fixed upper bucket bounds, like a Prometheus histogram."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # the last count is for values above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        """Return exposition lines of the histogram."""
+        ret = []
+        total = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            total += count
+            le = format_labels(labels + (("le", bound),))
+            ret.append(f"{name}_bucket{le} {total}")
+        ret.append(f"{name}_sum{format_labels(labels)} {self.sum}")
+        ret.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return ret
+
+    def snapshot(self):
+        return [self.counts, self.sum, self.count]
+
+    def merge(self, snapshot):
+        counts, total, count = snapshot
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+
+class Metrics:
+    """Per endpoint request metrics of one process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = dict()
+        self.latency = dict()
+        self.query_counts = dict()
+        self.db_seconds = dict()
+
+    def observe_request(
+        self, endpoint, method, status, seconds=None, queries=None, db_seconds=None
+    ):
+        """Record a finished request.
+
+        Every request is counted. Latency, query count and database time
+        are only given for sampled requests.
+        """
+        with self.lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if seconds is None:
+                return
+            if endpoint not in self.latency:
+                self.latency[endpoint] = Histogram(LATENCY_BUCKETS)
+                self.query_counts[endpoint] = Histogram(QUERY_COUNT_BUCKETS)
+                self.db_seconds[endpoint] = 0.0
+            self.latency[endpoint].observe(seconds)
+            self.query_counts[endpoint].observe(queries)
+            self.db_seconds[endpoint] += db_seconds
+
+    def snapshot(self):
+        """Return the metrics as a json serializable dict, see merge()."""
+        with self.lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "latency": {k: v.snapshot() for k, v in self.latency.items()},
+                "query_counts": {k: v.snapshot() for k, v in self.query_counts.items()},
+                "db_seconds": dict(self.db_seconds),
+            }
+
+    def merge(self, snapshot):
+        """Add the metrics of a snapshot(), such as of another process."""
+        with self.lock:
+            for endpoint, method, status, count in snapshot["requests"]:
+                key = (endpoint, method, status)
+                self.requests[key] = self.requests.get(key, 0) + count
+            for endpoint in snapshot["latency"]:
+                if endpoint not in self.latency:
+                    self.latency[endpoint] = Histogram(LATENCY_BUCKETS)
+                    self.query_counts[endpoint] = Histogram(QUERY_COUNT_BUCKETS)
+                    self.db_seconds[endpoint] = 0.0
+                self.latency[endpoint].merge(snapshot["latency"][endpoint])
+                self.query_counts[endpoint].merge(snapshot["query_counts"][endpoint])
+                self.db_seconds[endpoint] += snapshot["db_seconds"][endpoint]
+
+    def render(self, extra=()):
+        """Return metrics in Prometheus text format.
+
+        extra is a list of (name, help, type, value) of other metrics.
+        """
+        lines = []
+
+        def header(name, help, type):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+
+        with self.lock:
+            header("catboard_requests_total", "Requests served.", "counter")
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                labels = (
+                    ("endpoint", endpoint),
+                    ("method", method),
+                    ("status", status),
+                )
+                lines.append(f"catboard_requests_total{format_labels(labels)} {count}")
+
+            name = "catboard_request_duration_seconds"
+            header(
+                name,
+                "Latency of sampled requests until the response is returned.",
+                "histogram",
+            )
+            for endpoint, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines(name, (("endpoint", endpoint),)))
+
+            name = "catboard_request_db_queries"
+            header(name, "Database queries per sampled request.", "histogram")
+            for endpoint, histogram in sorted(self.query_counts.items()):
+                lines.extend(histogram.lines(name, (("endpoint", endpoint),)))
+
+            name = "catboard_request_db_seconds_total"
+            header(
+                name, "Time spent in database queries of sampled requests.", "counter"
+            )
+            for endpoint, seconds in sorted(self.db_seconds.items()):
+                lines.append(
+                    f"{name}{format_labels((('endpoint', endpoint),))} {seconds}"
+                )
+
+        for name, help, type, value in extra:
+            header(name, help, type)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def merge_extra(extras, gauges=True):
+    """Combine lists of extra metrics (see Metrics.render()) of several
+    processes. Counters are added up and gauges take the largest value.
+    """
+    merged = dict()
+    for extra in extras:
+        for name, help, type, value in extra:
+            if type == "gauge" and not gauges:
+                continue
+            if name not in merged:
+                merged[name] = [name, help, type, value]
+            elif type == "gauge":
+                merged[name][3] = max(merged[name][3], value)
+            else:
+                merged[name][3] += value
+    return list(merged.values())
+
+
+class SharedMetrics:
+    """Metrics of all the worker processes, shared through files in path.
+
+    Each process writes its metrics and the extra metrics from
+    get_extra() to <pid>.json, from a background thread every
+    write_seconds after they changed. When a worker exits, the master
+    process merges its counters into dead.json with collect(), so that
+    totals don't go down when workers are replaced. Files are replaced
+    atomically, so readers never see a partly written file.
+    """
+
+    def __init__(self, path, metrics, get_extra, write_seconds=1.0):
+        self.path = pathlib.Path(path)
+        self.metrics = metrics
+        self.get_extra = get_extra
+        self.write_seconds = write_seconds
+        self.lock = threading.Lock()
+        self.dirty = threading.Event()
+        # process that the writer thread runs in, None if not started
+        self.writer_pid = None
+        # identifies this process's files in dead.json, see collect()
+        self.token = None
+
+    def changed(self):
+        """Note that the metrics changed, to be written soon."""
+        with self.lock:
+            if self.writer_pid != os.getpid():
+                # after a fork, threads and tokens of the parent are gone
+                self.writer_pid = os.getpid()
+                self.token = secrets.token_hex(8)
+                threading.Thread(target=self.writer, daemon=True).start()
+        self.dirty.set()
+
+    def writer(self):
+        pid = os.getpid()
+        while self.writer_pid == pid:
+            self.dirty.wait()
+            self.write()
+            time.sleep(self.write_seconds)
+
+    def write(self):
+        """Write this process's metrics now."""
+        self.dirty.clear()
+        if self.token is None:
+            return
+        snapshot = {
+            "token": self.token,
+            "metrics": self.metrics.snapshot(),
+            "extra": self.get_extra(),
+        }
+        write_json(self.path / f"{os.getpid()}.json", snapshot)
+
+    def collect(self, pid):
+        """Merge the counters of the exited process pid into dead.json."""
+        pid_path = self.path / f"{pid}.json"
+        snapshot = read_json(pid_path)
+        if snapshot is None:
+            return
+        dead = read_json(self.path / "dead.json") or {
+            "tokens": [],
+            "metrics": Metrics().snapshot(),
+            "extra": [],
+        }
+        merged = Metrics()
+        merged.merge(dead["metrics"])
+        merged.merge(snapshot["metrics"])
+        dead = {
+            # for readers that read the pid file before it was removed
+            "tokens": (dead["tokens"] + [snapshot["token"]])[-1000:],
+            "metrics": merged.snapshot(),
+            "extra": merge_extra([dead["extra"], snapshot["extra"]], gauges=False),
+        }
+        write_json(self.path / "dead.json", dead)
+        pid_path.unlink()
+
+    def render(self):
+        """Return the metrics of all processes in Prometheus text format."""
+        self.changed()
+        self.write()
+        snapshots = [read_json(path) for path in self.path.glob("[0-9]*.json")]
+        # read last, so that pid files removed meanwhile are in it
+        dead = read_json(self.path / "dead.json")
+        if dead is not None:
+            tokens = set(dead["tokens"])
+            snapshots = [s for s in snapshots if s and s["token"] not in tokens]
+            snapshots.append(dead)
+        merged = Metrics()
+        for snapshot in snapshots:
+            if snapshot is not None:
+                merged.merge(snapshot["metrics"])
+        extra = merge_extra(s["extra"] for s in snapshots if s is not None)
+        return merged.render(extra)
+
+
+def write_json(path, data):
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    """Return the data in the json file, or None if there is no such file."""
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
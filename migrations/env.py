@@ -26,6 +26,24 @@ config.set_main_option(
         '%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+# made by the item search migration outside of the models, so autogenerate
+# mustn't offer to drop them
+search_index_tables = ("item_fts",)
+search_index_names = ("ix_item_search_vector", "ix_item_fulltext")
+search_index_columns = ("search_vector",)
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the full-text search index out of autogenerate comparisons."""
+    if type_ == "table" and name.startswith(search_index_tables):
+        return False
+    if type_ == "index" and name in search_index_names:
+        return False
+    if type_ == "column" and name in search_index_columns:
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -46,7 +64,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=target_metadata, literal_binds=True
+        url=url, target_metadata=target_metadata, literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -78,6 +97,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
@@ -0,0 +1,36 @@
+"""item transition indexes
+
+Revision ID: 3b8e1f2a9c47
+Revises: df0c6931d075
+Create Date: 2026-10-18 10:02:11.412093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3b8e1f2a9c47"
+down_revision = "df0c6931d075"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("item_transition", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_item_transition_item_id_epochtime",
+            ["item_id", "epochtime"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_item_transition_to_column_id_epochtime",
+            ["to_column_id", "epochtime"],
+            unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("item_transition", schema=None) as batch_op:
+        batch_op.drop_index("ix_item_transition_to_column_id_epochtime")
+        batch_op.drop_index("ix_item_transition_item_id_epochtime")
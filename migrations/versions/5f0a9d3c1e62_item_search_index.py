@@ -0,0 +1,80 @@
+"""item search index
+
+Revision ID: 5f0a9d3c1e62
+Revises: 8d27c4e5b0f3
+Create Date: 2026-10-18 14:20:52.108337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5f0a9d3c1e62"
+down_revision = "8d27c4e5b0f3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        # external content fts5 table over item, kept in sync by triggers
+        op.execute(
+            "CREATE VIRTUAL TABLE item_fts USING fts5("
+            "name, description, assigned, content='item', content_rowid='id')"
+        )
+        op.execute(
+            "CREATE TRIGGER item_fts_insert AFTER INSERT ON item BEGIN "
+            "INSERT INTO item_fts(rowid, name, description, assigned) "
+            "VALUES (new.id, new.name, new.description, new.assigned); END"
+        )
+        op.execute(
+            "CREATE TRIGGER item_fts_delete AFTER DELETE ON item BEGIN "
+            "INSERT INTO item_fts(item_fts, rowid, name, description, assigned) "
+            "VALUES ('delete', old.id, old.name, old.description, old.assigned); END"
+        )
+        op.execute(
+            "CREATE TRIGGER item_fts_update "
+            "AFTER UPDATE OF name, description, assigned ON item BEGIN "
+            "INSERT INTO item_fts(item_fts, rowid, name, description, assigned) "
+            "VALUES ('delete', old.id, old.name, old.description, old.assigned); "
+            "INSERT INTO item_fts(rowid, name, description, assigned) "
+            "VALUES (new.id, new.name, new.description, new.assigned); END"
+        )
+        op.execute("INSERT INTO item_fts(item_fts) VALUES ('rebuild')")
+    elif dialect == "postgresql":
+        op.execute(
+            "ALTER TABLE item ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(assigned, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+            ") STORED"
+        )
+        op.create_index(
+            "ix_item_search_vector",
+            "item",
+            ["search_vector"],
+            postgresql_using="gin",
+        )
+    elif dialect == "mysql":
+        op.create_index(
+            "ix_item_fulltext",
+            "item",
+            ["name", "description", "assigned"],
+            mysql_prefix="FULLTEXT",
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        op.execute("DROP TRIGGER item_fts_update")
+        op.execute("DROP TRIGGER item_fts_delete")
+        op.execute("DROP TRIGGER item_fts_insert")
+        op.execute("DROP TABLE item_fts")
+    elif dialect == "postgresql":
+        op.drop_index("ix_item_search_vector", table_name="item")
+        op.drop_column("item", "search_vector")
+    elif dialect == "mysql":
+        op.drop_index("ix_item_fulltext", table_name="item")
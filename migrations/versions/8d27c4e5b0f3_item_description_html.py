@@ -0,0 +1,26 @@
+"""item description html
+
+Revision ID: 8d27c4e5b0f3
+Revises: 3b8e1f2a9c47
+Create Date: 2026-10-18 10:41:37.220514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "8d27c4e5b0f3"
+down_revision = "3b8e1f2a9c47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("item", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("description_html", sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("item", schema=None) as batch_op:
+        batch_op.drop_column("description_html")
@@ -0,0 +1,34 @@
+"""board change counter
+
+Revision ID: a41c7e9d2b58
+Revises: 5f0a9d3c1e62
+Create Date: 2026-10-18 16:02:37.514920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a41c7e9d2b58"
+down_revision = "5f0a9d3c1e62"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("board", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(
+            sa.Column(
+                "modified_epochtime", sa.Integer(), nullable=False, server_default="0"
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("board", schema=None) as batch_op:
+        batch_op.drop_column("modified_epochtime")
+        batch_op.drop_column("version")
@@ -0,0 +1,127 @@
+"""item checklist
+
+Revision ID: a8e4c2b9d107
+Revises: f1c8a7d3e925
+Create Date: 2026-10-18 21:36:08.412957
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a8e4c2b9d107"
+down_revision = "f1c8a7d3e925"
+branch_labels = None
+depends_on = None
+
+# see app.extract_checkboxes()
+checkbox_line_re = re.compile(r"- \[(.?)\] (.*)")
+
+item = sa.table(
+    "item",
+    sa.column("id"),
+    sa.column("description"),
+    sa.column("checklist_done"),
+    sa.column("checklist_total"),
+)
+item_checklist = sa.table(
+    "item_checklist",
+    sa.column("item_id"),
+    sa.column("position"),
+    sa.column("text"),
+    sa.column("done"),
+)
+
+
+def upgrade():
+    op.create_table(
+        "item_checklist",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("done", sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["item_id"],
+            ["item.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("item_checklist", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_item_checklist_item_id_position",
+            ["item_id", "position"],
+            unique=False,
+        )
+    # adding columns doesn't recreate the item table, which would lose the
+    # item_fts triggers
+    with op.batch_alter_table("item", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "checklist_done", sa.Integer(), server_default="0", nullable=False
+            )
+        )
+        batch_op.add_column(
+            sa.Column(
+                "checklist_total", sa.Integer(), server_default="0", nullable=False
+            )
+        )
+
+    # parse the checklists of existing items, in batches
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        items = conn.execute(
+            sa.select(item.c.id, item.c.description)
+            .where(item.c.id > last_id)
+            .order_by(item.c.id)
+            .limit(1000)
+        ).all()
+        if not items:
+            break
+        last_id = items[-1].id
+        rows = []
+        progress = []
+        for item_id, description in items:
+            done = total = 0
+            for line in (description or "").split("\n"):
+                m = checkbox_line_re.match(line)
+                if m:
+                    rows.append(
+                        {
+                            "item_id": item_id,
+                            "position": total,
+                            "text": m.group(2),
+                            "done": m.group(1) == "x",
+                        }
+                    )
+                    done += m.group(1) == "x"
+                    total += 1
+            if total:
+                progress.append({"row_id": item_id, "done": done, "total": total})
+        if rows:
+            conn.execute(item_checklist.insert(), rows)
+        if progress:
+            conn.execute(
+                item.update()
+                .where(item.c.id == sa.bindparam("row_id"))
+                .values(
+                    checklist_done=sa.bindparam("done"),
+                    checklist_total=sa.bindparam("total"),
+                ),
+                progress,
+            )
+
+
+def downgrade():
+    # not in batch mode, which would recreate the item table without its
+    # item_fts triggers on sqlite (this needs sqlite 3.35 or later)
+    op.drop_column("item", "checklist_total")
+    op.drop_column("item", "checklist_done")
+    with op.batch_alter_table("item_checklist", schema=None) as batch_op:
+        batch_op.drop_index("ix_item_checklist_item_id_position")
+
+    op.drop_table("item_checklist")
@@ -0,0 +1,28 @@
+"""user change counter
+
+Revision ID: b5e2d8c4f170
+Revises: a8e4c2b9d107
+Create Date: 2026-10-19 09:12:44.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b5e2d8c4f170"
+down_revision = "a8e4c2b9d107"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("user", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), nullable=False, server_default="0")
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("user", schema=None) as batch_op:
+        batch_op.drop_column("version")
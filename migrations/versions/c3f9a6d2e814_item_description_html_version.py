@@ -0,0 +1,29 @@
+"""item description html version
+
+Revision ID: c3f9a6d2e814
+Revises: b5e2d8c4f170
+Create Date: 2026-10-19 11:03:27.581942
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c3f9a6d2e814"
+down_revision = "b5e2d8c4f170"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("item", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("description_html_version", sa.String(length=64), nullable=True)
+        )
+
+
+def downgrade():
+    # not in batch mode, which would recreate the item table without its
+    # item_fts triggers on sqlite (this needs sqlite 3.35 or later)
+    op.drop_column("item", "description_html_version")
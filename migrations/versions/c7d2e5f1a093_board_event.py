@@ -0,0 +1,45 @@
+"""board event
+
+Revision ID: c7d2e5f1a093
+Revises: a41c7e9d2b58
+Create Date: 2026-10-18 17:11:05.283614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c7d2e5f1a093"
+down_revision = "a41c7e9d2b58"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "board_event",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("board_id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("data", sa.Text(), nullable=True),
+        sa.Column("epochtime", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["board_id"],
+            ["board.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        # never reuse ids, even if all events were pruned
+        sqlite_autoincrement=True,
+    )
+    with op.batch_alter_table("board_event", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_board_event_board_id_id", ["board_id", "id"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("board_event", schema=None) as batch_op:
+        batch_op.drop_index("ix_board_event_board_id_id")
+
+    op.drop_table("board_event")
@@ -0,0 +1,94 @@
+"""item archive
+
+Revision ID: e3b9a1f6c2d4
+Revises: c7d2e5f1a093
+Create Date: 2026-10-18 19:02:41.519304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e3b9a1f6c2d4"
+down_revision = "c7d2e5f1a093"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "archived_item",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("name", sa.String(length=256), nullable=False),
+        sa.Column("assigned", sa.String(length=64), nullable=False),
+        sa.Column("color", sa.String(length=64), nullable=False),
+        sa.Column("closed", sa.Boolean(), nullable=False),
+        sa.Column("public", sa.Boolean(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("column_id", sa.Integer(), nullable=False),
+        sa.Column("archived_epochtime", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["column_id"],
+            ["column.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "archived_item_transition",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.Column("from_column_id", sa.Integer(), nullable=True),
+        sa.Column("to_column_id", sa.Integer(), nullable=False),
+        sa.Column("epochtime", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["from_column_id"],
+            ["column.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["item_id"],
+            ["archived_item.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["to_column_id"],
+            ["column.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    with op.batch_alter_table("archived_item_transition", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_archived_item_transition_item_id_epochtime",
+            ["item_id", "epochtime"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_archived_item_transition_to_column_id_epochtime",
+            ["to_column_id", "epochtime"],
+            unique=False,
+        )
+    op.create_table(
+        "archived_item_relationship",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("item1_id", sa.Integer(), nullable=False),
+        sa.Column("item2_id", sa.Integer(), nullable=False),
+        sa.Column("type", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["item1_id"],
+            ["archived_item.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["item2_id"],
+            ["archived_item.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("archived_item_relationship")
+    with op.batch_alter_table("archived_item_transition", schema=None) as batch_op:
+        batch_op.drop_index("ix_archived_item_transition_to_column_id_epochtime")
+        batch_op.drop_index("ix_archived_item_transition_item_id_epochtime")
+
+    op.drop_table("archived_item_transition")
+    op.drop_table("archived_item")
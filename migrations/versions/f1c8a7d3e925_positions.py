@@ -0,0 +1,177 @@
+"""lane, column and item positions
+
+Revision ID: f1c8a7d3e925
+Revises: e3b9a1f6c2d4
+Create Date: 2026-10-18 20:14:52.730165
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f1c8a7d3e925"
+down_revision = "e3b9a1f6c2d4"
+branch_labels = None
+depends_on = None
+
+# see app.position_gap
+position_gap = 1024
+
+board = sa.table("board", sa.column("id"), sa.column("lanes_sorted"))
+lane = sa.table(
+    "lane",
+    sa.column("id"),
+    sa.column("board_id"),
+    sa.column("columns_sorted"),
+    sa.column("position"),
+    sa.column("hidden"),
+)
+column = sa.table(
+    "column",
+    sa.column("id"),
+    sa.column("lane_id"),
+    sa.column("position"),
+    sa.column("hidden"),
+)
+item = sa.table("item", sa.column("id"), sa.column("position"))
+
+
+def set_positions(conn, table, ids, sorted_ids):
+    """Order the rows ids as in the comma separated sorted_ids string.
+
+    Rows left out of sorted_ids weren't shown, so they're hidden.
+    """
+    shown = ids
+    if sorted_ids:
+        existing = set(ids)
+        shown = dict.fromkeys(
+            int(x) for x in sorted_ids.split(",") if x.strip().isdigit()
+        )
+        shown = [row_id for row_id in shown if row_id in existing]
+    hidden = [row_id for row_id in ids if row_id not in set(shown)]
+    rows = [{"row_id": row_id, "row_hidden": False} for row_id in shown] + [
+        {"row_id": row_id, "row_hidden": True} for row_id in hidden
+    ]
+    for idx, row in enumerate(rows):
+        row["row_position"] = (idx + 1) * position_gap
+    if rows:
+        conn.execute(
+            table.update()
+            .where(table.c.id == sa.bindparam("row_id"))
+            .values(
+                position=sa.bindparam("row_position"),
+                hidden=sa.bindparam("row_hidden"),
+            ),
+            rows,
+        )
+
+
+def sorted_ids(conn, table, parent_id_column, parent_id):
+    """Return comma separated ids of the shown rows in position order."""
+    ids = [
+        str(row_id)
+        for (row_id,) in conn.execute(
+            sa.select(table.c.id)
+            .where(parent_id_column == parent_id, table.c.hidden == sa.false())
+            .order_by(table.c.position, table.c.id)
+        )
+    ]
+    return ",".join(ids) or None
+
+
+def upgrade():
+    for table_name in ["lane", "column"]:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column("position", sa.Integer(), server_default="0", nullable=False)
+            )
+            batch_op.add_column(
+                sa.Column(
+                    "hidden", sa.Boolean(), server_default=sa.false(), nullable=False
+                )
+            )
+    # adding columns and indexes doesn't recreate the item table, which
+    # would lose the item_fts triggers
+    for table_name in ["item", "archived_item"]:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(
+                sa.Column("position", sa.Integer(), server_default="0", nullable=False)
+            )
+
+    conn = op.get_bind()
+    lane_rows = conn.execute(
+        sa.select(lane.c.id, lane.c.board_id, lane.c.columns_sorted).order_by(
+            lane.c.id
+        )
+    ).all()
+    column_rows = conn.execute(
+        sa.select(column.c.id, column.c.lane_id).order_by(column.c.id)
+    ).all()
+    board_rows = conn.execute(sa.select(board.c.id, board.c.lanes_sorted)).all()
+    for board_id, lanes_sorted in board_rows:
+        lane_ids = [row.id for row in lane_rows if row.board_id == board_id]
+        set_positions(conn, lane, lane_ids, lanes_sorted)
+    for lane_row in lane_rows:
+        column_ids = [row.id for row in column_rows if row.lane_id == lane_row.id]
+        set_positions(conn, column, column_ids, lane_row.columns_sorted)
+    # items had no order other than by id
+    conn.execute(item.update().values(position=item.c.id))
+
+    with op.batch_alter_table("item", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_item_column_id_position", ["column_id", "position"], unique=False
+        )
+    with op.batch_alter_table("column", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_column_lane_id_position", ["lane_id", "position"], unique=False
+        )
+    with op.batch_alter_table("lane", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_lane_board_id_position", ["board_id", "position"], unique=False
+        )
+        batch_op.drop_column("columns_sorted")
+    with op.batch_alter_table("board", schema=None) as batch_op:
+        batch_op.drop_column("lanes_sorted")
+
+
+def downgrade():
+    with op.batch_alter_table("board", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("lanes_sorted", sa.String(length=512), nullable=True)
+        )
+    with op.batch_alter_table("lane", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("columns_sorted", sa.String(length=512), nullable=True)
+        )
+
+    conn = op.get_bind()
+    for (board_id,) in conn.execute(sa.select(board.c.id)).all():
+        conn.execute(
+            board.update()
+            .where(board.c.id == board_id)
+            .values(lanes_sorted=sorted_ids(conn, lane, lane.c.board_id, board_id))
+        )
+    for (lane_id,) in conn.execute(sa.select(lane.c.id)).all():
+        conn.execute(
+            lane.update()
+            .where(lane.c.id == lane_id)
+            .values(
+                columns_sorted=sorted_ids(conn, column, column.c.lane_id, lane_id)
+            )
+        )
+
+    with op.batch_alter_table("lane", schema=None) as batch_op:
+        batch_op.drop_index("ix_lane_board_id_position")
+        batch_op.drop_column("hidden")
+        batch_op.drop_column("position")
+    with op.batch_alter_table("column", schema=None) as batch_op:
+        batch_op.drop_index("ix_column_lane_id_position")
+        batch_op.drop_column("hidden")
+        batch_op.drop_column("position")
+    with op.batch_alter_table("archived_item", schema=None) as batch_op:
+        batch_op.drop_column("position")
+    # not in batch mode, which would recreate the item table without its
+    # item_fts triggers on sqlite (this needs sqlite 3.35 or later)
+    op.drop_index("ix_item_column_id_position", table_name="item")
+    op.drop_column("item", "position")
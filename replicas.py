@@ -0,0 +1,74 @@
+"""Round-robin choice of healthy read replicas."""
+
+import logging
+import threading
+import time
+
+
+class ReplicaPool:
+    """Hand out read replica names in turn, skipping replicas that are down.
+
+    check(name) should raise if the replica can't be used. Each replica
+    is checked when first chosen and again every check_seconds, in the
+    thread that chose it; until then a replica is down if its last check
+    failed or mark_down() was called for it. Failed checks are logged as
+    warnings to logger.
+    """
+
+    def __init__(self, names, check, check_seconds=10, logger=None):
+        self.names = list(names)
+        self.check = check
+        self.check_seconds = check_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.next_idx = 0
+        # name -> (up, monotonic time of the last check)
+        self.state = dict()
+        self.reads = 0
+        self.fallbacks = 0
+
+    def choose(self):
+        """Return the name of the next replica that is up, or None."""
+        for _ in range(len(self.names)):
+            now = time.monotonic()
+            with self.lock:
+                name = self.names[self.next_idx]
+                self.next_idx = (self.next_idx + 1) % len(self.names)
+                up, checked_at = self.state.get(name, (False, None))
+                due = checked_at is None or now - checked_at >= self.check_seconds
+                if due:
+                    # other threads keep the old state while this one checks
+                    self.state[name] = (up, now)
+            if due:
+                up = self.run_check(name)
+            if up:
+                with self.lock:
+                    self.reads += 1
+                return name
+        with self.lock:
+            self.fallbacks += 1
+        return None
+
+    def run_check(self, name):
+        try:
+            self.check(name)
+            up = True
+        except Exception as e:
+            self.logger.warning("read replica %s is down: %r", name, e)
+            up = False
+        with self.lock:
+            self.state[name] = (up, time.monotonic())
+        return up
+
+    def mark_down(self, name):
+        """Don't choose the replica until it is checked again."""
+        with self.lock:
+            self.state[name] = (False, time.monotonic())
+
+    def stats(self):
+        with self.lock:
+            return {
+                "up": sum(1 for up, _ in self.state.values() if up),
+                "reads": self.reads,
+                "fallbacks": self.fallbacks,
+            }
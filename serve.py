@@ -0,0 +1,84 @@
+"""Run catboard with gunicorn, for production use."""
+
+import argh
+
+
+def serve(
+    host="127.0.0.1",
+    port=7777,
+    workers=2,
+    threads=4,
+    pool_size=None,
+    max_overflow=0,
+    timeout=30,
+    graceful_timeout=30,
+    max_requests=0,
+):
+    """Run flask app with gunicorn.
+
+    The app is loaded once in the master process and forked into the
+    worker processes. Each worker gets a database connection pool of
+    pool_size (default: one per thread) plus max_overflow connections.
+    The workers share their /metrics through files in a temporary
+    directory. Send SIGHUP to the master process to gracefully restart
+    the workers.
+    """
+    import os
+    import shutil
+    import tempfile
+
+    import gunicorn.app.base
+
+    import app
+
+    app.set_db_pool(pool_size or threads, max_overflow)
+    metrics_dir = tempfile.mkdtemp(prefix="catboard-metrics-")
+    app.set_metrics_dir(metrics_dir)
+
+    def post_fork(server, worker):
+        # don't share connections opened before the fork between workers
+        with app.app.app_context():
+            for engine in app.db.engines.values():
+                engine.dispose(close=False)
+
+    def worker_exit(server, worker):
+        app.shared_metrics.write()
+
+    def child_exit(server, worker):
+        # in the master process, keep the counts of the exited worker
+        app.shared_metrics.collect(worker.pid)
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": timeout,
+        "graceful_timeout": graceful_timeout,
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "child_exit": child_exit,
+    }
+
+    class Server(gunicorn.app.base.BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app.app
+
+    master_pid = os.getpid()
+    try:
+        Server().run()
+    finally:
+        # workers exit through here too
+        if os.getpid() == master_pid:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    argh.dispatch_command(serve)
@@ -1,27 +1,243 @@
 const draggables = document.querySelectorAll(".draggable")
 const containers = document.querySelectorAll(".container")
 var target = null
+// the item the dragged item goes before, or null for the end of the column
+var targetBefore = null
 
-draggables.forEach(draggable => {
+function makeDraggable(draggable) {
   draggable.addEventListener('dragstart', () => {
     draggable.classList.add('dragging')
   })
-})
-
-draggables.forEach(draggable => {
   draggable.addEventListener('dragend', () => {
     draggable.classList.remove('dragging')
-    target.appendChild(draggable)
-    const url = '/item/move/' + draggable.id + '/' + target.id
-    console.log(url)
-    var xmlhttp = new XMLHttpRequest();
-    xmlhttp.open("GET", url);
-    xmlhttp.send()
+    const card = itemCard(draggable)
+    const from = card.parentElement
+    const before = targetBefore ? itemCard(targetBefore) : null
+    if (!target || (target == from && before == card.nextElementSibling)) {
+      return
+    }
+    // show the move right away, and put the item back if it fails
+    const next = card.nextSibling
+    target.insertBefore(card, before)
+    const change = {column_id: Number(target.id)}
+    if (targetBefore) {
+      change.before_item_id = Number(targetBefore.id)
+    }
+    postJson("/api/item/" + draggable.id + "/move", change)
+      .then(result => {
+        draggable.dataset.position = result.position
+      })
+      .catch(error => {
+        from.insertBefore(card, next && next.parentNode == from ? next : null)
+        alert("Moving the item failed: " + error.message)
+      })
   })
-})
+}
+
+// the first item in container below y, other than the dragged one
+function itemBelow(container, y) {
+  for (const itemDiv of container.querySelectorAll(".item:not(.dragging)")) {
+    const box = itemDiv.getBoundingClientRect()
+    if (y < box.top + box.height / 2) {
+      return itemDiv
+    }
+  }
+  return null
+}
+
+// post data as json and return a promise of the json response
+function postJson(url, data) {
+  return fetch(url, {
+    method: "POST",
+    headers: {"Content-Type": "application/json"},
+    body: JSON.stringify(data),
+  }).then(response => {
+    if (!response.ok) {
+      throw new Error(response.status + " " + response.statusText)
+    }
+    return response.json()
+  })
+}
+
+draggables.forEach(makeDraggable)
 
 containers.forEach(container => {
-  container.addEventListener('dragover', () => {
+  container.addEventListener('dragover', event => {
     target = container
+    targetBefore = itemBelow(container, event.clientY)
   })
 })
+
+// live updates, see board_events() in app.py
+
+const showClosed = new URLSearchParams(window.location.search).get("show_closed")
+
+// the element to move for an item: its link, unless it was dragged out of it
+function itemCard(itemDiv) {
+  const parent = itemDiv.parentElement
+  return parent.tagName == "A" ? parent : itemDiv
+}
+
+function newItemCard(item) {
+  const link = document.createElement("a")
+  link.style.textDecoration = "none"
+  link.href = "/item/" + item.id
+  const div = document.createElement("div")
+  div.id = item.id
+  div.draggable = true
+  div.style.cssText = "padding-left: 2px; padding-right: 2px; margin: 1px; margin-bottom: 2px;"
+  const p = document.createElement("p")
+  p.className = "truncate"
+  p.style.cssText = "text-overflow: clip; padding: 0px; margin: 2px"
+  const strong = document.createElement("strong")
+  const label = document.createTextNode("")
+  const name = document.createElement("span")
+  const checklist = document.createElement("small")
+  checklist.className = "checklist"
+  p.append(strong, label, document.createElement("br"), name, checklist)
+  div.appendChild(p)
+  link.appendChild(div)
+  makeDraggable(div)
+  return link
+}
+
+function updateItemCard(itemDiv, item) {
+  itemDiv.className = "item draggable w3-panel " + item.color + " "
+  itemDiv.dataset.position = item.position
+  itemDiv.classList.toggle("selected", selected.has(itemDiv.id))
+  const p = itemDiv.querySelector("p")
+  p.querySelector("strong").textContent = "#" + item.id
+  p.childNodes[1].textContent = item.assigned ? " - " + item.assigned : ""
+  const name = p.querySelector("span")
+  name.textContent = item.name
+  name.style.textDecoration = item.closed ? "line-through" : ""
+  p.querySelector(".checklist").textContent = item.checklist_total
+    ? " " + item.checklist_done + "/" + item.checklist_total
+    : ""
+}
+
+function showItem(item) {
+  const column = document.querySelector('.column[id="' + item.column_id + '"]')
+  var itemDiv = document.querySelector('.item[id="' + item.id + '"]')
+  if (!column || (item.closed && !showClosed)) {
+    if (itemDiv) {
+      itemCard(itemDiv).remove()
+    }
+    return
+  }
+  if (!itemDiv) {
+    itemDiv = newItemCard(item).firstChild
+  }
+  updateItemCard(itemDiv, item)
+  placeItemCard(column, itemDiv)
+}
+
+// put an item's card in its column, ordered like board_snapshot() in app.py
+function placeItemCard(column, itemDiv) {
+  const position = Number(itemDiv.dataset.position)
+  for (const other of column.querySelectorAll(".item")) {
+    const otherPosition = Number(other.dataset.position)
+    if (other != itemDiv && (otherPosition > position
+        || (otherPosition == position && Number(other.id) > Number(itemDiv.id)))) {
+      column.insertBefore(itemCard(itemDiv), itemCard(other))
+      return
+    }
+  }
+  column.appendChild(itemCard(itemDiv))
+}
+
+// the browser revalidates with the response's ETag, so polls of an
+// unchanged board get a 304 and the previous (empty) response
+function pollForChanges(url, pollSeconds) {
+  fetch(url, {headers: {"Accept": "application/json"}})
+    .then(response => response.ok ? response.json() : {events: []})
+    .catch(() => ({events: []}))
+    .then(response => {
+      for (const event of response.events) {
+        if (event.kind == "changed") {
+          window.location.reload()
+          return
+        }
+        url.searchParams.set("after", event.id)
+        showItem(event.data)
+      }
+      setTimeout(() => pollForChanges(url, pollSeconds), pollSeconds * 1000)
+    })
+}
+
+const board = document.getElementById("board")
+if (board) {
+  const pollSeconds = Number(board.dataset.pollSeconds)
+  const url = new URL(board.dataset.eventsUrl, window.location.href)
+  setTimeout(() => pollForChanges(url, pollSeconds), pollSeconds * 1000)
+}
+
+// selecting items to change them together, see items_bulk() in app.py
+
+const bulk = document.getElementById("bulk")
+const selected = new Set()
+
+function showSelectedCount() {
+  document.getElementById("bulk_count").textContent = selected.size + " selected"
+}
+
+function selectItem(itemDiv, select) {
+  if (select) {
+    selected.add(itemDiv.id)
+  } else {
+    selected.delete(itemDiv.id)
+  }
+  itemDiv.classList.toggle("selected", select)
+  showSelectedCount()
+}
+
+function clearSelection() {
+  document.querySelectorAll(".item.selected").forEach(itemDiv => {
+    itemDiv.classList.remove("selected")
+  })
+  selected.clear()
+  showSelectedCount()
+}
+
+function bulkChange(action) {
+  const change = {item_ids: Array.from(selected, Number), action: action}
+  if (action == "move") {
+    change.column_id = Number(document.getElementById("bulk_column").value)
+  } else if (action == "color") {
+    change.color = document.getElementById("bulk_color").value
+  }
+  postJson("/items/bulk", change)
+    .then(result => {
+      clearSelection()
+      result.items.forEach(showItem)
+    })
+    .catch(error => alert("Changing the items failed: " + error.message))
+}
+
+if (bulk) {
+  document.getElementById("select_items").addEventListener("click", event => {
+    event.preventDefault()
+    if (bulk.style.display == "none") {
+      bulk.style.display = ""
+    } else {
+      bulk.style.display = "none"
+      clearSelection()
+    }
+  })
+  // in select mode, clicking an item selects it instead of opening it
+  document.addEventListener("click", event => {
+    const itemDiv = event.target.closest(".item")
+    if (bulk.style.display == "none" || !itemDiv) {
+      return
+    }
+    event.preventDefault()
+    selectItem(itemDiv, !selected.has(itemDiv.id))
+  })
+  bulk.querySelectorAll("button").forEach(button => {
+    button.addEventListener("click", () => {
+      if (selected.size) {
+        bulkChange(button.dataset.action)
+      }
+    })
+  })
+}
@@ -0,0 +1,144 @@
+"""Test fixtures: a migrated sqlite database per test and a logged in client."""
+
+import contextlib
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = pathlib.Path(__file__).resolve().parent.parent
+TMP_DIR = tempfile.mkdtemp(prefix="catboard-tests-")
+DB_PATH = pathlib.Path(TMP_DIR) / "test.db"
+TEMPLATE_DB_PATH = pathlib.Path(TMP_DIR) / "template.db"
+
+# read by app on import
+os.environ["CATBOARD_SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
+os.environ["CATBOARD_SECRET_KEY"] = "test"
+os.environ["CATBOARD_METRICS_SAMPLE_RATE"] = "0"
+sys.path.insert(0, str(REPO_DIR))
+os.chdir(REPO_DIR)
+
+import app as catboard  # noqa: E402
+import user_cache  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def template_db():
+    """Migrate an empty database once, to be copied for each test."""
+    import flask_migrate
+
+    with catboard.app.app_context():
+        catboard.init_migrate()
+        flask_migrate.upgrade(directory=str(REPO_DIR / "migrations"))
+        catboard.db.engine.dispose()
+    shutil.copy(DB_PATH, TEMPLATE_DB_PATH)
+    yield TEMPLATE_DB_PATH
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def app(template_db):
+    """Return the flask app with a fresh database and empty caches.
+
+    Tests change the database inside app.app_context(). Requests get
+    their own app context, and so their own session, only if there is
+    no app context already.
+    """
+    with catboard.app.app_context():
+        catboard.db.engine.dispose()
+    shutil.copy(template_db, DB_PATH)
+    catboard.session_user_cache.backend = user_cache.MemoryBackend()
+    catboard.board_summary_cache.clear()
+    catboard.board_flow_cache.clear()
+    catboard.graph_layout_cache.clear()
+    return catboard.app
+
+
+def add_user(username="user", password="password", board_ids=()):
+    with catboard.app.app_context():
+        user = catboard.User(username=username)
+        user.set_password(password)
+        catboard.db.session.add(user)
+        catboard.db.session.flush()
+        for board_id in board_ids:
+            catboard.db.session.execute(
+                catboard.user_board.insert().values(user_id=user.id, board_id=board_id)
+            )
+        catboard.db.session.commit()
+        return user.id
+
+
+def add_board(lanes=1, columns=3, items=0, name="board"):
+    """Add a board with items spread over its columns, return its id."""
+    with catboard.app.app_context():
+        gap = catboard.position_gap
+        board = catboard.Board(name=name)
+        for lane_idx in range(lanes):
+            lane = catboard.Lane(name=f"lane {lane_idx}", position=(lane_idx + 1) * gap)
+            for column_idx in range(columns):
+                lane.columns.append(
+                    catboard.Column(
+                        name=f"column {column_idx}", position=(column_idx + 1) * gap
+                    )
+                )
+            board.lanes.append(lane)
+        catboard.db.session.add(board)
+        catboard.db.session.flush()
+        column_ids = [column.id for lane in board.lanes for column in lane.columns]
+        if items:
+            catboard.db.session.execute(
+                catboard.Item.__table__.insert(),
+                [
+                    {
+                        "name": f"item {idx}",
+                        "assigned": "",
+                        "color": "w3-red",
+                        "closed": idx % 5 == 0,
+                        "public": False,
+                        "description": "- [x] one\n- [ ] two",
+                        "column_id": column_ids[idx % len(column_ids)],
+                        "position": (idx + 1) * gap,
+                    }
+                    for idx in range(items)
+                ],
+            )
+        catboard.db.session.commit()
+        return board.id
+
+
+def login(client, username="user", password="password"):
+    response = client.post("/login", data={"username": username, "password": password})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def board_id(app):
+    return add_board(items=6)
+
+
+@pytest.fixture
+def client(app, board_id):
+    """Return a test client logged in as a user with access to board_id."""
+    add_user(board_ids=[board_id])
+    return login(app.test_client())
+
+
+@contextlib.contextmanager
+def count_queries():
+    """Collect the sql statements run inside the block in a list."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with catboard.app.app_context():
+        engine = catboard.db.engine
+    catboard.db.event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        catboard.db.event.remove(engine, "before_cursor_execute", before_cursor_execute)
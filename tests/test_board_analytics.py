@@ -0,0 +1,70 @@
+import app as catboard
+from conftest import add_board, add_user, login
+
+
+def transition_ids(app, board_id):
+    with app.app_context():
+        board = catboard.db.session.get(catboard.Board, board_id)
+        return catboard.board_flow_transitions(board)["id"].tolist()
+
+
+def test_flow_cache_follows_lane_moves(app, monkeypatch):
+    monkeypatch.setattr(catboard, "board_flow_cache_size", 2)
+    board_id = add_board(items=3)
+    other_board_id = add_board(name="other")
+    add_user(board_ids=[board_id, other_board_id])
+    client = login(app.test_client())
+    with app.app_context():
+        lane = catboard.Lane.query.filter_by(board_id=board_id).one()
+        lane_id = lane.id
+        item_id = lane.columns[0].items[0].id
+        column_id = lane.columns[1].id
+
+    assert client.get(f"/item/move/{item_id}/{column_id}").status_code == 302
+    assert client.get(f"/board/{board_id}/analytics.json").status_code == 200
+    assert client.get(f"/board/{other_board_id}/analytics.json").status_code == 200
+    [moved_id] = transition_ids(app, board_id)
+    assert transition_ids(app, other_board_id) == []
+
+    client.get(f"/lane/{lane_id}/move/{other_board_id}")
+    assert transition_ids(app, board_id) == []
+    assert transition_ids(app, other_board_id) == [moved_id]
+
+    third_board_id = add_board(name="third")
+    transition_ids(app, third_board_id)
+    assert list(catboard.board_flow_cache) == [other_board_id, third_board_id]
+
+
+def test_flow_cache_appends_after_item_moves(app):
+    board_id = add_board(items=3)
+    add_user(board_ids=[board_id])
+    client = login(app.test_client())
+    with app.app_context():
+        lane = catboard.Lane.query.filter_by(board_id=board_id).one()
+        lane_id = lane.id
+        item_ids = [item.id for item in lane.columns[0].items]
+        column_ids = [column.id for column in lane.columns]
+
+    client.get(f"/item/move/{item_ids[0]}/{column_ids[1]}")
+    [first_id] = transition_ids(app, board_id)
+    # marks the cached transition, which a full reload would undo
+    catboard.board_flow_cache[board_id]["transitions"]["epochtime"][0] = -1
+
+    client.get(f"/item/move/{item_ids[0]}/{column_ids[2]}")
+    client.get(f"/item/color/{item_ids[0]}/w3-blue")
+    with app.app_context():
+        board = catboard.db.session.get(catboard.Board, board_id)
+        transitions = catboard.board_flow_transitions(board)
+    assert transitions["id"].tolist()[0] == first_id
+    assert len(transitions["id"]) == 2
+    assert transitions["epochtime"][0] == -1
+
+    client.post(
+        f"/lane/{lane_id}/edit",
+        data={"Submit": "Submit_rename_lane", "new_lane_name": "renamed"},
+    )
+    with app.app_context():
+        board = catboard.db.session.get(catboard.Board, board_id)
+        transitions = catboard.board_flow_transitions(board)
+    assert len(transitions["id"]) == 2
+    assert transitions["epochtime"][0] > 0
@@ -0,0 +1,61 @@
+import re
+
+import app as catboard
+from conftest import count_queries
+
+
+def events_url(client, board_id):
+    page = client.get(f"/board/{board_id}").get_data(as_text=True)
+    return re.search(r'data-events-url="([^"]+)"', page).group(1).replace("&amp;", "&")
+
+
+def test_unchanged_board_poll_is_not_modified(client, board_id):
+    url = events_url(client, board_id)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.json == {"events": []}
+
+    with count_queries() as statements:
+        response = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert not any("board_event" in statement for statement in statements)
+
+
+def test_poll_returns_item_events_after_change(client, board_id):
+    url = events_url(client, board_id)
+    etag = client.get(url).headers["ETag"]
+    item_id = int(
+        re.search(r'<div id="(\d+)"', client.get(f"/board/{board_id}").text)[1]
+    )
+    client.get(f"/item/color/{item_id}/w3-blue")
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    [event] = response.json["events"]
+    assert event["kind"] == "item_updated"
+    assert event["data"]["id"] == item_id
+    assert event["data"]["color"] == "w3-blue"
+
+    after = client.get(f"/board/{board_id}/events?after={event['id']}")
+    assert after.json == {"events": []}
+
+
+def test_poll_after_pruned_events_reloads(app, client, board_id):
+    item_id = int(
+        re.search(r'<div id="(\d+)"', client.get(f"/board/{board_id}").text)[1]
+    )
+    client.get(f"/item/color/{item_id}/w3-blue")
+    client.get(f"/item/color/{item_id}/w3-teal")
+    with app.app_context():
+        first_id, last_id = [
+            event.id
+            for event in catboard.BoardEvent.query.order_by(catboard.BoardEvent.id)
+        ]
+        catboard.db.session.delete(
+            catboard.db.session.get(catboard.BoardEvent, first_id)
+        )
+        catboard.db.session.commit()
+
+    response = client.get(f"/board/{board_id}/events?after={first_id}")
+    assert response.json == {"events": [{"id": last_id, "kind": "changed", "data": {}}]}
+    assert client.get(f"/board/{board_id}/events?after=x").status_code == 400
@@ -0,0 +1,20 @@
+from conftest import add_board, add_user, count_queries, login
+
+
+def board_page_queries(app, items):
+    """Return the number of queries to show a board with items items."""
+    board_id = add_board(lanes=3, columns=4, items=items)
+    add_user(f"user{items}", board_ids=[board_id])
+    client = login(app.test_client(), f"user{items}")
+    # load the user into the user cache
+    client.get("/")
+    with count_queries() as queries:
+        response = client.get(f"/board/{board_id}")
+    assert response.status_code == 200
+    # every fifth item is closed and not shown
+    assert response.get_data(as_text=True).count('class="item ') == items * 4 // 5
+    return len(queries)
+
+
+def test_board_page_queries_dont_grow_with_items(app):
+    assert board_page_queries(app, 20) == board_page_queries(app, 200) <= 7
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app as catboard
+from conftest import add_board
+
+
+@pytest.fixture
+def ids(app, client, board_id):
+    """Return ids of the board's lane, columns and first item, and of a
+    second board that the user can access."""
+    other_board_id = add_board(name="other")
+    with app.app_context():
+        user = catboard.User.query.filter_by(username="user").one()
+        user.boards.append(catboard.db.session.get(catboard.Board, other_board_id))
+        catboard.touch_user(user.id)
+        catboard.db.session.commit()
+        lane = catboard.Lane.query.filter_by(board_id=board_id).one()
+        column_ids = [column.id for column in lane.columns]
+        item_id = lane.columns[0].items[0].id
+    return SimpleNamespace(
+        board_id=board_id,
+        other_board_id=other_board_id,
+        lane_id=lane.id,
+        column_ids=column_ids,
+        item_id=item_id,
+    )
+
+
+def save_item(client, ids):
+    return client.post(
+        f"/item/{ids.item_id}",
+        data={"new_name": "renamed", "new_assign_name": "", "new_description": ""},
+    )
+
+
+mutations = {
+    "item save": save_item,
+    "item move": lambda client, ids: client.get(
+        f"/item/move/{ids.item_id}/{ids.column_ids[1]}"
+    ),
+    "api item move": lambda client, ids: client.post(
+        f"/api/item/{ids.item_id}/move", json={"column_id": ids.column_ids[2]}
+    ),
+    "item color": lambda client, ids: client.get(f"/item/color/{ids.item_id}/w3-blue"),
+    "item toggle": lambda client, ids: client.get(f"/item/{ids.item_id}/toggle"),
+    "items bulk": lambda client, ids: client.post(
+        "/items/bulk",
+        json={"item_ids": [ids.item_id], "action": "color", "color": "w3-teal"},
+    ),
+    "new item": lambda client, ids: client.post(
+        f"/column/{ids.column_ids[0]}/edit",
+        data={
+            "Submit": "Submit_new_item",
+            "new_item_name": "new",
+            "new_item_assigned": "",
+            "new_item_color": "w3-red",
+            "new_item_template": "",
+        },
+    ),
+    "column edit": lambda client, ids: client.post(
+        f"/column/{ids.column_ids[0]}/edit",
+        data={"Submit": "Submit_rename_column", "new_column_name": "renamed"},
+    ),
+    "lane edit": lambda client, ids: client.post(
+        f"/lane/{ids.lane_id}/edit",
+        data={"Submit": "Submit_rename_lane", "new_lane_name": "renamed"},
+    ),
+    "board edit": lambda client, ids: client.post(
+        f"/board/{ids.board_id}/edit",
+        data={"Submit": "Submit_rename_board", "new_board_name": "renamed"},
+    ),
+    "lane move": lambda client, ids: client.get(
+        f"/lane/{ids.lane_id}/move/{ids.other_board_id}"
+    ),
+}
+
+
+def assert_not_modified(client, url):
+    """Check that url answers 304 to its own ETag, and return the ETag."""
+    etag = client.get(url).headers["ETag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    return etag
+
+
+@pytest.mark.parametrize("mutation", mutations)
+def test_mutations_change_etags(client, ids, mutation):
+    board_url = f"/board/{ids.board_id}"
+    item_url = f"/item/{ids.item_id}"
+    board_etag = assert_not_modified(client, board_url)
+    item_etag = assert_not_modified(client, item_url)
+
+    response = mutations[mutation](client, ids)
+    assert response.status_code in (200, 302)
+
+    for url, etag in [(board_url, board_etag), (item_url, item_etag)]:
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert_not_modified(client, url)
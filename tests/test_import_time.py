@@ -0,0 +1,14 @@
+import statistics
+
+from bench import importtime
+
+
+def test_import_app_within_budget():
+    totals = []
+    for _ in range(3):
+        times = importtime.import_times("app")
+        totals.append(times["app"][1] / 1000)
+    assert statistics.median(totals) <= importtime.BUDGET_MS, totals
+
+    imported = {name.strip() for name in times}
+    assert not imported.intersection(importtime.LAZY_MODULES)
@@ -0,0 +1,41 @@
+import concurrent.futures
+import stat
+
+import pytest
+
+import app as catboard
+
+
+@pytest.fixture(autouse=True)
+def no_secret_key_env(monkeypatch):
+    monkeypatch.delenv("CATBOARD_SECRET_KEY")
+
+
+def test_secret_key_is_created_once(tmp_path):
+    key = catboard.load_secret_key(tmp_path)
+    assert key
+    assert (tmp_path / "secret_key").read_text() == key
+    assert stat.S_IMODE((tmp_path / "secret_key").stat().st_mode) == 0o600
+    assert catboard.load_secret_key(tmp_path) == key
+    assert [path.name for path in tmp_path.iterdir()] == ["secret_key"]
+
+
+def test_concurrent_starts_agree_on_the_key(tmp_path):
+    with concurrent.futures.ProcessPoolExecutor(8) as executor:
+        keys = set(executor.map(catboard.load_secret_key, [tmp_path] * 32))
+    assert keys == {(tmp_path / "secret_key").read_text()}
+
+
+def test_empty_secret_key_file_is_replaced(tmp_path):
+    (tmp_path / "secret_key").write_text("")
+    key = catboard.load_secret_key(tmp_path)
+    assert key
+    assert (tmp_path / "secret_key").read_text() == key
+
+
+def test_unwritable_instance_folder(tmp_path):
+    # a path below a file can't be created, even by root
+    (tmp_path / "file").write_text("")
+    instance_path = tmp_path / "file" / "instance"
+    assert catboard.load_secret_key(instance_path)
+    assert catboard.load_jinja_bytecode_cache(instance_path) is None
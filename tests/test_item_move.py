@@ -0,0 +1,47 @@
+import app as catboard
+from conftest import add_board
+
+
+def first_column_and_item(app, board_id):
+    with app.app_context():
+        lane = catboard.Lane.query.filter_by(board_id=board_id).one()
+        column = lane.columns[0]
+        return column.id, column.items[0].id
+
+
+def test_move_to_other_board_doesnt_tell_items_apart(app, client, board_id):
+    _, item_id = first_column_and_item(app, board_id)
+    other_board_id = add_board(items=3, name="other")
+    column_id, other_item_id = first_column_and_item(app, other_board_id)
+
+    for before_item_id in (other_item_id, other_item_id + 1000):
+        response = client.post(
+            f"/api/item/{item_id}/move",
+            json={"column_id": column_id, "before_item_id": before_item_id},
+        )
+        assert response.status_code == 403
+
+
+def test_move_before_item(app, client, board_id):
+    column_id, first_item_id = first_column_and_item(app, board_id)
+    with app.app_context():
+        lane = catboard.Lane.query.filter_by(board_id=board_id).one()
+        item_id = lane.columns[1].items[0].id
+
+    response = client.post(
+        f"/api/item/{item_id}/move",
+        json={"column_id": column_id, "before_item_id": first_item_id},
+    )
+    assert response.status_code == 200
+    with app.app_context():
+        column = catboard.db.session.get(catboard.Column, column_id)
+        assert [item.id for item in column.items][:2] == [item_id, first_item_id]
+
+
+def test_bulk_move_needs_an_int_column_id(app, client, board_id):
+    column_id, item_id = first_column_and_item(app, board_id)
+    for data in ({}, {"column_id": [column_id]}, {"column_id": str(column_id)}):
+        response = client.post(
+            "/items/bulk", json={"item_ids": [item_id], "action": "move", **data}
+        )
+        assert response.status_code == 400
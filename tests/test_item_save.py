@@ -0,0 +1,66 @@
+import app as catboard
+from conftest import add_board, count_queries
+
+
+def item_ids(board_id):
+    with catboard.app.app_context():
+        return [
+            item_id
+            for (item_id,) in catboard.db.session.query(catboard.Item.id)
+            .join(catboard.Column)
+            .join(catboard.Lane)
+            .filter(catboard.Lane.board_id == board_id)
+            .order_by(catboard.Item.id)
+        ]
+
+
+def subtask_ids(item_id):
+    with catboard.app.app_context():
+        return {
+            item2_id
+            for (item2_id,) in catboard.db.session.query(
+                catboard.ItemRelationship.item2_id
+            ).filter_by(item1_id=item_id, type=100)
+        }
+
+
+def save_item(client, item_id, subtask_ids):
+    """Save the item with subtask_ids, return the number of queries."""
+    description = "\n".join(f"- subtask #{subtask_id}" for subtask_id in subtask_ids)
+    with count_queries() as queries:
+        response = client.post(
+            f"/item/{item_id}",
+            data={
+                "new_name": "parent",
+                "new_assign_name": "",
+                "new_description": description,
+            },
+        )
+    assert response.status_code == 302
+    return len(queries)
+
+
+def test_item_save_queries_dont_grow_with_subtasks(app, client):
+    board_id = add_board(items=40, name="subtasks")
+    with app.app_context():
+        user = catboard.User.query.filter_by(username="user").one()
+        user.boards.append(catboard.db.session.get(catboard.Board, board_id))
+        catboard.touch_user(user.id)
+        catboard.db.session.commit()
+    parent_id, *other_ids = item_ids(board_id)
+    client.get("/")
+
+    few = save_item(client, parent_id, other_ids[:2])
+    assert subtask_ids(parent_id) == set(other_ids[:2])
+    many = save_item(client, parent_id, other_ids[:30])
+    assert subtask_ids(parent_id) == set(other_ids[:30])
+    assert few == many, (few, many)
+
+
+def test_subtasks_on_inaccessible_boards_are_not_linked(app, client, board_id):
+    other_board_id = add_board(items=3, name="not shared")
+    parent_id, *own_ids = item_ids(board_id)
+    other_ids = item_ids(other_board_id)
+
+    save_item(client, parent_id, own_ids[:2] + other_ids)
+    assert subtask_ids(parent_id) == set(own_ids[:2])
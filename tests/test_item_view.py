@@ -0,0 +1,62 @@
+import pytest
+
+import app as catboard
+import replicas
+import to_md
+
+
+@pytest.fixture
+def persist_rendered_html(app):
+    app.config["PERSIST_RENDERED_HTML"] = True
+    yield
+    app.config["PERSIST_RENDERED_HTML"] = False
+
+
+def stored_render(app, item_id):
+    with app.app_context():
+        item = catboard.db.session.get(
+            catboard.Item,
+            item_id,
+            options=[catboard.db.undefer_group("description_html")],
+        )
+        return item.description_html, item.description_html_version
+
+
+def test_stored_render_is_redone_for_new_renderer(
+    app, client, board_id, persist_rendered_html
+):
+    with app.app_context():
+        item_id = catboard.Item.query.first().id
+    assert client.get(f"/item/{item_id}/view").status_code == 200
+    html, version = stored_render(app, item_id)
+    assert "checkbox" in html
+    assert version == to_md.renderer_version()
+
+    with app.app_context():
+        catboard.Item.query.filter_by(id=item_id).update(
+            {"description_html": "stale", "description_html_version": "0-old"}
+        )
+        catboard.touch_board(board_id)
+        catboard.db.session.commit()
+    response = client.get(f"/item/{item_id}/view")
+    assert "stale" not in response.text
+    assert stored_render(app, item_id) == (html, version)
+
+
+def test_render_isnt_stored_from_a_replica(
+    app, client, board_id, persist_rendered_html, monkeypatch
+):
+    with app.app_context():
+        item_id = catboard.Item.query.first().id
+        # the primary's database file stands in for a replica
+        monkeypatch.setitem(catboard.db.engines, "replica0", catboard.db.engine)
+    monkeypatch.setattr(
+        catboard, "replica_pool", replicas.ReplicaPool(["replica0"], lambda name: None)
+    )
+
+    response = client.get(f"/item/{item_id}/view")
+    assert response.status_code == 200
+    assert "checkbox" in response.text
+    assert stored_render(app, item_id) == (None, None)
+    with client.session_transaction() as session:
+        assert "primary_until" not in session
@@ -0,0 +1,53 @@
+import io
+import json
+import shutil
+
+import app as catboard
+import json_stream
+from conftest import DB_PATH, add_board
+
+
+class TrackedFile(io.StringIO):
+    """Text stream that remembers the largest read."""
+
+    max_read = 0
+
+    def read(self, size=-1):
+        self.max_read = max(self.max_read, size)
+        return super().read(size)
+
+
+def test_import_reads_in_chunks(client, template_db):
+    add_board(lanes=2, columns=3, items=400)
+    export = client.get("/export_data").get_data(as_text=True)
+    chunk_size = 1024
+    assert len(export) > 20 * chunk_size
+
+    with catboard.app.app_context():
+        catboard.db.engine.dispose()
+    shutil.copy(template_db, DB_PATH)
+    f = TrackedFile(export)
+    with catboard.app.app_context():
+        catboard.import_tables(json_stream.iter_tables(f, chunk_size))
+        assert catboard.Item.query.count() == 406
+    assert f.max_read == chunk_size
+
+
+def test_large_value_grows_reads_only_while_it_doesnt_fit():
+    chunk_size = 1024
+    rows = [{"description": "x" * 10 * chunk_size}] + [{"id": i} for i in range(500)]
+    f = TrackedFile(json.dumps({"Item": rows}))
+    reader = json_stream.Reader(f, chunk_size)
+    reader.expect("{")
+    assert reader.value() == "Item"
+    reader.expect(":")
+    reader.expect("[")
+    rows_iter = json_stream.iter_rows(reader)
+    assert next(rows_iter) == rows[0]
+    max_read = f.max_read
+    assert chunk_size < max_read <= 16 * chunk_size
+
+    f.max_read = 0
+    assert list(rows_iter) == rows[1:]
+    assert f.max_read == chunk_size
+    assert len(reader.buf) < 2 * chunk_size
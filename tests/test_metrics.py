@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+import app as catboard
+import metrics
+
+
+@pytest.fixture
+def metrics_token(app):
+    app.config["METRICS_TOKEN"] = "token"
+    yield "token"
+    app.config["METRICS_TOKEN"] = None
+
+
+def test_metrics_need_a_token(app, metrics_token):
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 403
+    response = client.get("/metrics", headers={"Authorization": "Bearer token"})
+    assert response.status_code == 200
+    assert "# TYPE catboard_requests_total counter" in response.text
+
+
+def test_metrics_not_served_without_token(app):
+    assert app.test_client().get("/metrics").status_code == 404
+
+
+def requests_total(text, endpoint):
+    prefix = (
+        f'catboard_requests_total{{endpoint="{endpoint}",method="GET",status="200"}} '
+    )
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return int(line[len(prefix) :])
+    return 0
+
+
+def test_shared_metrics_add_up_processes(tmp_path):
+    def extra():
+        return [("catboard_cache_hits_total", "Hits.", "counter", 2)]
+
+    worker = metrics.Metrics()
+    worker.observe_request("board", "GET", 200, 0.1, 5, 0.01)
+    shared = metrics.SharedMetrics(tmp_path, worker, extra)
+    shared.changed()
+    shared.write()
+    # another worker, which then exits
+    other = metrics.Metrics()
+    other.observe_request("board", "GET", 200, 0.2, 5, 0.01)
+    metrics.write_json(
+        tmp_path / "1.json",
+        {"token": "other", "metrics": other.snapshot(), "extra": extra()},
+    )
+
+    text = shared.render()
+    assert requests_total(text, "board") == 2
+    assert 'catboard_request_duration_seconds_count{endpoint="board"} 2' in text
+    assert "catboard_cache_hits_total 4" in text
+
+    shared.collect(1)
+    assert not (tmp_path / "1.json").exists()
+    worker.observe_request("board", "GET", 200, 0.1, 5, 0.01)
+    text = shared.render()
+    assert requests_total(text, "board") == 3
+    assert "catboard_cache_hits_total 4" in text
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+
+def test_unsampled_requests_are_counted(app, metrics_token):
+    client = app.test_client()
+    for _ in range(3):
+        client.get("/login")
+    text = client.get("/metrics", headers={"Authorization": "Bearer token"}).text
+    assert requests_total(text, "login") >= 3
+    assert 'catboard_request_duration_seconds_count{endpoint="login"}' not in text
+
+
+def test_failed_query_leaves_no_query_timer(app):
+    with app.app_context():
+        engine = catboard.db.engine
+    listeners = [
+        ("before_cursor_execute", catboard.start_query_timer),
+        ("after_cursor_execute", catboard.stop_query_timer),
+        ("handle_error", catboard.drop_query_timer),
+    ]
+    for name, fn in listeners:
+        catboard.db.event.listen(engine, name, fn)
+    try:
+        with app.test_request_context():
+            catboard.flask.g.request_metrics = {"queries": [], "db_seconds": 0.0}
+            with pytest.raises(catboard.db.exc.OperationalError):
+                catboard.db.session.execute(catboard.db.text("SELECT * FROM missing"))
+            conn = catboard.db.session.connection()
+            assert conn.info["query_start"] == []
+            catboard.db.session.execute(catboard.db.text("SELECT 1"))
+            assert len(catboard.flask.g.request_metrics["queries"]) == 1
+    finally:
+        for name, fn in listeners:
+            catboard.db.event.remove(engine, name, fn)
@@ -0,0 +1,36 @@
+import warnings
+
+import sqlalchemy.exc
+
+import app as catboard
+
+
+def column_items(column_id):
+    with catboard.app.app_context():
+        return [
+            (item.name, item.position)
+            for item in catboard.db.session.get(catboard.Column, column_id).items
+        ]
+
+
+def test_new_item_goes_last(app, client, board_id):
+    with app.app_context():
+        column_id = catboard.Lane.query.filter_by(board_id=board_id).one().columns[0].id
+    before = column_items(column_id)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", sqlalchemy.exc.SAWarning)
+        response = client.post(
+            f"/column/{column_id}/edit",
+            data={
+                "Submit": "Submit_new_item",
+                "new_item_name": "new",
+                "new_item_assigned": "",
+                "new_item_color": "w3-red",
+                "new_item_template": "",
+            },
+        )
+    assert response.status_code == 302
+    after = column_items(column_id)
+    assert after[:-1] == before
+    assert after[-1] == ("new", before[-1][1] + catboard.position_gap)
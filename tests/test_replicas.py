@@ -0,0 +1,18 @@
+import logging
+
+import replicas
+
+
+def test_down_replica_is_logged_and_skipped(caplog):
+    def check(name):
+        if name == "replica0":
+            raise OSError("connection refused")
+
+    pool = replicas.ReplicaPool(["replica0", "replica1"], check)
+    with caplog.at_level(logging.WARNING, logger="replicas"):
+        assert pool.choose() == "replica1"
+        assert pool.choose() == "replica1"
+    assert [record.getMessage() for record in caplog.records] == [
+        "read replica replica0 is down: OSError('connection refused')"
+    ]
+    assert pool.stats() == {"up": 1, "reads": 2, "fallbacks": 0}
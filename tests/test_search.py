@@ -0,0 +1,78 @@
+import app as catboard
+from conftest import add_board, add_user, login
+
+
+def add_items(board_id, items):
+    """Add items given as (name, description) to the board's first column."""
+    with catboard.app.app_context():
+        column = catboard.Lane.query.filter_by(board_id=board_id).one().columns[0]
+        ids = []
+        for name, description in items:
+            item = catboard.Item(
+                name=name,
+                assigned="",
+                color="w3-red",
+                description=description,
+                column=column,
+                position=0,
+            )
+            catboard.db.session.add(item)
+            catboard.db.session.flush()
+            ids.append(item.id)
+        catboard.db.session.commit()
+        return ids
+
+
+def search(board_ids, q, page=1, page_size=50):
+    with catboard.app.app_context():
+        rows, has_next = catboard.search_items(q, board_ids, page, page_size)
+        return [row.id for row in rows], has_next
+
+
+def test_name_matches_rank_first(app):
+    board_id = add_board()
+    in_description, in_name, elsewhere = add_items(
+        board_id,
+        [
+            ("fix the login", "the deploy script is broken"),
+            ("deploy the server", ""),
+            ("unrelated", "nothing here"),
+        ],
+    )
+    assert search([board_id], "deploy") == ([in_name, in_description], False)
+    # words are prefixes, and all have to match
+    assert search([board_id], "depl serv") == ([in_name], False)
+
+
+def test_only_given_boards_are_searched(app):
+    board_id = add_board()
+    other_board_id = add_board(name="other")
+    [item_id] = add_items(board_id, [("deploy", "")])
+    add_items(other_board_id, [("deploy", "")])
+    assert search([board_id], "deploy") == ([item_id], False)
+    assert search([], "deploy") == ([], False)
+
+    add_user(board_ids=[board_id])
+    client = login(app.test_client())
+    page = client.get("/search?q=deploy").text
+    assert f'href="/item/{item_id}"' in page
+    assert page.count("/item/") == 1
+
+
+def test_paging(app):
+    board_id = add_board()
+    ids = add_items(board_id, [(f"deploy {i}", "") for i in range(5)])
+    # equal rank, newest first
+    newest_first = ids[::-1]
+    assert search([board_id], "deploy", 1, 2) == (newest_first[:2], True)
+    assert search([board_id], "deploy", 2, 2) == (newest_first[2:4], True)
+    assert search([board_id], "deploy", 3, 2) == (newest_first[4:], False)
+
+
+def test_fts_operators_are_words(app):
+    board_id = add_board()
+    [item_id] = add_items(board_id, [("deploy OR rollback", "")])
+    for q in ['"', "*", '" OR *', "deploy OR", 'NEAR(deploy "', "deploy -rollback"]:
+        search([board_id], q)
+    assert search([board_id], '"deploy" OR *') == ([item_id], False)
+    assert search([board_id], "NOT") == ([], False)
@@ -0,0 +1,48 @@
+import app as catboard
+from conftest import add_board, count_queries
+
+
+def change_boards(change, board_id):
+    """Add or remove a board of the user, as cli.py does."""
+    user = catboard.User.query.filter_by(username="user").one()
+    board = catboard.db.session.get(catboard.Board, board_id)
+    getattr(user.boards, change)(board)
+    catboard.touch_user(user.id)
+    catboard.db.session.commit()
+
+
+def test_board_access_changes_seen_by_cached_user(app, client, board_id):
+    other_board_id = add_board(name="other")
+    assert client.get(f"/board/{board_id}").status_code == 200
+    assert client.get(f"/board/{other_board_id}").status_code == 403
+
+    with app.app_context():
+        change_boards("append", other_board_id)
+    assert client.get(f"/board/{other_board_id}").status_code == 200
+
+    with app.app_context():
+        change_boards("remove", other_board_id)
+    assert client.get(f"/board/{other_board_id}").status_code == 403
+
+
+def test_deleted_user_is_logged_out(app, client, board_id):
+    assert client.get(f"/board/{board_id}").status_code == 200
+    with app.app_context():
+        user = catboard.User.query.filter_by(username="user").one()
+        catboard.db.session.delete(user)
+        catboard.db.session.commit()
+    assert client.get(f"/board/{board_id}").status_code == 302
+
+
+def test_new_board_is_accessible(app, client):
+    client.post("/boards", data={"new_board_name": "new"})
+    with app.app_context():
+        new_board_id = catboard.Board.query.filter_by(name="new").one().id
+    assert client.get(f"/board/{new_board_id}").status_code == 200
+
+
+def test_cached_user_is_checked_with_one_query(app, client):
+    client.get("/calendar")
+    with count_queries() as queries:
+        client.get("/")
+    assert len(queries) == 1
@@ -1,31 +1,185 @@
 """Markdown text to html conversion module."""
 
+import collections
+import functools
+import hashlib
 import html
+import itertools
 import re
+import threading
 
-import markdown2
-
-pattern = (
-    r"((([A-Za-z]{3,9}:(?:\/\/)?)"  # scheme
-    r"(?:[\-;:&=\+\$,\w]+@)?[A-Za-z0-9\.\-]+(:\[0-9]+)?"  # user@hostname:port
-    r"|(?:www\.|[\-;:&=\+\$,\w]+@)[A-Za-z0-9\.\-]+)"  # www.|user@hostname
-    r"((?:\/[\+~%\/\.\w\-_]*)?"  # path
-    r"\??(?:[\-\+=&;%@\.\w_]*)"  # query parameters
-    r"#?(?:[\.\!\/\\\w]*))?)"  # fragment
-    r"(?![^<]*?(?:<\/\w+>|\/?>))"  # ignore anchor HTML tags
-    r"(?![^\(]*?\))"  # ignore links in brackets (Markdown links and images)
+# characters of the parts of a url
+USERINFO = r"[\-;:&=\+\$,\w]"
+HOST = re.compile(r"[A-Za-z0-9\.\-]*")
+PATH_QUERY_FRAGMENT = re.compile(
+    r"(?:/[\+~%/\.\w\-]*)?"  # path
+    r"\??[\-\+=&;%@\.\w]*"  # query parameters
+    r"#?[\.\!/\\\w]*"  # fragment
 )
+# where a url can start: a scheme or www., or user@ further on
+SCHEME_OR_WWW = re.compile(r"[A-Za-z]{3,9}:|www\.")
+USERINFO_RUN = re.compile(USERINFO + "*")
+USERINFO_AT = re.compile(f"(?<!{USERINFO}){USERINFO}+@")
+# what may follow a url
+NOT_ANGLE = re.compile(r"[^<>]*")
+NOT_PAREN = re.compile(r"[^()]*")
+CLOSING_TAG = re.compile(r"</\w+>")
+ITEM_REFERENCE = re.compile(r"#(\d+)")
 
-# the first element should be the pattern matching common urls as this is
-# used by the app to generate the links section on the item page.
-link_patterns = [
-    (re.compile(pattern), r"\1"),
-    (re.compile(r"#(\d+)", re.I), r"/item/\1"),
-]
 
+class RunEnds:
+    """Finds where a run of pattern characters ends, remembering the last run.
 
-def text_to_html(text):
+    Every position in a run has the same end, so asking again for a
+    position in the last run doesn't scan it again.
+    """
+
+    def __init__(self, text, pattern):
+        self.text = text
+        self.pattern = pattern
+        self.start = self.end = -1
+
+    def __call__(self, pos):
+        if not self.start <= pos <= self.end:
+            self.start = pos
+            self.end = self.pattern.match(self.text, pos).end()
+        return self.end
+
+
+def find_urls(text):
+    """Yield (start, end) of the urls in text, from left to right.
+
+    A url is scheme: with an optional // and user@, or www. or user@,
+    then a hostname and an optional path, query and fragment. Urls
+    followed by > or a closing tag before the next <, or by ) before
+    the next (, are skipped, since they are html attributes or markdown
+    links and images.
+
+    This finds the same urls as the regex that was used before, but
+    looks at each character a bounded number of times, where the regex
+    rescanned the rest of the text from every position. Like the regex,
+    it doesn't take a :port as part of the url.
+    """
+    nowhere = len(text) + 1
+    userinfo_end = RunEnds(text, USERINFO_RUN)
+    no_angle_end = RunEnds(text, NOT_ANGLE)
+    no_paren_end = RunEnds(text, NOT_PAREN)
+
+    def next_scheme(pos):
+        match = SCHEME_OR_WWW.search(text, pos)
+        return match.span() if match else (nowhere, nowhere)
+
+    def next_userinfo(pos):
+        end = userinfo_end(pos)
+        if end > pos and text.startswith("@", end):
+            return pos, end + 1
+        match = USERINFO_AT.search(text, pos)
+        return match.span() if match else (nowhere, nowhere)
+
+    def host_end(pos):
+        end = HOST.match(text, pos).end()
+        return end if end > pos else None
+
+    # the next possible starts of a url, and where their scheme, www.
+    # or user@ ends
+    scheme_start = scheme_end = userinfo_start = userinfo_stop = -1
+    pos = 0
+    while True:
+        if scheme_start < pos:
+            scheme_start, scheme_end = next_scheme(pos)
+        if userinfo_start < pos:
+            userinfo_start, userinfo_stop = next_userinfo(pos)
+        start = min(scheme_start, userinfo_start)
+        if start == nowhere:
+            return
+
+        # the characters of a url are never brackets, so what follows
+        # a url is what follows its start
+        angle = no_angle_end(start)
+        if text.startswith(">", angle) or CLOSING_TAG.match(text, angle):
+            pos = angle
+            continue
+        paren = no_paren_end(start)
+        if text.startswith(")", paren):
+            pos = paren
+            continue
+
+        end = None
+        if start == scheme_start and text[scheme_end - 1] == ":":
+            after = scheme_end + 2 if text.startswith("//", scheme_end) else scheme_end
+            at = userinfo_end(after)
+            if at > after and text.startswith("@", at):
+                end = host_end(at + 1)
+            if end is None:
+                end = host_end(after)
+        elif start == scheme_start:
+            end = host_end(scheme_end)
+        if end is None and start == userinfo_start:
+            end = host_end(userinfo_stop)
+
+        if end is None:
+            if start == scheme_start:
+                scheme_start, scheme_end = next_scheme(start + 1)
+            if start == userinfo_start:
+                userinfo_start, userinfo_stop = next_userinfo(userinfo_stop)
+            continue
+
+        end = PATH_QUERY_FRAGMENT.match(text, end).end()
+        yield start, end
+        pos = end
+
+
+def find_links(text):
+    """Yield (start, end, href) of the urls and #123 item references in text.
+
+    References inside urls, like a #123 fragment, and references right
+    next to a url aren't links.
+    """
+    last_end = 0
+    urls = itertools.chain(find_urls(text), [(len(text) + 1, None)])
+    for url_start, url_end in urls:
+        for match in ITEM_REFERENCE.finditer(text, last_end, url_start):
+            if 0 < match.start() == last_end or match.end() == url_start:
+                continue
+            yield match.start(), match.end(), "/item/" + match.group(1)
+        if url_end is not None:
+            yield url_start, url_end, text[url_start:url_end]
+            last_end = url_end
+
+
+class Link:
+    """A link found by find_links(), with the methods of re.Match that
+    markdown2 uses."""
+
+    def __init__(self, start, end, href):
+        self.span_ = (start, end)
+        self.href = href
+
+    def start(self):
+        return self.span_[0]
+
+    def end(self):
+        return self.span_[1]
+
+    def span(self):
+        return self.span_
+
+
+class LinkPattern:
+    """Stands in for a regex in markdown2's link_patterns."""
+
+    def finditer(self, text):
+        for start, end, href in find_links(text):
+            yield Link(start, end, href)
+
+
+link_patterns = [(LinkPattern(), lambda link: link.href)]
+
+
+def render(text):
     """Turn markdown text into html, plus some useful extensions."""
+    import markdown2
+
     return markdown2.markdown(
         html.escape(text),
         extras=[
@@ -39,3 +193,57 @@ def text_to_html(text):
         ],
         link_patterns=link_patterns,
     )
+
+
+# bump when render() output changes, so that stored renders are redone
+RENDER_REVISION = 1
+
+
+@functools.cache
+def renderer_version():
+    """Return the version of render() and markdown2 to store with renders."""
+    import markdown2
+
+    return f"{RENDER_REVISION}-{markdown2.__version__}"
+
+
+def content_hash(text):
+    """Return the hex digest used to key rendered text."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# rendered html keyed by content hash, least recently used first
+render_cache_size = 512
+render_cache = collections.OrderedDict()
+render_cache_lock = threading.Lock()
+render_cache_stats = {"hits": 0, "misses": 0}
+
+
+def text_to_html(text):
+    """Turn markdown text into html, reusing earlier renders of the same text."""
+    key = content_hash(text)
+    with render_cache_lock:
+        rendered = render_cache.get(key)
+        if rendered is not None:
+            render_cache.move_to_end(key)
+            render_cache_stats["hits"] += 1
+            return rendered
+        render_cache_stats["misses"] += 1
+
+    rendered = render(text)
+
+    with render_cache_lock:
+        render_cache[key] = rendered
+        while len(render_cache) > render_cache_size:
+            render_cache.popitem(last=False)
+    return rendered
+
+
+def render_cache_info():
+    """Return render cache hit/miss counters and size."""
+    with render_cache_lock:
+        return {
+            **render_cache_stats,
+            "size": len(render_cache),
+            "maxsize": render_cache_size,
+        }
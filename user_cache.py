@@ -0,0 +1,88 @@
+"""Cache of logged in user data for the flask-login user loader."""
+
+import json
+import threading
+import time
+
+
+class MemoryBackend:
+    """In-process cache backend with per-key expiry."""
+
+    def __init__(self):
+        self.data = dict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires = self.data.get(key, (None, 0))
+            if expires < time.monotonic():
+                self.data.pop(key, None)
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+class RedisBackend:
+    """Cache backend shared between processes, using redis.
+
+    Any object with the same get/set/delete methods can stand in for it.
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+
+class UserCache:
+    """Cache user id, username and accessible board ids by user id."""
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(user_id):
+        return f"catboard:user:{user_id}"
+
+    def get(self, user_id):
+        """Return cached user data dict, or None."""
+        value = self.backend.get(self.key(user_id))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, user_id, data):
+        self.backend.set(self.key(user_id), json.dumps(data), self.ttl)
+
+    def invalidate(self, user_id):
+        self.backend.delete(self.key(user_id))
+
+    def stats(self):
+        """Return hit/miss counters and the hit rate."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }